@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+訓練與超參數搜尋的成本估計
+在抽樣資料上執行幾次短訓練，量測目前特徵寬度下每棵樹每千列的訓練秒數，
+再外推完整訓練與整個搜尋的時間與峰值記憶體
+"""
+
+import time
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.model_selection import train_test_split
+
+# LightGBM Dataset 每列除了分箱後的特徵（每個特徵約 1 byte）之外的固定開銷：
+# 標籤、梯度、Hessian 與目前分數
+_LIGHTGBM_ROW_OVERHEAD_BYTES = 32
+
+
+class CostEstimate:
+    """校準結果：每千列的訓練成本與每列的記憶體用量"""
+
+    def __init__(self, seconds_per_tree_per_1k_rows, seconds_per_tree, overhead_seconds_per_1k_rows,
+                 preprocess_seconds_per_1k_rows, raw_bytes_per_row, transformed_bytes_per_row,
+                 n_features, sample_rows):
+        """
+        Args:
+            seconds_per_tree_per_1k_rows: 每棵樹每千列的訓練秒數
+            seconds_per_tree: 每棵樹與列數無關的固定秒數（每次迭代的開銷）
+            overhead_seconds_per_1k_rows: 每次訓練與樹數無關的開銷（建構 Dataset 等），每千列秒數
+            preprocess_seconds_per_1k_rows: DataPreprocess 擬合與轉換每千列的秒數
+            raw_bytes_per_row: 原始資料每列的記憶體用量
+            transformed_bytes_per_row: 前處理後特徵矩陣每列的記憶體用量
+            n_features: 前處理後的特徵數
+            sample_rows: 校準使用的資料列數
+        """
+        self.seconds_per_tree_per_1k_rows = seconds_per_tree_per_1k_rows
+        self.seconds_per_tree = seconds_per_tree
+        self.overhead_seconds_per_1k_rows = overhead_seconds_per_1k_rows
+        self.preprocess_seconds_per_1k_rows = preprocess_seconds_per_1k_rows
+        self.raw_bytes_per_row = raw_bytes_per_row
+        self.transformed_bytes_per_row = transformed_bytes_per_row
+        self.n_features = n_features
+        self.sample_rows = sample_rows
+
+    def setup_seconds(self, n_rows):
+        """前處理與建構 Dataset 的秒數"""
+        return n_rows / 1000 * (self.preprocess_seconds_per_1k_rows
+                                + self.overhead_seconds_per_1k_rows)
+
+    def tree_seconds(self, n_rows, n_trees):
+        """訓練 n_trees 棵樹的秒數（不含前處理與建構 Dataset）"""
+        return n_trees * (self.seconds_per_tree + n_rows / 1000 * self.seconds_per_tree_per_1k_rows)
+
+    def fit_seconds(self, n_rows, n_trees):
+        """
+        估計一次訓練（含前處理）的秒數
+
+        Args:
+            n_rows: 訓練列數
+            n_trees: 樹的數量
+
+        Returns:
+            float: 預估秒數
+        """
+        return self.setup_seconds(n_rows) + self.tree_seconds(n_rows, n_trees)
+
+    def search_seconds(self, fits, n_workers=1, n_setups=None):
+        """
+        估計一批訓練的牆鐘時間，工作者之間平均分攤
+
+        Args:
+            fits: [(訓練列數, 樹數), ...]
+            n_workers: 同時訓練的工作者數
+            n_setups: 前處理與建構 Dataset 的總次數（fold 快取讓多次訓練共用），None 表示每次訓練各一次
+
+        Returns:
+            float: 預估秒數
+        """
+        seconds = sum(self.tree_seconds(n_rows, n_trees) for n_rows, n_trees in fits)
+        if n_setups is None:
+            seconds += sum(self.setup_seconds(n_rows) for n_rows, _ in fits)
+        elif fits:
+            seconds += n_setups * self.setup_seconds(max(n_rows for n_rows, _ in fits))
+        return seconds / max(1, n_workers)
+
+    def peak_memory_bytes(self, n_data_rows, n_fit_rows, n_workers=1, n_resident_folds=1):
+        """
+        估計峰值記憶體
+
+        Args:
+            n_data_rows: 載入的資料列數（主行程與每個工作者行程各持有一份）
+            n_fit_rows: 每次訓練的列數
+            n_workers: 平行工作者行程數，1 表示在主行程訓練
+            n_resident_folds: 每個工作者同時保留的 fold 數（fold 快取會保留已處理的 fold）
+
+        Returns:
+            int: 預估位元組數
+        """
+        data_copies = 1 + (n_workers if n_workers > 1 else 0)
+        fit_bytes = n_fit_rows * (self.transformed_bytes_per_row + self.n_features
+                                  + _LIGHTGBM_ROW_OVERHEAD_BYTES)
+        return int(n_data_rows * self.raw_bytes_per_row * data_copies
+                   + fit_bytes * n_resident_folds * max(1, n_workers))
+
+    def __repr__(self):
+        return (f"CostEstimate(seconds_per_tree_per_1k_rows={self.seconds_per_tree_per_1k_rows:.2e}, "
+                f"n_features={self.n_features}, sample_rows={self.sample_rows})")
+
+
+def _tree_cost(model, X, y, tree_counts, repeats):
+    """以兩種樹數訓練，回傳 (每棵樹秒數, 與樹數無關的秒數)"""
+    timings = []
+    for n_trees in tree_counts:
+        model = clone(model).set_params(n_estimators=n_trees)
+        best = np.inf
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model.fit(X, y)
+            best = min(best, time.perf_counter() - start)
+        timings.append(best)
+    (few_trees, many_trees), (few_seconds, many_seconds) = tree_counts, timings
+    per_tree = max((many_seconds - few_seconds) / (many_trees - few_trees), 0.0)
+    return per_tree, max(few_seconds - per_tree * few_trees, 0.0)
+
+
+def calibrate(pipeline, X, y, sample_rows=2000, tree_counts=(10, 40), repeats=2,
+              random_state=0):
+    """
+    在抽樣資料上以兩種列數、兩種樹數各訓練幾次，量測每棵樹隨列數增加的成本與固定開銷
+
+    Args:
+        pipeline: DataPreprocess + LightGBM 模型的管線（不會被修改，使用其目前的參數與執行緒數）
+        X, y: 訓練資料
+        sample_rows: 校準使用的列數上限（依目標類別分層抽樣）
+        tree_counts: 兩種短訓練的樹數
+        repeats: 每種設定重複訓練次數，取最短時間以降低干擾
+        random_state: 抽樣的隨機種子
+
+    Returns:
+        CostEstimate: 校準結果
+    """
+    if len(X) > sample_rows:
+        X, _, y, _ = train_test_split(X, y, train_size=sample_rows, stratify=y,
+                                      random_state=random_state)
+    n_rows = len(X)
+
+    preprocess = clone(pipeline.named_steps['DataPreprocess'])
+    start = time.perf_counter()
+    X_transformed = np.asarray(preprocess.fit_transform(X, y))
+    preprocess_seconds = time.perf_counter() - start
+    y = np.asarray(y)
+
+    # 小列數只決定每棵樹的固定開銷，列數太少時全部歸入每列成本
+    model = pipeline.named_steps['model']
+    per_tree, overhead = _tree_cost(model, X_transformed, y, tree_counts, repeats)
+    small_rows = n_rows // 4
+    per_row_tree, fixed_tree = per_tree / n_rows, 0.0
+    if small_rows >= 100:
+        small_per_tree, _ = _tree_cost(model, X_transformed[:small_rows], y[:small_rows],
+                                       tree_counts, repeats)
+        per_row_tree = max((per_tree - small_per_tree) / (n_rows - small_rows), 0.0)
+        fixed_tree = max(per_tree - per_row_tree * n_rows, 0.0)
+
+    raw_bytes = (X.memory_usage(deep=True).sum() if hasattr(X, 'memory_usage')
+                 else np.asarray(X).nbytes)
+    return CostEstimate(
+        seconds_per_tree_per_1k_rows=per_row_tree * 1000,
+        seconds_per_tree=fixed_tree,
+        overhead_seconds_per_1k_rows=overhead / n_rows * 1000,
+        preprocess_seconds_per_1k_rows=preprocess_seconds / n_rows * 1000,
+        raw_bytes_per_row=raw_bytes / n_rows,
+        transformed_bytes_per_row=X_transformed.nbytes / n_rows,
+        n_features=X_transformed.shape[1],
+        sample_rows=n_rows)
+
+
+def format_duration(seconds):
+    """將秒數轉為易讀的時間長度"""
+    if seconds < 60:
+        return f"{seconds:.1f} 秒"
+    seconds = int(round(seconds))
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes} 分 {seconds} 秒"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours} 小時 {minutes} 分"
+
+
+def format_bytes(n_bytes):
+    """將位元組數轉為易讀的容量"""
+    for unit in ('B', 'KB', 'MB'):
+        if n_bytes < 1024:
+            return f"{n_bytes:.0f} {unit}"
+        n_bytes /= 1024
+    return f"{n_bytes:.1f} GB"
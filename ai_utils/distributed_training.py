@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LightGBM 資料平行分散式訓練
+協調者負責切分資料列、分配連接埠並收集最終模型，
+各工作行程以 LightGBM 內建的 socket 資料平行樹學習器 (tree_learner='data') 共同訓練同一個模型
+"""
+
+import argparse
+import multiprocessing as mp
+import pickle
+import queue
+import socket
+import time
+
+import numpy as np
+from lightgbm import LGBMClassifier
+from sklearn.model_selection import StratifiedKFold
+
+from ai_utils.thread_budget import ThreadBudget
+
+# 只在訓練期間使用的網路參數，訓練完成後會從模型中移除
+NETWORK_PARAMS = ('tree_learner', 'machines', 'num_machines',
+                  'local_listen_port', 'time_out')
+LOCAL_HOSTS = ('127.0.0.1', 'localhost')
+DEFAULT_TIME_OUT_MINUTES = 5
+
+
+def find_free_ports(n_ports, host='127.0.0.1'):
+    """
+    取得本機上可用的連接埠
+
+    參數:
+        n_ports (int): 需要的連接埠數量
+        host (str): 綁定的主機位址
+
+    回傳:
+        list: 連接埠列表
+    """
+    sockets = []
+    try:
+        for _ in range(n_ports):
+            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            s.bind((host, 0))
+            sockets.append(s)
+        return [s.getsockname()[1] for s in sockets]
+    finally:
+        for s in sockets:
+            s.close()
+
+
+def parse_machines(machines):
+    """
+    解析機器列表
+
+    參數:
+        machines (str or list): "host:port,host:port" 字串或 ["host:port", ...] 列表
+
+    回傳:
+        list: [(host, port), ...]
+    """
+    if isinstance(machines, str):
+        machines = [m for m in machines.split(',') if m.strip()]
+    parsed = []
+    for machine in machines:
+        host, port = machine.strip().rsplit(':', 1)
+        parsed.append((host, int(port)))
+    if len(set(parsed)) != len(parsed):
+        raise ValueError(f"機器列表中有重複的位址: {machines}")
+    return parsed
+
+
+def shard_rows(y, n_shards, random_state=42):
+    """
+    依目標類別分層切分資料列，確保每個分片的類別比例一致
+
+    參數:
+        y (array-like): 目標變數
+        n_shards (int): 分片數量
+        random_state (int): 隨機種子
+
+    回傳:
+        list: 每個分片的列索引陣列
+    """
+    splitter = StratifiedKFold(n_splits=n_shards, shuffle=True,
+                               random_state=random_state)
+    y = np.asarray(y)
+    return [np.sort(shard) for _, shard in splitter.split(np.zeros(len(y)), y)]
+
+
+def _network_params(machines, rank, time_out):
+    """建立指定工作者使用的 LightGBM 網路參數"""
+    return {
+        'tree_learner': 'data',
+        'machines': ','.join(f"{host}:{port}" for host, port in machines),
+        'num_machines': len(machines),
+        'local_listen_port': machines[rank][1],
+        'time_out': time_out,
+    }
+
+
+def _fit_shard(X_shard, y_shard, model_params, machines, rank, time_out):
+    """在單一工作者上以資料平行模式訓練模型"""
+    model = LGBMClassifier(**model_params)
+    model.set_params(**_network_params(machines, rank, time_out))
+    try:
+        model.fit(X_shard, y_shard)
+    finally:
+        if getattr(model, 'fitted_', False):
+            model.booster_.free_network()
+    return model
+
+
+def strip_network_params(model):
+    """移除模型中僅供分散式訓練使用的網路參數，讓模型可以在單機上預測或重新訓練"""
+    for param in NETWORK_PARAMS:
+        model._other_params.pop(param, None)
+        if param in model.__dict__:
+            delattr(model, param)
+    return model
+
+
+def _worker_main(rank, X_shard, y_shard, model_params, machines, time_out,
+                 n_threads, return_model, result_queue):
+    """本機工作行程進入點"""
+    try:
+        model_params = dict(model_params, n_jobs=n_threads)
+        with ThreadBudget(n_threads).limit():
+            model = _fit_shard(X_shard, y_shard, model_params,
+                               machines, rank, time_out)
+        result_queue.put(('ok', rank, pickle.dumps(model) if return_model else None))
+    except Exception as e:
+        result_queue.put(('error', rank, f"{type(e).__name__}: {e}"))
+
+
+def write_shard(path, X_shard, y_shard, model_params):
+    """將分片資料與模型參數寫入檔案，供遠端工作者讀取"""
+    with open(path, 'wb') as f:
+        pickle.dump({'X': X_shard, 'y': y_shard, 'params': model_params}, f)
+
+
+def run_shard_worker(shard_path, machines, rank, output_path=None,
+                     time_out=DEFAULT_TIME_OUT_MINUTES):
+    """
+    在遠端主機上執行一個工作者（資料分片需位於共享路徑）
+
+    參數:
+        shard_path (str): write_shard 產生的分片檔案
+        machines (str or list): 與協調者相同的機器列表
+        rank (int): 此工作者在機器列表中的位置
+        output_path (str): 可選，儲存訓練完成模型的路徑
+        time_out (int): 網路逾時（分鐘）
+    """
+    with open(shard_path, 'rb') as f:
+        shard = pickle.load(f)
+    model = _fit_shard(shard['X'], shard['y'], shard['params'],
+                       parse_machines(machines), rank, time_out)
+    strip_network_params(model)
+    if output_path:
+        with open(output_path, 'wb') as f:
+            pickle.dump(model, f)
+    return model
+
+
+def train_data_parallel(X, y, model_params, n_workers=2, machines=None,
+                        random_state=42, n_jobs=-1, time_out=DEFAULT_TIME_OUT_MINUTES,
+                        shard_dir=None, should_stop=None, poll_interval=0.5):
+    """
+    協調者：切分資料並以多個工作行程進行資料平行訓練
+
+    參數:
+        X (array-like or DataFrame): 已預處理的特徵矩陣
+        y (array-like): 目標變數
+        model_params (dict): LGBMClassifier 參數
+        n_workers (int): 未指定 machines 時，在本機啟動的工作者數量
+        machines (str or list): 可選，"host:port" 機器列表；本機位址由協調者啟動，
+                                其他主機需以 run_shard_worker 自行啟動
+        random_state (int): 分片使用的隨機種子
+        n_jobs (int): 本機工作者共用的 CPU 核心預算
+        time_out (int): LightGBM 網路逾時（分鐘）
+        shard_dir (str): 遠端工作者讀取分片的共享資料夾，機器列表包含遠端主機時必須提供
+        should_stop (callable): 回傳 True 時終止所有本機工作者
+        poll_interval (float): 檢查工作者狀態的間隔秒數
+
+    回傳:
+        LGBMClassifier: 訓練完成的模型，如果被停止則回傳 None
+    """
+    if machines is None:
+        if n_workers < 2:
+            raise ValueError(f"資料平行訓練至少需要 2 個工作者，但得到: {n_workers}")
+        machines = [('127.0.0.1', port) for port in find_free_ports(n_workers)]
+    else:
+        machines = parse_machines(machines)
+
+    local_ranks = [rank for rank, (host, _) in enumerate(machines)
+                   if host in LOCAL_HOSTS]
+    remote_ranks = [rank for rank in range(len(machines)) if rank not in local_ranks]
+    if not local_ranks:
+        raise ValueError("機器列表中至少需要一個本機位址 (127.0.0.1 或 localhost) 以收集模型")
+    if remote_ranks and shard_dir is None:
+        raise ValueError("機器列表包含遠端主機時必須提供 shard_dir 共享資料夾")
+
+    shards = shard_rows(y, len(machines), random_state)
+
+    def take(data, index):
+        return data.iloc[index] if hasattr(data, 'iloc') else np.asarray(data)[index]
+
+    model_params = {k: v for k, v in model_params.items() if k not in NETWORK_PARAMS}
+
+    machine_list = ','.join(f"{host}:{port}" for host, port in machines)
+    for rank in remote_ranks:
+        shard_path = f"{shard_dir}/shard_{rank}.pkl"
+        write_shard(shard_path, take(X, shards[rank]), take(y, shards[rank]), model_params)
+        print(f"請在 {machines[rank][0]} 上啟動工作者: python -m ai_utils.distributed_training "
+              f"--shard {shard_path} --machines {machine_list} --rank {rank}")
+
+    _, n_threads = ThreadBudget(n_jobs).split(len(local_ranks))
+    collector_rank = local_ranks[0]
+    print(f"資料平行訓練：{len(machines)} 個工作者（本機 {len(local_ranks)} 個，"
+          f"每個 {n_threads} 個執行緒），機器列表 {machine_list}")
+
+    ctx = mp.get_context('spawn')
+    result_queue = ctx.Queue()
+    processes = []
+    for rank in local_ranks:
+        process = ctx.Process(
+            target=_worker_main,
+            args=(rank, take(X, shards[rank]), take(y, shards[rank]), model_params,
+                  machines, time_out, n_threads, rank == collector_rank, result_queue),
+            daemon=True)
+        process.start()
+        processes.append(process)
+
+    model_bytes = None
+    pending = set(local_ranks)
+    try:
+        while pending:
+            if should_stop is not None and should_stop():
+                print("[停止機制] 資料平行訓練被停止")
+                return None
+            try:
+                status, rank, payload = result_queue.get(timeout=poll_interval)
+            except queue.Empty:
+                dead = [p for p in processes if p.exitcode not in (None, 0)]
+                if dead:
+                    raise RuntimeError(f"資料平行工作者異常結束 (exitcode={dead[0].exitcode})")
+                continue
+            if status == 'error':
+                raise RuntimeError(f"資料平行工作者 {rank} 訓練失敗: {payload}")
+            pending.discard(rank)
+            if rank == collector_rank:
+                model_bytes = payload
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+            process.join(timeout=5)
+
+    model = strip_network_params(pickle.loads(model_bytes))
+    model.set_params(n_jobs=n_jobs)
+    return model
+
+
+def fit_pipeline_data_parallel(pipe, X, y, n_workers=2, machines=None,
+                               random_state=42, n_jobs=-1, should_stop=None):
+    """
+    以資料平行模式訓練 DataPreprocess + LGBMClassifier 管線
+
+    預處理器在協調者上以全部資料擬合（與單機訓練相同），再將轉換後的特徵矩陣切分給工作者
+
+    回傳:
+        Pipeline: 訓練完成的管線，如果被停止則回傳 None
+    """
+    preprocessor = pipe.named_steps['DataPreprocess']
+    preprocessor.fit(X, y)
+    X_transformed = preprocessor.transform(X)
+
+    start_time = time.time()
+    model = train_data_parallel(
+        X_transformed, y, pipe.named_steps['model'].get_params(),
+        n_workers=n_workers, machines=machines, random_state=random_state,
+        n_jobs=n_jobs, should_stop=should_stop)
+    if model is None:
+        return None
+    print(f"資料平行訓練完成，耗時 {time.time() - start_time:.1f} 秒")
+
+    pipe.steps[-1] = ('model', model)
+    return pipe
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LightGBM 資料平行遠端工作者")
+    parser.add_argument('--shard', required=True, help="協調者寫出的分片檔案路徑")
+    parser.add_argument('--machines', required=True, help="host:port 以逗號分隔的機器列表")
+    parser.add_argument('--rank', type=int, required=True, help="此工作者在機器列表中的位置")
+    parser.add_argument('--output', default=None, help="可選，儲存模型的路徑")
+    args = parser.parse_args()
+    run_shard_worker(args.shard, args.machines, args.rank, args.output)
@@ -7,16 +7,47 @@ from sklearn.metrics import (
     classification_report, confusion_matrix, roc_curve,
     f1_score, roc_auc_score, balanced_accuracy_score
 )
-from sklearn.model_selection import train_test_split, cross_val_score
+from sklearn.model_selection import train_test_split, cross_val_score, check_cv
+from sklearn.metrics import get_scorer
 from lightgbm import LGBMClassifier
+import lightgbm as lgb
 from sklearn.preprocessing import RobustScaler
 from sklearn.preprocessing import MinMaxScaler
-from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.base import BaseEstimator, TransformerMixin, ClassifierMixin, clone
+import copy
 import pickle
+import time
+import multiprocessing as mp
+from contextlib import ExitStack
+from concurrent.futures import (
+    ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+)
+from threadpoolctl import threadpool_limits
 from sklearn.pipeline import Pipeline
 import pandas as pd
 import numpy as np
 import warnings
+import sys
+
+# 直接以 python ai_utils/model_traning.py 執行時，將專案根目錄加入搜尋路徑以匯入 ai_utils 模組
+_project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _project_root not in sys.path:
+    sys.path.insert(0, _project_root)
+
+from ai_utils.thread_budget import ThreadBudget, resolve_n_jobs
+from ai_utils.tpe_sampler import TPESampler, validate_param_space
+from ai_utils.trial_store import TrialStore, dataset_fingerprint, params_key, split_fingerprint
+from ai_utils.oof_store import OOFStore, load_oof
+from ai_utils.pruners import get_pruner
+from ai_utils.proba_metrics import score_from_proba, validate_metrics
+from ai_utils.cost_estimator import calibrate, format_bytes, format_duration
+from ai_utils.tree_compaction import (
+    select_tree_count, staged_metrics, sweep_tree_counts, truncate_model
+)
+from ai_utils.segmented_model import SegmentedClassifier
+from ai_utils.threshold_optimizer import THRESHOLD_METRICS, apply_threshold, optimize_threshold
+from ai_utils.tuning_cluster import TuningCoordinator
+from ai_utils.distributed_training import fit_pipeline_data_parallel
 warnings.simplefilter("ignore", pd.errors.PerformanceWarning)
 
 # 全域停止標誌
@@ -43,16 +74,465 @@ def reset_stop_training_flag():
     _stop_training_flag = False
 
 
+class TrainingStoppedError(Exception):
+    """訓練過程中收到停止請求時拋出，用於中斷進行中的 LightGBM 訓練"""
+
+
+def _make_stop_callback(should_stop):
+    """建立 LightGBM 回呼函式，每次迭代檢查停止請求，讓單次訓練也能中途停止"""
+    def _stop_callback(env):
+        if should_stop():
+            raise TrainingStoppedError()
+    return _stop_callback
+
+
+def _take_rows(data, index):
+    """依列索引取出 DataFrame / Series / ndarray 的部分資料"""
+    return data.iloc[index] if hasattr(data, 'iloc') else np.asarray(data)[index]
+
+
+class _StagedPredictor(ClassifierMixin, BaseEstimator):
+    """只使用前 num_iteration 棵樹預測的唯讀包裝，讓 sklearn 評分器評估較少樹數的模型"""
+
+    def __init__(self, pipeline, num_iteration):
+        self.pipeline = pipeline
+        self.num_iteration = num_iteration
+
+    @property
+    def classes_(self):
+        return self.pipeline.classes_
+
+    def predict(self, X):
+        return self.pipeline.predict(X, num_iteration=self.num_iteration)
+
+    def predict_proba(self, X):
+        return self.pipeline.predict_proba(X, num_iteration=self.num_iteration)
+
+
+def _booster_params(model, n_classes):
+    """
+    由 LGBMClassifier 的 get_params() 建立與其 fit 相同的 lgb.train 參數
+
+    只有 sklearn 介面使用的參數（樹數、class_weight、importance_type）被移除；
+    目標函數、類別數、預設評估指標與執行緒數依 LGBMClassifier.fit 的規則明確對應
+    """
+    params = model.get_params()
+    for name in ('n_estimators', 'class_weight', 'importance_type'):
+        params.pop(name, None)
+    objective = params.pop('objective', None)
+    if objective is None:
+        objective = 'multiclass' if n_classes > 2 else 'binary'
+    params['objective'] = objective
+    if n_classes > 2:
+        params['num_class'] = n_classes
+    params.setdefault('metric', objective)
+    if isinstance(params.get('random_state'), np.random.RandomState):
+        params['random_state'] = params['random_state'].randint(np.iinfo(np.int32).max)
+    params['num_threads'] = resolve_n_jobs(params.pop('n_jobs', None))
+    return params
+
+
+class _BoosterClassifier(ClassifierMixin, BaseEstimator):
+    """
+    以 lgb.train 訓練的分類器，參數取自 model（未訓練的 LGBMClassifier），預測結果與 LGBMClassifier 相同
+
+    fold 快取以 fit_dataset 在已分箱的 lgb.Dataset 上訓練；fit 由原始特徵建構 Dataset，
+    因此可被 clone 後重新訓練
+    """
+
+    def __init__(self, model):
+        self.model = model
+
+    def booster_params(self, n_classes):
+        """lgb.train 參數"""
+        params = _booster_params(self.model, n_classes)
+        # 關閉依 min_data_in_leaf 預先過濾特徵，網格改變 min_child_samples 時不必重建 Dataset
+        params['feature_pre_filter'] = False
+        return params
+
+    def fit(self, X, y, callbacks=None):
+        classes = np.unique(y)
+        dataset = lgb.Dataset(X, label=np.searchsorted(classes, np.asarray(y)),
+                              params=self.booster_params(len(classes)))
+        return self.fit_dataset(dataset, classes, callbacks)
+
+    def fit_dataset(self, dataset, classes, callbacks=None):
+        """
+        在已建構的 lgb.Dataset 上訓練
+
+        參數:
+            dataset (lgb.Dataset): 標籤為類別索引的訓練資料
+            classes (ndarray): 排序後的類別
+            callbacks (list): 可選，lgb.train 的回呼函式
+        """
+        self.classes_ = np.asarray(classes)
+        self.booster_ = lgb.train(self.booster_params(len(self.classes_)), dataset,
+                                  num_boost_round=self.model.n_estimators,
+                                  callbacks=callbacks)
+        return self
+
+    def predict_proba(self, X, num_iteration=None):
+        proba = self.booster_.predict(X, num_iteration=num_iteration)
+        if proba.ndim == 1:  # 二元分類只回傳正類別機率
+            return np.vstack((1.0 - proba, proba)).transpose()
+        return proba
+
+    def predict(self, X, num_iteration=None):
+        return self.classes_[np.argmax(self.predict_proba(X, num_iteration), axis=1)]
+
+
+class CVEnsembleClassifier(ClassifierMixin, BaseEstimator):
+    """
+    交叉驗證各 fold 已訓練的模型以平均機率（軟投票）組成的分類器
+
+    超參數搜尋保留最佳組合的 fold 模型組成此集成，不需再以最佳參數重新訓練最終模型；
+    params 記錄各 fold 模型使用的參數組合
+    """
+
+    def __init__(self, estimators, params=None):
+        self.estimators = estimators
+        self.params = params
+
+    @property
+    def classes_(self):
+        return self.estimators[0].classes_
+
+    def __sklearn_is_fitted__(self):
+        return True
+
+    def predict_proba(self, X):
+        return np.mean([estimator.predict_proba(X) for estimator in self.estimators], axis=0)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+# 會影響特徵分箱或訓練資料權重的 LightGBM 參數，網格中包含這些參數時每個組合各自建構 Dataset
+_BINNING_PARAMS = ('max_bin', 'max_bin_by_feature', 'min_data_in_bin', 'subsample_for_bin',
+                   'bin_construct_sample_cnt', 'feature_pre_filter', 'categorical_feature',
+                   'use_missing', 'zero_as_missing', 'linear_tree', 'random_state', 'seed',
+                   'class_weight', 'n_jobs')
+
+# 可放入搜尋網格的 DataPreprocess 參數，fold 快取依這些參數的設定分別保存前處理結果
+_PREPROCESS_PARAMS = ('categorical_threshold', 'encoding')
+
+
+class _FoldCache:
+    """
+    每個 fold 只擬合一次 DataPreprocess 並建構一次 lgb.Dataset（特徵分箱），所有參數組合共用
+
+    只在管線為 DataPreprocess + LGBMClassifier 且組合只改變前處理與 Booster 參數時使用；
+    網格包含前處理參數（DataPreprocess__*）時，每個 fold 的每種前處理設定各快取一份，
+    由使用該設定的所有 Booster 參數共用。
+    Dataset 保留原始資料（free_raw_data=False），即使分箱參數意外不同，LightGBM 也會自行重建
+    """
+
+    def __init__(self):
+        self._entries = {}
+
+    @staticmethod
+    def supports(estimator, params):
+        """此估計器與參數組合能否使用快取"""
+        if not isinstance(estimator, Pipeline) or list(estimator.named_steps) != ['DataPreprocess', 'model']:
+            return False
+        if not isinstance(estimator.named_steps['model'], LGBMClassifier):
+            return False
+        if estimator.named_steps['model'].class_weight is not None:
+            return False
+        if callable(estimator.named_steps['model'].objective):
+            return False
+        return all((key.startswith('DataPreprocess__')
+                    and key[len('DataPreprocess__'):] in _PREPROCESS_PARAMS)
+                   or (key.startswith('model__') and key[len('model__'):] not in _BINNING_PARAMS)
+                   for key in params)
+
+    @staticmethod
+    def split_params(params):
+        """將參數組合分為 (前處理參數, 模型參數)，皆已去除步驟名稱前綴"""
+        preprocess_params, model_params = {}, {}
+        for key, value in params.items():
+            step, name = key.split('__', 1)
+            (preprocess_params if step == 'DataPreprocess' else model_params)[name] = value
+        return preprocess_params, model_params
+
+    def get(self, estimator, X, y, train_index, test_index, preprocess_params=None):
+        """
+        取得 fold 在指定前處理設定下的快取，沒有時建立
+
+        參數:
+            preprocess_params (dict): 可選，覆寫 DataPreprocess 的參數（不含 'DataPreprocess__' 前綴）
+
+        回傳:
+            dict: {'X_test': 轉換後的驗證資料, 'y_test': 驗證目標, 'dataset': 已建構的 lgb.Dataset,
+                   'classes': 類別, 'preprocess': 已擬合的 DataPreprocess}
+        """
+        preprocess_params = preprocess_params or {}
+        key = (split_fingerprint([(train_index, test_index)]),
+               params_key(preprocess_params))
+        if key not in self._entries:
+            preprocess = clone(estimator.named_steps['DataPreprocess']).set_params(
+                **preprocess_params)
+            X_train = preprocess.fit_transform(_take_rows(X, train_index))
+            y_train = np.asarray(_take_rows(y, train_index))
+            classes = np.unique(y_train)
+            model = _BoosterClassifier(clone(estimator.named_steps['model']))
+            dataset = lgb.Dataset(X_train, label=np.searchsorted(classes, y_train),
+                                  params=model.booster_params(len(classes)),
+                                  free_raw_data=False).construct()
+            self._entries[key] = {
+                'X_test': preprocess.transform(_take_rows(X, test_index)),
+                'y_test': _take_rows(y, test_index),
+                'dataset': dataset,
+                'classes': classes,
+                'preprocess': preprocess,
+            }
+        return self._entries[key]
+
+    def retain(self, splits):
+        """只保留目前切分使用的 fold，釋放逐次減半前幾輪的快取"""
+        keys = {split_fingerprint([split]) for split in splits}
+        self._entries = {key: entry for key, entry in self._entries.items() if key[0] in keys}
+
+    def clear(self):
+        self._entries = {}
+
+
+# 搜尋時量測每列預測延遲的重複次數，取最短時間
+_LATENCY_REPEATS = 3
+
+
+def _model_size_bytes(model, num_iteration=None):
+    """模型序列化後的大小：LightGBM 以前 num_iteration 棵樹的文字格式計算，其他模型以 pickle 計算"""
+    booster = getattr(model, 'booster_', None)
+    if booster is None:
+        return len(pickle.dumps(model))
+    return len(booster.model_to_string(num_iteration=num_iteration).encode('utf-8'))
+
+
+def _predict_latency(predictor, X_test):
+    """每列預測秒數：取多次 predict_proba 的最短時間，降低計時干擾"""
+    best = np.inf
+    for _ in range(_LATENCY_REPEATS):
+        start = time.perf_counter()
+        predictor.predict_proba(X_test)
+        best = min(best, time.perf_counter() - start)
+    return best / max(1, len(X_test))
+
+
+def _score_fitted(predictor_for, X_test, y_test, scoring, n_iterations, metrics, fit_seconds,
+                  return_proba=False):
+    """
+    評估已訓練的模型，並量測每列的預測秒數
+
+    參數:
+        predictor_for (callable): 傳入樹數（None 表示全部）回傳可預測的分類器
+        return_proba (bool): 是否一併回傳驗證列的預測機率（'proba'，指定 n_iterations 時另有 'probas'）
+    """
+    tree_counts = [None] if n_iterations is None else n_iterations
+    predictors = {n: predictor_for(n) for n in tree_counts}
+    probas = {}
+    if metrics is not None:
+        # 每個模型只預測一次機率，所有指標由同一份機率計算
+        metric_scores = {}
+        for n, predictor in predictors.items():
+            probas[n] = predictor.predict_proba(X_test)
+            metric_scores[n] = score_from_proba(y_test, probas[n], predictor.classes_, metrics)
+        scores = {n: values[scoring] for n, values in metric_scores.items()}
+    else:
+        scorer = get_scorer(scoring)
+        scores = {n: scorer(predictor, X_test, y_test) for n, predictor in predictors.items()}
+        if return_proba:
+            probas = {n: predictor.predict_proba(X_test) for n, predictor in predictors.items()}
+    latencies = {n: _predict_latency(predictor, X_test) for n, predictor in predictors.items()}
+
+    full = tree_counts[-1]
+    result = {'score': scores[full], 'fit_seconds': fit_seconds, 'latency': latencies[full]}
+    if metrics is not None:
+        result['metrics'] = metric_scores[full]
+    if return_proba:
+        result['proba'] = probas[full]
+    if n_iterations is not None:
+        result['scores'] = scores
+        result['latencies'] = latencies
+        if metrics is not None:
+            result['metric_scores'] = metric_scores
+        if return_proba:
+            result['probas'] = probas
+    return result
+
+
+def _add_model_sizes(result, model, n_iterations):
+    """加入模型大小，指定 n_iterations 時另有每個樹數的大小"""
+    result['model_bytes'] = _model_size_bytes(model)
+    if n_iterations is not None:
+        result['model_sizes'] = {n: _model_size_bytes(model, n) for n in n_iterations}
+    return result
+
+
+def _fit_and_score(estimator, params, X, y, train_index, test_index, scoring,
+                   should_stop=None, n_iterations=None, metrics=None, fold_cache=None,
+                   return_model=False, return_proba=False):
+    """
+    以指定參數在單一 fold 上訓練並評分
+
+    參數:
+        estimator: 基礎估計器（不會被修改）
+        params (dict): 要設定的參數
+        X, y: 完整的搜尋資料
+        train_index, test_index: 此 fold 的訓練與驗證列索引
+        scoring (str): sklearn 評分指標名稱
+        should_stop (callable): 回傳 True 時中斷訓練並拋出 TrainingStoppedError
+        n_iterations (list): 可選，以同一個模型的前 n 棵樹分別評分（提升樹的前綴即為較少樹數的模型）
+        metrics (tuple): 可選，由一次 predict_proba 計算的多個指標，scoring 必須是其中之一
+        fold_cache (_FoldCache): 可選，重用此 fold 已擬合的前處理與已分箱的 Dataset
+        return_model (bool): 是否一併回傳已訓練的管線
+        return_proba (bool): 是否一併回傳驗證列的預測機率
+
+    回傳:
+        dict: {'score': 分數, 'fit_seconds': 訓練秒數, 'latency': 每列預測秒數,
+               'model_bytes': 模型大小}，
+              指定 n_iterations 時另有 'scores': {樹數: 分數}（與 'latencies'、'model_sizes'），
+              指定 metrics 時另有 'metrics': {指標: 分數}（與 'metric_scores': {樹數: {指標: 分數}}），
+              return_model 時另有 'model': 以全部樹預測的已訓練管線，
+              return_proba 時另有 'proba': 驗證列預測機率（與 'probas': {樹數: 機率}）
+    """
+    if fold_cache is not None and _FoldCache.supports(estimator, params):
+        preprocess_params, model_params = _FoldCache.split_params(params)
+        entry = fold_cache.get(estimator, X, y, train_index, test_index, preprocess_params)
+        model = clone(estimator.named_steps['model'])
+        model.set_params(**model_params)
+        predictor = _BoosterClassifier(model)
+        callbacks = [_make_stop_callback(should_stop)] if should_stop is not None else None
+
+        start = time.perf_counter()
+        predictor.fit_dataset(entry['dataset'], entry['classes'], callbacks)
+        fit_seconds = time.perf_counter() - start
+        result = _score_fitted(lambda n: _StagedPredictor(predictor, n),
+                               entry['X_test'], entry['y_test'], scoring, n_iterations,
+                               metrics, fit_seconds, return_proba)
+        _add_model_sizes(result, predictor, n_iterations)
+        if return_model:
+            # 不保留快取的 Dataset 參照，模型可獨立於快取保存
+            predictor.booster_.free_dataset()
+            result['model'] = Pipeline([('DataPreprocess', entry['preprocess']),
+                                        ('model', predictor)])
+        return result
+
+    model = clone(estimator)
+    model.set_params(**params)
+    fit_params = {}
+    if should_stop is not None and isinstance(model, Pipeline) and 'model' in model.named_steps:
+        fit_params['model__callbacks'] = [_make_stop_callback(should_stop)]
+
+    start = time.perf_counter()
+    model.fit(_take_rows(X, train_index), _take_rows(y, train_index), **fit_params)
+    fit_seconds = time.perf_counter() - start
+
+    # 驗證資料先經過前處理，預測延遲只計算模型本身（與使用 fold 快取時相同）
+    X_test, final = _take_rows(X, test_index), model
+    if isinstance(model, Pipeline) and len(model.steps) > 1:
+        X_test, final = model[:-1].transform(X_test), model.steps[-1][1]
+    result = _score_fitted(lambda n: final if n is None else _StagedPredictor(final, n),
+                           X_test, _take_rows(y, test_index), scoring, n_iterations, metrics,
+                           fit_seconds, return_proba)
+    _add_model_sizes(result, final, n_iterations)
+    if return_model:
+        result['model'] = model
+    return result
+
+
+# 平行搜尋工作者行程的共用狀態，由 _init_search_worker 在每個工作者啟動時設定一次
+_search_worker_state = {}
+
+
+def _init_search_worker(stop_event, estimator, X, y, n_threads, cache_folds=False):
+    """平行搜尋工作者初始化：保存共用資料並限制原生執行緒池"""
+    _search_worker_state.update({
+        'stop_event': stop_event,
+        'estimator': estimator,
+        'X': X,
+        'y': y,
+        # 每個工作者各自快取它處理過的 fold
+        'fold_cache': _FoldCache() if cache_folds else None,
+        # 保留參照，讓執行緒限制在工作者的整個生命週期中有效
+        'thread_limits': threadpool_limits(limits=n_threads)
+    })
+
+
+def _run_search_task(params, train_index, test_index, scoring, n_iterations=None,
+                     metrics=None, return_model=False, return_proba=False):
+    """平行搜尋工作者執行單一 (參數組合, fold) 任務，已收到停止請求時回傳 None"""
+    state = _search_worker_state
+    stop_event = state['stop_event']
+    if stop_event.is_set():
+        return None
+    try:
+        return _fit_and_score(state['estimator'], params, state['X'], state['y'],
+                              train_index, test_index, scoring,
+                              should_stop=stop_event.is_set, n_iterations=n_iterations,
+                              metrics=metrics, fold_cache=state['fold_cache'],
+                              return_model=return_model, return_proba=return_proba)
+    except TrainingStoppedError:
+        return None
+
+
 class StoppableGridSearchCV:
     """可停止的超參數搜尋類別"""
 
-    def __init__(self, estimator, param_grid, scoring, cv, verbose=0, n_jobs=1):
+    SEARCH_MODES = ('grid', 'halving', 'multi_fidelity')
+    HALVING_RESOURCES = ('n_samples', 'n_estimators')
+
+    def __init__(self, estimator, param_grid, scoring, cv, verbose=0, n_jobs=1,
+                 search_mode='grid', factor=3, resource='n_samples', min_resources=50,
+                 random_state=0, staged_n_estimators=True, trial_store=None, pruner=None,
+                 coordinator=None, metrics=None, cache_folds=True, time_budget_seconds=None,
+                 subsample=0.2, top_k=5, keep_fold_models=True, latency_tolerance=None,
+                 oof_dir=None):
         self.estimator = estimator
         self.param_grid = param_grid
         self.scoring = scoring
         self.cv = cv
         self.verbose = verbose
+        # n_jobs > 1 時以多個工作者行程平行執行各參數組合與 fold，
+        # 工作者共用跨行程停止事件，停止按鈕仍可中斷搜尋
         self.n_jobs = n_jobs
+        # 'halving' 為逐次減半搜尋：所有組合先以小預算（較少資料列或較少樹）評估，
+        # 每輪保留前 1/factor 的組合並將預算乘以 factor，最後一輪使用完整預算
+        self.search_mode = search_mode
+        self.factor = factor
+        self.resource = resource
+        self.min_resources = min_resources  # 每輪預算的下限（資料列數或樹數）
+        self.random_state = random_state
+        # 只差在 model__n_estimators 的組合共用一次訓練，較少樹數以前 n 棵樹的預測評分
+        self.staged_n_estimators = staged_n_estimators
+        # 試驗記錄：SQLite 檔案路徑或 TrialStore，已評估的 (參數組合, fold) 重新執行時直接載入
+        self.trial_store = trial_store
+        # 剪枝器：'median'、'bound' 或剪枝器物件，部分 fold 後已無機會勝出的組合提前放棄
+        self.pruner = get_pruner(pruner)
+        # 分散式協調者（TuningCoordinator）：設定時任務交給遠端工作者執行，n_jobs 不再使用
+        self.coordinator = coordinator
+        # 額外記錄的指標：每個 fold 只呼叫一次 predict_proba 並計算所有指標，
+        # scoring 為排序用的指標（必須是 proba_metrics 支援的指標）
+        self.metrics = metrics
+        # 每個 fold 只擬合一次前處理並建構一次 LightGBM Dataset，所有組合共用；
+        # 網格包含前處理或分箱參數的組合不使用快取
+        self.cache_folds = cache_folds
+        # 時間預算（秒）：依已量測的每棵樹訓練成本略過來不及完成的組合，
+        # 到期時中斷進行中的訓練並回傳目前最佳結果；None 表示不限時間
+        self.time_budget_seconds = time_budget_seconds
+        # 'multi_fidelity' 為兩階段搜尋：第一階段在每個訓練 fold 的分層抽樣（subsample 比例）上
+        # 評估所有組合，第二階段只以完整資料重新評估前 top_k 個組合
+        self.subsample = subsample
+        self.top_k = top_k
+        # 保留最佳組合各 fold 已訓練的模型，best_estimator_ 為其軟投票集成（CVEnsembleClassifier），
+        # 可直接預測；False 時 best_estimator_ 為設定最佳參數、尚未訓練的估計器
+        self.keep_fold_models = keep_fold_models
+        # 延遲容忍：設定時不取最高分的組合，而是分數不低於最高分減此值的組合中每列預測最快者；
+        # None 表示只依分數選擇
+        self.latency_tolerance = latency_tolerance
+        # out-of-fold 預測資料夾：每個試驗的驗證 fold 預測機率寫入以資料列位置為索引的記憶體映射陣列
+        # （ai_utils/oof_store.py），門檻調整、校準與堆疊可直接載入；None 表示不保存
+        self.oof_dir = oof_dir
 
         # 結果儲存
         self.best_params_ = None
@@ -61,87 +541,957 @@ class StoppableGridSearchCV:
         self.cv_results_ = []
         self.total_combinations_ = 0
         self.completed_combinations_ = 0
+        self.pruned_combinations_ = 0
+        self.skipped_combinations_ = 0
+        self.interrupted_combinations_ = 0
+        self.coverage_ = None
+        self.speedup_ = None
+        self.eta_seconds_ = None
+        self.pareto_front_ = []
+        self._best_key = None
+        self._executor = None
+        self._stop_event = None
+        self._store = None
+        self._oof = None
+        self._rung = 0
+        self._n_resources = None
+        self._metrics = None
+        self._fold_cache = _FoldCache()
+        self._start_time = None
+        self._deadline_reached = False
+        self._fit_cost = [0.0, 0.0]
+        self._planned_work = 0
+        self._fold_models = {}  # {組合索引: {fold: 已訓練模型}}，只保留評估中與最佳的組合
+        self._best_fold_models = {}
+        self._near_best_models = {}  # 延遲容忍內各組合的 fold 模型 {組合索引: (排序鍵, {fold: 模型})}
+        self._splits = None
+        self._best_splits = None
 
     def fit(self, X, y):
         """執行可停止的網格搜尋"""
+        self._prepare_metrics()
+        if self.search_mode not in self.SEARCH_MODES:
+            raise ValueError(f"search_mode 必須為 {self.SEARCH_MODES} 之一，但得到: {self.search_mode}")
+        if self.search_mode == 'halving' and self.resource not in self.HALVING_RESOURCES:
+            raise ValueError(f"resource 必須為 {self.HALVING_RESOURCES} 之一，但得到: {self.resource}")
+        if self.search_mode == 'multi_fidelity' and (not 0 < self.subsample <= 1 or self.top_k < 1):
+            raise ValueError(f"subsample 必須介於 0 與 1 之間且 top_k 至少為 1，"
+                             f"但得到: subsample={self.subsample}, top_k={self.top_k}")
+        self._check_latency_tolerance()
+
         param_list = list(ParameterGrid(self.param_grid))
-        self.total_combinations_ = len(param_list)
+        splits = list(check_cv(self.cv, y, classifier=True).split(X, y))
+        candidates = [(i, params, params) for i, params in enumerate(param_list)]
+        schedule = self._search_schedule(len(param_list))
+        self._planned_work = sum(n_rows * n_trees for n_rows, n_trees in self.planned_fits(
+            int(np.mean([len(train_index) for train_index, _ in splits]))))
+
+        if self.search_mode == 'halving':
+            self.total_combinations_ = sum(n for n, _ in schedule)
+            print(f"開始逐次減半超參數搜尋，共 {len(param_list)} 個參數組合，"
+                  f"{len(schedule)} 輪，{self.total_combinations_} 次組合評估...")
+        elif self.search_mode == 'multi_fidelity':
+            self.total_combinations_ = sum(n for n, _ in schedule)
+            print(f"開始多精度超參數搜尋，共 {len(param_list)} 個參數組合："
+                  f"先以 {self.subsample:.0%} 訓練資料評估全部組合，"
+                  f"再以完整資料確認前 {schedule[1][0]} 個組合...")
+        else:
+            self.total_combinations_ = len(param_list)
+            print(f"開始可停止的超參數搜尋，共 {self.total_combinations_} 個參數組合...")
+
+        self._fold_cache.clear()  # 快取只屬於這次搜尋的資料
+        self._start_clock()
+        self._open_store(X, y)
+        self._open_oof(X, y)
+        self._open_pool(X, y)
+        try:
+            if self.search_mode == 'halving':
+                stopped = self._fit_halving(X, y, candidates, splits, schedule)
+            elif self.search_mode == 'multi_fidelity':
+                stopped = self._fit_multi_fidelity(X, y, candidates, splits, schedule)
+            else:
+                stopped = self._run_candidates(X, y, candidates, splits)
+        finally:
+            self._close_pool()
+            self._close_store()
+
+        return self._finish(stopped, X, y)
+
+    def _finish(self, stopped, X, y):
+        """整理搜尋結果，被停止且沒有任何結果時回傳 None"""
+        self._fold_cache.clear()
+        self._fold_models = {}
+        # 結果依輪次與參數組合順序排列，與循序執行一致
+        self.cv_results_.sort(
+            key=lambda result: (result['iter'], result['candidate_index']))
+        self.pareto_front_ = self._pareto_front()
+        if self.verbose > 0:
+            self._report_pareto_front()
+        if self.latency_tolerance is not None and self.best_params_ is not None:
+            self._select_fastest_within_tolerance()
+        self._near_best_models = {}
+        if self.keep_fold_models and self.best_params_ is not None:
+            self._build_best_ensemble(X, y, allow_refit=not stopped)
+        if self.time_budget_seconds is not None:
+            self._report_coverage()
+
+        if stopped and self._deadline_reached and not is_training_stopped():
+            if self.best_params_ is not None:
+                print(f"⏱️ 時間預算用完，返回目前最佳結果 (分數: {self.best_score_:.4f})")
+                return self
+            print("⏱️ 時間預算用完，尚未完成任何參數組合")
+            return None
+        if stopped:
+            if self.best_params_ is not None:
+                print(f"[停止機制] 返回目前最佳結果 (分數: {self.best_score_:.4f})")
+                return self
+            print("[停止機制] 尚未完成任何參數組合，返回空結果")
+            return None
+
+        print(f"✅ 超參數搜尋完成，測試了 {self.completed_combinations_} 個參數組合")
+        if self.pruned_combinations_:
+            print(f"   其中 {self.pruned_combinations_} 個組合在部分 fold 後被剪枝")
+        return self
+
+    def _check_latency_tolerance(self):
+        if self.latency_tolerance is not None and self.latency_tolerance < 0:
+            raise ValueError(f"latency_tolerance 必須大於或等於 0，但得到: {self.latency_tolerance}")
+
+    def _pareto_front(self):
+        """
+        分數與每列預測延遲的 Pareto 前緣：沒有其他組合同時分數更高且預測更快
+
+        只比較最高輪次（完整預算）且未被剪枝、有延遲量測的組合，依延遲由快到慢排列
+        """
+        records = [r for r in self.cv_results_
+                   if not r['pruned'] and np.isfinite(r['mean_latency'])]
+        if not records:
+            return []
+        final_rung = max(r['iter'] for r in records)
+        records = sorted((r for r in records if r['iter'] == final_rung),
+                         key=lambda r: (r['mean_latency'], -r['mean_test_score']))
+        front = []
+        for record in records:
+            if not front or record['mean_test_score'] > front[-1]['mean_test_score']:
+                front.append(record)
+        return front
+
+    def _report_pareto_front(self):
+        """輸出分數與預測延遲的 Pareto 前緣"""
+        if not self.pareto_front_:
+            return
+        print(f"📉 分數與預測延遲的 Pareto 前緣（{len(self.pareto_front_)} 個組合）：")
+        for record in self.pareto_front_:
+            print(f"   組合 {record['candidate_index']+1}: 分數 {record['mean_test_score']:.4f}，"
+                  f"每列 {record['mean_latency'] * 1e6:.2f} µs，"
+                  f"模型 {format_bytes(record['mean_model_bytes'])}，{record['params']}")
+
+    def _select_fastest_within_tolerance(self):
+        """在最佳分數的容忍範圍內改選每列預測最快的組合"""
+        threshold = self.best_score_ - self.latency_tolerance
+        eligible = [r for r in self.pareto_front_ if r['mean_test_score'] >= threshold]
+        if not eligible:
+            return
+        fastest = eligible[0]
+        best_index = -self._best_key[2]
+        if fastest['candidate_index'] == best_index:
+            return
+        # 最高分組合可能不在前緣上：同分但有更快的組合，或沿用舊試驗記錄而沒有延遲量測
+        best = self._best_record()
+        print(f"⚡ 延遲容忍 {self.latency_tolerance}：改選組合 {fastest['candidate_index']+1} "
+              f"(分數 {fastest['mean_test_score']:.4f}，每列 {fastest['mean_latency'] * 1e6:.2f} µs)，"
+              f"最高分組合 {best_index+1} "
+              f"(分數 {best['mean_test_score']:.4f}，每列 {best['mean_latency'] * 1e6:.2f} µs)")
+        self.best_score_ = fastest['mean_test_score']
+        self.best_params_ = fastest['params'].copy()
+        self.best_estimator_ = self._clone_estimator_with_params(fastest['params'])
+        self._best_key = (fastest['iter'], fastest['mean_test_score'], -fastest['candidate_index'])
+        _, self._best_fold_models = self._near_best_models.get(
+            fastest['candidate_index'], (None, {}))
+
+    def _build_best_ensemble(self, X, y, allow_refit):
+        """
+        以最佳組合各 fold 的模型組成 best_estimator_
+
+        從試驗記錄載入或由遠端工作者評估的 fold 沒有模型，搜尋正常結束時在本機補訓練；
+        被停止時不再訓練，best_estimator_ 維持尚未訓練的估計器
+        """
+        missing = [fold for fold in range(len(self._best_splits))
+                   if fold not in self._best_fold_models]
+        if missing:
+            if not allow_refit:
+                print(f"⚠️ 最佳組合缺少 {len(missing)} 個 fold 模型，搜尋已中止，不組成集成模型")
+                return
+            print(f"🔁 最佳組合有 {len(missing)} 個 fold 模型來自試驗記錄或遠端工作者，在本機補訓練...")
+            for fold in missing:
+                train_index, _ = self._best_splits[fold]
+                model = self._clone_estimator_with_params(self.best_params_)
+                model.fit(_take_rows(X, train_index), _take_rows(y, train_index))
+                self._best_fold_models[fold] = model
+        self.best_estimator_ = CVEnsembleClassifier(
+            [self._best_fold_models[fold] for fold in range(len(self._best_splits))],
+            params=dict(self.best_params_))
+        print(f"🧩 以最佳組合的 {len(self._best_splits)} 個 fold 模型組成軟投票集成模型 (best_estimator_)")
+
+    def _start_clock(self):
+        """開始計時並重設訓練成本量測"""
+        self._start_time = time.perf_counter()
+        self._deadline_reached = False
+        self._fit_cost = [0.0, 0.0]  # 已量測的 (訓練秒數, 樹數 × 訓練列數)
+        self.skipped_combinations_ = 0
+        self.interrupted_combinations_ = 0
+
+    def _elapsed(self):
+        return time.perf_counter() - self._start_time
+
+    def _past_deadline(self):
+        """是否已超過時間預算"""
+        if self.time_budget_seconds is not None and not self._deadline_reached:
+            self._deadline_reached = self._elapsed() >= self.time_budget_seconds
+        return self._deadline_reached
+
+    def _should_stop(self):
+        """訓練中的停止檢查：使用者停止或時間預算用完"""
+        return is_training_stopped() or self._past_deadline()
+
+    def _n_trees(self, fit_params):
+        """組合訓練的樹數"""
+        return fit_params.get('model__n_estimators',
+                              self.estimator.get_params().get('model__n_estimators', 100))
+
+    def _observe_cost(self, fit_params, n_rows, fit_seconds):
+        """累計訓練成本，用於估計其餘組合的訓練時間"""
+        self._fit_cost[0] += fit_seconds
+        self._fit_cost[1] += self._n_trees(fit_params) * n_rows
+
+    def _estimate_seconds(self, fit_params, n_rows, n_folds):
+        """依已量測的每棵樹每列訓練秒數估計組合的訓練時間，尚未量測時回傳 0"""
+        seconds, work = self._fit_cost
+        if work == 0:
+            return 0.0
+        return seconds / work * self._n_trees(fit_params) * n_rows * n_folds
+
+    def _report_coverage(self):
+        """整理並輸出時間預算內的搜尋涵蓋範圍"""
+        evaluated = self.completed_combinations_ - self.pruned_combinations_
+        self.coverage_ = {
+            'time_budget_seconds': self.time_budget_seconds,
+            'elapsed_seconds': self._elapsed(),
+            'deadline_reached': self._deadline_reached,
+            'total_combinations': self.total_combinations_,
+            'evaluated_combinations': evaluated,
+            'pruned_combinations': self.pruned_combinations_,
+            'skipped_combinations': self.skipped_combinations_,
+            'interrupted_combinations': self.interrupted_combinations_,
+            'coverage': evaluated / self.total_combinations_ if self.total_combinations_ else 0.0,
+        }
+        print(f"⏱️ 時間預算 {self.time_budget_seconds} 秒，"
+              f"實際使用 {self.coverage_['elapsed_seconds']:.1f} 秒："
+              f"完成 {evaluated}/{self.total_combinations_} 個組合 ({self.coverage_['coverage']:.1%})，"
+              f"剪枝 {self.pruned_combinations_} 個，略過 {self.skipped_combinations_} 個，"
+              f"中斷 {self.interrupted_combinations_} 個")
+
+    @property
+    def best_metrics_(self):
+        """最佳組合各指標的平均分數，未使用多指標時為 None"""
+        if self._metrics is None or self.best_params_ is None:
+            return None
+        best = self._best_record()
+        return {name: best[f'mean_test_{name}'] for name in self._metrics}
+
+    @property
+    def best_oof_(self):
+        """最佳組合的 out-of-fold 預測機率（唯讀記憶體映射），未設定 oof_dir 時為 None"""
+        if not self.oof_dir or self.best_params_ is None:
+            return None
+        best = self._best_record()
+        return load_oof(self.oof_dir, best['params'], best['iter'], best['n_resources'])
+
+    def _best_record(self):
+        """最佳組合在 cv_results_ 中的記錄"""
+        candidate_index = -self._best_key[2]
+        return next(r for r in self.cv_results_
+                    if r['candidate_index'] == candidate_index and r['iter'] == self._best_key[0])
+
+    def _prepare_metrics(self):
+        """檢查額外指標，排序用的 scoring 排在第一個"""
+        self._metrics = None
+        if self.metrics is not None:
+            self._metrics = validate_metrics((self.scoring,) + tuple(self.metrics))
+
+    @property
+    def _store_scoring(self):
+        """試驗記錄的評分鍵：多指標模式的結果與排序指標無關，切換排序指標時可直接重用"""
+        return 'proba_metrics' if self._metrics is not None else self.scoring
+
+    def _search_schedule(self, n_candidates):
+        """搜尋模式的每輪 (組合數, 預算比例)，網格搜尋只有一輪完整預算"""
+        if self.search_mode == 'halving':
+            return self._halving_schedule(n_candidates)
+        if self.search_mode == 'multi_fidelity':
+            return [(n_candidates, self.subsample), (min(self.top_k, n_candidates), 1.0)]
+        return [(n_candidates, 1.0)]
+
+    def _n_folds(self):
+        return check_cv(self.cv, classifier=True).get_n_splits()
+
+    def planned_fits(self, n_rows):
+        """
+        估計整個搜尋的所有訓練（未考慮剪枝、試驗記錄與時間預算）
+
+        參數:
+            n_rows (int): 每個 fold 的訓練列數
+
+        回傳:
+            list: [(訓練列數, 樹數), ...]，每個元素為一次 fold 訓練；
+                  逐次減半後幾輪的組合尚未決定，以前段組合估計
+        """
+        param_list = list(ParameterGrid(self.param_grid))
+        candidates = [(i, params, params) for i, params in enumerate(param_list)]
+        row_budget = (self.search_mode == 'multi_fidelity'
+                      or (self.search_mode == 'halving' and self.resource == 'n_samples'))
+        fits = []
+        for n_keep, fraction in self._search_schedule(len(param_list)):
+            rung_candidates = candidates[:n_keep]
+            rung_rows = n_rows
+            if row_budget:
+                rung_rows = min(max(int(round(n_rows * fraction)), self.min_resources), n_rows)
+            elif self.search_mode == 'halving':
+                rung_candidates = [(i, params, self._with_tree_budget(params, fraction))
+                                   for i, params, _ in rung_candidates]
+            for _, fit_params, _ in self._group_candidates(rung_candidates):
+                fits += [(rung_rows, self._n_trees(fit_params))] * self._n_folds()
+        return fits
+
+    def _halving_schedule(self, n_candidates):
+        """
+        計算逐次減半的每輪 (組合數, 預算比例)
+
+        最後一輪使用完整預算，往前每輪預算除以 factor、組合數乘以 factor
+        """
+        n_rounds = 1
+        while self.factor ** n_rounds <= n_candidates:
+            n_rounds += 1
+        schedule = []
+        n_remaining = n_candidates
+        for i in range(n_rounds):
+            schedule.append((n_remaining, 1.0 / self.factor ** (n_rounds - 1 - i)))
+            n_remaining = max(1, int(np.ceil(n_remaining / self.factor)))
+        return schedule
+
+    def _fit_multi_fidelity(self, X, y, candidates, splits, schedule):
+        """兩階段多精度搜尋，回傳是否被停止，並記錄與完整網格相比的加速"""
+        stage_seconds = []
+        stage_start = time.perf_counter()
+
+        def on_rung_end(rung):
+            nonlocal stage_start
+            stage_seconds.append(time.perf_counter() - stage_start)
+            stage_start = time.perf_counter()
+
+        stopped = self._fit_halving(X, y, candidates, splits, schedule, resource='n_samples',
+                                    on_rung_end=on_rung_end)
+        if len(stage_seconds) == 2:
+            # 完整網格的成本以第二階段（完整資料）每組訓練的平均時間估計
+            n_full_groups = len(self._group_candidates(candidates))
+            confirmed = [c for c in candidates
+                         if any(r['iter'] == 1 and r['candidate_index'] == c[0]
+                                for r in self.cv_results_)]
+            n_confirmed_groups = max(len(self._group_candidates(confirmed)), 1)
+            full_grid_seconds = stage_seconds[1] / n_confirmed_groups * n_full_groups
+            self.speedup_ = {
+                'subsample_seconds': stage_seconds[0],
+                'confirm_seconds': stage_seconds[1],
+                'estimated_full_grid_seconds': full_grid_seconds,
+                'speedup': full_grid_seconds / max(sum(stage_seconds), 1e-9),
+            }
+            print(f"⚡ 多精度搜尋：抽樣階段 {stage_seconds[0]:.1f} 秒，確認階段 "
+                  f"{stage_seconds[1]:.1f} 秒；完整資料網格估計需 {full_grid_seconds:.1f} 秒，"
+                  f"加速約 {self.speedup_['speedup']:.1f} 倍")
+        return stopped
+
+    def _fit_halving(self, X, y, candidates, splits, schedule, resource=None,
+                     on_rung_end=None):
+        """逐次減半搜尋（多精度搜尋為兩輪的特例），回傳是否被停止"""
+        y_array = np.asarray(y)
+        resource = resource or self.resource
+        for rung, (n_keep, fraction) in enumerate(schedule):
+            candidates = candidates[:n_keep]
+            rung_splits = splits
+            rung_candidates = candidates
+            if resource == 'n_samples':
+                rung_splits = [(self._subsample(train_index, y_array, fraction), test_index)
+                               for train_index, test_index in splits]
+                n_resources = int(np.mean([len(train) for train, _ in rung_splits]))
+            else:
+                rung_candidates = [(i, params, self._with_tree_budget(params, fraction))
+                                   for i, params, _ in candidates]
+                n_resources = max(fit_params['model__n_estimators']
+                                  for _, _, fit_params in rung_candidates)
+
+            stage = '多精度搜尋第' if self.search_mode == 'multi_fidelity' else '逐次減半第'
+            print(f"\n--- {stage} {rung+1}/{len(schedule)} 輪：{len(candidates)} 個組合，"
+                  f"預算 {fraction:.1%} ({resource}={n_resources}) ---")
+            if self._run_candidates(X, y, rung_candidates, rung_splits,
+                                    rung=rung, n_resources=n_resources):
+                return True
+
+            # 依本輪分數保留前段組合（同分時保留順序較前的組合），未完成的組合直接淘汰
+            scores = {result['candidate_index']: result['mean_test_score']
+                      for result in self.cv_results_
+                      if result['iter'] == rung and not result['pruned']}
+            candidates = sorted((c for c in candidates if c[0] in scores),
+                                key=lambda c: (-scores[c[0]], c[0]))
+            if on_rung_end is not None:
+                on_rung_end(rung)
+            if not candidates:
+                break
+        return False
+
+    def _subsample(self, train_index, y_array, fraction):
+        """依目標類別分層抽取訓練 fold 的部分資料列"""
+        n_rows = max(int(round(len(train_index) * fraction)), self.min_resources)
+        if n_rows >= len(train_index):
+            return train_index
+        subset, _ = train_test_split(train_index, train_size=n_rows,
+                                     stratify=y_array[train_index],
+                                     random_state=self.random_state)
+        return np.sort(subset)
+
+    def _with_tree_budget(self, params, fraction):
+        """依預算比例縮減樹的數量"""
+        n_estimators = params.get('model__n_estimators',
+                                  self.estimator.get_params()['model__n_estimators'])
+        budget = max(int(round(n_estimators * fraction)), self.min_resources)
+        return dict(params, model__n_estimators=min(budget, n_estimators))
+
+    def _run_candidates(self, X, y, candidates, splits, rung=0, n_resources=None):
+        """
+        評估一批參數組合，回傳是否被停止
+
+        參數:
+            candidates (list): [(組合索引, 顯示參數, 實際訓練參數), ...]
+            splits (list): [(訓練列索引, 驗證列索引), ...]
+            rung (int): 逐次減半的輪次，網格搜尋為 0
+            n_resources (int): 本輪預算，網格搜尋為 None
+        """
+        groups = self._group_candidates(candidates)
+        self._fold_cache.retain(splits)
+        self._splits = splits
+        self._rung, self._n_resources = rung, n_resources
+        split_key = split_fingerprint(splits) if self._store is not None else None
+        fold_results = self._load_stored_results(candidates, split_key)
+        if self._executor is not None:
+            return self._run_parallel(X, y, groups, splits, rung, n_resources,
+                                      fold_results, split_key)
+        return self._run_serial(X, y, groups, splits, rung, n_resources,
+                                fold_results, split_key)
+
+    def _group_candidates(self, candidates):
+        """
+        將只差在 model__n_estimators 的組合合併為一組，每個 fold 只以最大樹數訓練一次
+
+        回傳:
+            list: [(組合列表, 訓練參數, 要評分的樹數列表或 None), ...]，依第一個組合的順序排列
+        """
+        groups = {}
+        for candidate in candidates:
+            fit_params = candidate[2]
+            if self.staged_n_estimators and 'model__n_estimators' in fit_params:
+                key = repr(sorted((k, v) for k, v in fit_params.items()
+                                  if k != 'model__n_estimators'))
+            else:
+                key = ('single', candidate[0])
+            groups.setdefault(key, []).append(candidate)
+
+        result = []
+        for members in groups.values():
+            if len(members) == 1:
+                result.append((members, members[0][2], None))
+                continue
+            n_iterations = sorted({fit_params['model__n_estimators']
+                                   for _, _, fit_params in members})
+            fit_params = dict(members[0][2], model__n_estimators=n_iterations[-1])
+            result.append((members, fit_params, n_iterations))
+        return result
 
-        print(f"開始可停止的超參數搜尋，共 {self.total_combinations_} 個參數組合...")
+    @staticmethod
+    def _split_group_result(members, n_iterations, result):
+        """將一次訓練的 fold 結果拆成同組每個參數組合的結果"""
+        if n_iterations is None:
+            member_result = {'score': result['score'], 'fit_seconds': result['fit_seconds']}
+            for key in ('metrics', 'latency', 'model_bytes'):
+                if key in result:
+                    member_result[key] = result[key]
+            return {members[0][0]: member_result}
+        split = {}
+        for i, _, fit_params in members:
+            n = fit_params['model__n_estimators']
+            split[i] = {'score': result['scores'][n], 'fit_seconds': result['fit_seconds']}
+            for key, per_tree_count in (('metrics', 'metric_scores'), ('latency', 'latencies'),
+                                        ('model_bytes', 'model_sizes')):
+                if per_tree_count in result:
+                    split[i][key] = result[per_tree_count][n]
+        return split
+
+    @staticmethod
+    def _missing_folds(members, fold_results, n_folds):
+        """同組中任一參數組合尚未完成的 fold"""
+        return [fold for fold in range(n_folds)
+                if any(fold not in fold_results[i] for i, _, _ in members)]
+
+    def _complete_fold(self, members, n_iterations, fold, result, fold_results, split_key):
+        """保存一個 fold 的訓練結果與模型，並寫入試驗記錄與 out-of-fold 預測"""
+        if self._oof is not None:
+            self._write_oof(members, n_iterations, fold, result)
+        if 'model' in result:
+            # 同組的組合共用一個模型，各自以自己的樹數預測
+            for i, _, fit_params in members:
+                model = result['model']
+                if n_iterations is not None:
+                    model = _StagedPredictor(model, fit_params['model__n_estimators'])
+                self._fold_models.setdefault(i, {})[fold] = model
+        for i, member_result in self._split_group_result(members, n_iterations, result).items():
+            if fold in fold_results[i]:
+                continue
+            fold_results[i][fold] = member_result
+            if self._store is not None:
+                fit_params = next(c[2] for c in members if c[0] == i)
+                self._store.save(self._store_dataset, split_key, self._store_scoring,
+                                 self._trial_params(fit_params), fold, member_result)
+
+    def _record_group(self, members, fold_results, n_folds, rung, n_resources, pruned=False):
+        """依組合順序記錄同一組的每個參數組合（被剪枝時只記錄已完成的 fold）"""
+        for i, params, _ in members:
+            results = [fold_results[i][k] for k in range(n_folds) if k in fold_results[i]]
+            self._record_candidate(i, params, results, rung, n_resources, pruned=pruned)
+        if self.verbose > 0:
+            self._report_eta()
+
+    def _report_eta(self):
+        """依目前量測的每棵樹每列訓練秒數更新剩餘時間估計"""
+        seconds, work = self._fit_cost
+        if work == 0 or not self._planned_work:
+            return
+        n_parallel = 1
+        if self._executor is not None:
+            n_parallel = (max(1, len(self.coordinator.workers)) if self.coordinator is not None
+                          else self.n_jobs)
+        self.eta_seconds_ = max(self._planned_work - work, 0) * seconds / work / n_parallel
+        finish = pd.Timestamp.now() + pd.Timedelta(seconds=self.eta_seconds_)
+        print(f"   ⏳ 已用 {format_duration(self._elapsed())}，預估剩餘 "
+              f"{format_duration(self.eta_seconds_)}（約 {finish.strftime('%H:%M:%S')} 完成）")
+
+    def _should_prune_group(self, members, fold_results, n_folds, rung):
+        """同組所有參數組合都已無機會勝出時放棄整組"""
+        if self.pruner is None:
+            return False
+        completed_scores = [result['cv_scores'] for result in self.cv_results_
+                            if result['iter'] == rung and not result['pruned']]
+        for i, _, _ in members:
+            partial = [fold_results[i][k]['score'] for k in sorted(fold_results[i])]
+            if not self.pruner.should_prune(partial, n_folds, completed_scores):
+                return False
+        return True
+
+    def _prune_group(self, members, fold_results, n_folds, rung, n_resources):
+        """記錄被剪枝的組合"""
+        i, params, _ = members[0]
+        n_done = min(len(fold_results[c[0]]) for c in members)
+        print(f"   ✂️ 組合 {i+1} 在完成 {n_done}/{n_folds} 個 fold 後被剪枝: {params}")
+        self._record_group(members, fold_results, n_folds, rung, n_resources, pruned=True)
+
+    def _run_serial(self, X, y, groups, splits, rung, n_resources, fold_results, split_key):
+        """循序執行參數組合，回傳是否被停止"""
+        n_folds = len(splits)
+        for members, fit_params, n_iterations in groups:
+            i, params, _ = members[0]
+            missing = self._missing_folds(members, fold_results, n_folds)
+            if not missing:  # 所有 fold 都已在試驗記錄中
+                self._record_group(members, fold_results, n_folds, rung, n_resources)
+                continue
 
-        for i, params in enumerate(param_list):
             # 每次迭代前檢查停止標誌
             if is_training_stopped():
                 print(
                     f"[停止機制] 超參數搜尋在第 {i+1}/{self.total_combinations_} 個組合時被停止")
-                if self.best_params_ is not None:
-                    print(f"[停止機制] 返回目前最佳結果 (分數: {self.best_score_:.4f})")
-                    return self
-                else:
-                    print("[停止機制] 尚未完成任何參數組合，返回空結果")
-                    return None
+                return True
+            if self._past_deadline():
+                print(f"⏱️ 已達時間預算，停止於第 {i+1}/{self.total_combinations_} 個組合")
+                return True
+            if self.time_budget_seconds is not None:
+                # 預估來不及完成的組合直接略過，剩餘時間留給較便宜的組合
+                estimate = self._estimate_seconds(fit_params, len(splits[missing[0]][0]),
+                                                  len(missing))
+                if estimate > self.time_budget_seconds - self._elapsed():
+                    self.skipped_combinations_ += len(members)
+                    if self.verbose > 0:
+                        print(f"   ⏭️ 組合 {i+1} 預估需要 {estimate:.1f} 秒，超過剩餘時間，略過")
+                    continue
 
             if self.verbose > 0:
                 print(f"[{i+1}/{self.total_combinations_}] 測試參數組合: {params}")
+                if n_iterations is not None:
+                    print(f"   以 {n_iterations[-1]} 棵樹訓練一次，"
+                          f"同時評估 n_estimators={n_iterations}")
 
-            # 設定參數並訓練模型
-            model_clone = self._clone_estimator_with_params(params)
-
+            pruned = False
             try:
-                # 執行交叉驗證
-                cv_scores = cross_val_score(
-                    model_clone, X, y,
-                    cv=self.cv,
-                    scoring=self.scoring,
-                    n_jobs=1  # 設為1避免並行時的停止檢查問題
-                )
-
-                mean_score = np.mean(cv_scores)
-                std_score = np.std(cv_scores)
-
-                # 儲存結果
-                self.cv_results_.append({
-                    'params': params,
-                    'mean_test_score': mean_score,
-                    'std_test_score': std_score,
-                    'cv_scores': cv_scores
-                })
-
-                # 更新最佳結果
-                if mean_score > self.best_score_:
-                    self.best_score_ = mean_score
-                    self.best_params_ = params.copy()
-                    self.best_estimator_ = model_clone
-
-                if self.verbose > 0:
-                    print(f"   分數: {mean_score:.4f} (±{std_score:.4f})")
-                    if mean_score > self.best_score_:
-                        print(f"   🎯 新的最佳分數!")
-
+                # 執行交叉驗證，訓練中也會檢查停止標誌
+                for fold in missing:
+                    if self._should_prune_group(members, fold_results, n_folds, rung):
+                        pruned = True
+                        break
+                    train_index, test_index = splits[fold]
+                    result = _fit_and_score(self.estimator, fit_params, X, y, train_index,
+                                            test_index, self.scoring,
+                                            should_stop=self._should_stop,
+                                            n_iterations=n_iterations,
+                                            metrics=self._metrics,
+                                            fold_cache=self._fold_cache if self.cache_folds else None,
+                                            return_model=self.keep_fold_models,
+                                            return_proba=self._oof is not None)
+                    self._observe_cost(fit_params, len(train_index), result['fit_seconds'])
+                    self._complete_fold(members, n_iterations, fold, result,
+                                        fold_results, split_key)
+            except TrainingStoppedError:
+                if self._deadline_reached and not is_training_stopped():
+                    self.interrupted_combinations_ += len(members)
+                    print(f"⏱️ 時間預算用完，中斷第 {i+1}/{self.total_combinations_} 個組合的訓練")
+                    return True
+                print(
+                    f"[停止機制] 超參數搜尋在第 {i+1}/{self.total_combinations_} 個組合訓練中被停止")
+                return True
             except Exception as e:
                 print(f"   ❌ 參數組合 {params} 訓練失敗: {str(e)}")
                 continue
 
-            self.completed_combinations_ = i + 1
+            if pruned:
+                self._prune_group(members, fold_results, n_folds, rung, n_resources)
+            else:
+                self._record_group(members, fold_results, n_folds, rung, n_resources)
 
             # 在每個組合完成後再次檢查停止標誌
             if is_training_stopped():
                 print(
                     f"[停止機制] 超參數搜尋在完成第 {i+1}/{self.total_combinations_} 個組合後被停止")
-                print(f"[停止機制] 返回目前最佳結果 (分數: {self.best_score_:.4f})")
-                return self
+                return True
+        return False
 
-        print(f"✅ 超參數搜尋完成，測試了 {self.completed_combinations_} 個參數組合")
-        return self
+    def _open_store(self, X, y):
+        """開啟試驗記錄並計算資料集指紋"""
+        self._store = None
+        self._owns_store = False
+        if self.trial_store is None:
+            return
+        if isinstance(self.trial_store, TrialStore):
+            self._store = self.trial_store
+        else:
+            self._store = TrialStore(self.trial_store)
+            self._owns_store = True
+        self._store_dataset = dataset_fingerprint(X, y)
+
+    def _open_oof(self, X, y):
+        """開啟 out-of-fold 預測儲存"""
+        self._oof = OOFStore(self.oof_dir).open(X, y) if self.oof_dir else None
+
+    def _write_oof(self, members, n_iterations, fold, result):
+        """將一個 fold 的驗證列預測機率寫入同組每個參數組合的陣列（各自以自己的樹數預測）"""
+        if 'proba' not in result:
+            return
+        test_index = self._splits[fold][1]
+        for _, params, fit_params in members:
+            proba = (result['proba'] if n_iterations is None
+                     else result['probas'][fit_params['model__n_estimators']])
+            self._oof.write(params, test_index, proba, self._rung, self._n_resources)
+
+    def _close_store(self):
+        """關閉由搜尋自行開啟的試驗記錄"""
+        if self._store is not None and self._owns_store:
+            self._store.close()
+        self._store = None
+
+    def _trial_params(self, fit_params):
+        """試驗記錄的參數鍵：估計器的固定設定加上本組合的參數（不含執行緒數）"""
+        base = {key: value for key, value in self.estimator.get_params(deep=True).items()
+                if isinstance(value, (str, int, float, bool, type(None)))
+                and not key.endswith('n_jobs')}
+        base.update(fit_params)
+        return base
+
+    def _load_stored_results(self, candidates, split_key):
+        """讀取已儲存的 fold 結果，回傳 {組合索引: {fold: 結果}}"""
+        fold_results = {i: {} for i, _, _ in candidates}
+        if self._store is None:
+            return fold_results
+        n_loaded = 0
+        for i, _, fit_params in candidates:
+            stored = self._store.load(self._store_dataset, split_key, self._store_scoring,
+                                      self._trial_params(fit_params))
+            if self._metrics is not None:
+                # 缺少任一指標的記錄重新訓練；排序分數依目前的排序指標取出
+                stored = {fold: dict(result, score=result['metrics'][self.scoring])
+                          for fold, result in stored.items()
+                          if all(name in result.get('metrics', {}) for name in self._metrics)}
+            fold_results[i] = stored
+            n_loaded += len(stored)
+        if n_loaded:
+            print(f"♻️ 從試驗記錄載入 {n_loaded} 個已完成的 fold 結果，將跳過重新訓練")
+        return fold_results
+
+    def _open_pool(self, X, y):
+        """n_jobs > 1 時建立工作者行程池，每個工作者只接收一次資料與估計器"""
+        self._executor = None
+        self._stop_event = None
+        if is_training_stopped():
+            return
+        if self.coordinator is not None:
+            # 遠端工作者依列標籤從共享資料檔重建資料，停止事件經由心跳回應廣播
+            self._executor = self.coordinator.start_job(X, y, self.estimator, self.scoring)
+            self._stop_event = self.coordinator.stop_event
+            print(f"分散式搜尋：協調者 {self.coordinator.address}，等待工作者取得任務")
+            return
+        if self.n_jobs is None or self.n_jobs <= 1 or is_training_stopped():
+            return
+        n_threads = self.estimator.get_params().get('model__n_jobs', 1)
+        n_threads = max(1, n_threads) if isinstance(n_threads, int) else 1
+        ctx = mp.get_context('spawn')
+        self._stop_event = ctx.Event()
+        print(f"平行搜尋：{self.n_jobs} 個工作者，每個 {n_threads} 個執行緒")
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.n_jobs, mp_context=ctx, initializer=_init_search_worker,
+            initargs=(self._stop_event, self.estimator, X, y, n_threads, self.cache_folds))
+
+    def _close_pool(self):
+        """通知工作者停止並關閉行程池"""
+        if self._executor is not None:
+            self._stop_event.set()
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        self._executor = None
+        self._stop_event = None
+
+    def _run_parallel(self, X, y, groups, splits, rung, n_resources, fold_results, split_key):
+        """以工作者行程平行執行 (參數組合, fold) 任務，結果完成即回報，回傳是否被停止"""
+        n_folds = len(splits)
+        futures = {}
+        failed = set()  # 訓練失敗或被剪枝的組，其餘結果不再處理
+        return_model = self.keep_fold_models and self.coordinator is None
+
+        for g, (members, fit_params, n_iterations) in enumerate(groups):
+            missing = self._missing_folds(members, fold_results, n_folds)
+            if not missing:  # 所有 fold 都已在試驗記錄中
+                self._record_group(members, fold_results, n_folds, rung, n_resources)
+                continue
+            for fold in missing:
+                train_index, test_index = splits[fold]
+                # 遠端工作者以 JSON 回報結果，不傳回模型
+                future = self._executor.submit(_run_search_task, fit_params, train_index,
+                                               test_index, self.scoring, n_iterations,
+                                               self._metrics, return_model,
+                                               self._oof is not None)
+                futures[future] = (g, fold)
+
+        pending = set(futures)
+        while pending:
+            if is_training_stopped() or self._past_deadline():
+                if is_training_stopped():
+                    print(f"[停止機制] 平行超參數搜尋被停止 "
+                          f"(已完成 {self.completed_combinations_}/{self.total_combinations_} 個組合)")
+                else:
+                    # 通知工作者中斷進行中的訓練
+                    self._stop_event.set()
+                    self.interrupted_combinations_ += sum(
+                        len(groups[g][0]) for g in {futures[f][0] for f in pending} - failed)
+                    print(f"⏱️ 時間預算用完，平行搜尋中斷 "
+                          f"(已完成 {self.completed_combinations_}/{self.total_combinations_} 個組合)")
+                for future in pending:
+                    future.cancel()
+                return True
+            done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in done:
+                g, fold = futures[future]
+                if g in failed:
+                    continue
+                members, _, n_iterations = groups[g]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failed.add(g)
+                    print(f"   ❌ 參數組合 {members[0][1]} 訓練失敗: {str(e)}")
+                    continue
+                if result is None:  # 工作者已收到停止事件
+                    continue
+                self._observe_cost(groups[g][1], len(splits[fold][0]), result['fit_seconds'])
+                self._complete_fold(members, n_iterations, fold, result, fold_results,
+                                    split_key)
+                if not self._missing_folds(members, fold_results, n_folds):
+                    self._record_group(members, fold_results, n_folds, rung, n_resources)
+                elif self._should_prune_group(members, fold_results, n_folds, rung):
+                    # 平行模式依已回報的 fold 判斷，尚未開始的 fold 直接取消
+                    failed.add(g)
+                    for other, (other_g, _) in futures.items():
+                        if other_g == g:
+                            other.cancel()
+                    self._prune_group(members, fold_results, n_folds, rung, n_resources)
+        return False
+
+    def _record_candidate(self, candidate_index, params, fold_results, rung=0,
+                          n_resources=None, pruned=False):
+        """
+        記錄完成的參數組合並更新最佳結果
+
+        最佳結果取自目前最高的輪次（預算最完整），同分時保留順序較前的組合；
+        被剪枝的組合只記錄已完成的 fold，不參與最佳結果
+        """
+        cv_scores = np.array([result['score'] for result in fold_results])
+        mean_score = np.mean(cv_scores)
+        std_score = np.std(cv_scores)
+
+        # 儲存結果
+        record = {
+            'candidate_index': candidate_index,
+            'params': params,
+            'mean_test_score': mean_score,
+            'std_test_score': std_score,
+            'cv_scores': cv_scores,
+            'mean_fit_time': np.mean([result['fit_seconds'] for result in fold_results]),
+            # 每列預測秒數與模型大小（舊版試驗記錄載入的 fold 沒有量測時為 nan）
+            'mean_latency': self._mean_of(fold_results, 'latency'),
+            'mean_model_bytes': self._mean_of(fold_results, 'model_bytes'),
+            'iter': rung,
+            'n_resources': n_resources,
+            'pruned': pruned
+        }
+        if self._metrics is not None:
+            # 每個指標的各 fold 分數與 mean_test_<指標> / std_test_<指標>
+            record['cv_metrics'] = {name: np.array([result['metrics'][name]
+                                                    for result in fold_results])
+                                    for name in self._metrics}
+            for name, scores in record['cv_metrics'].items():
+                record[f'mean_test_{name}'] = np.mean(scores)
+                record[f'std_test_{name}'] = np.std(scores)
+        if self._oof is not None:
+            record['oof_file'] = self._oof.finish(params, candidate_index, mean_score, rung,
+                                                  n_resources, pruned=pruned)
+        self.cv_results_.append(record)
+        self.completed_combinations_ += 1
+        fold_models = self._fold_models.pop(candidate_index, {})
+        if pruned:
+            self.pruned_combinations_ += 1
+            return
+
+        # 更新最佳結果
+        key = (rung, mean_score, -candidate_index)
+        is_best = self._best_key is None or key > self._best_key
+        if is_best:
+            self.best_score_ = mean_score
+            self.best_params_ = params.copy()
+            self.best_estimator_ = self._clone_estimator_with_params(params)
+            self._best_key = key
+            self._best_fold_models = fold_models
+            self._best_splits = self._splits
+        if self.latency_tolerance is not None:
+            self._keep_near_best_models(candidate_index, key, fold_models)
+
+        if self.verbose > 0:
+            print(f"   [{self.completed_combinations_}/{self.total_combinations_}] "
+                  f"組合 {candidate_index+1} 分數: {mean_score:.4f} (±{std_score:.4f})")
+            if self._metrics is not None and len(self._metrics) > 1:
+                print("      " + ", ".join(f"{name}={record[f'mean_test_{name}']:.4f}"
+                                           for name in self._metrics[1:]))
+            if is_best:
+                print(f"   🎯 新的最佳分數!")
+
+    @staticmethod
+    def _mean_of(fold_results, key):
+        values = [result[key] for result in fold_results if result.get(key) is not None]
+        return float(np.mean(values)) if values else np.nan
+
+    def _keep_near_best_models(self, candidate_index, key, fold_models):
+        """保留分數在延遲容忍內的組合的 fold 模型，改選較快的組合時不需重新訓練"""
+        if fold_models:
+            self._near_best_models[candidate_index] = (key, fold_models)
+        best_rung, best_score, _ = self._best_key
+        self._near_best_models = {
+            index: (kept_key, models) for index, (kept_key, models) in self._near_best_models.items()
+            if kept_key[0] == best_rung and kept_key[1] >= best_score - self.latency_tolerance}
 
     def _clone_estimator_with_params(self, params):
         """複製估計器並設定參數"""
-        from sklearn.base import clone
         estimator_clone = clone(self.estimator)
         estimator_clone.set_params(**params)
         return estimator_clone
 
 
+class StoppableTPESearchCV(StoppableGridSearchCV):
+    """可停止的 TPE 序列模型式超參數搜尋類別"""
+
+    def __init__(self, estimator, param_space, scoring, cv, verbose=0, n_jobs=1,
+                 n_trials=30, time_budget_seconds=None, n_startup_trials=10,
+                 random_state=0, trial_store=None, coordinator=None, metrics=None,
+                 cache_folds=True, keep_fold_models=True, latency_tolerance=None,
+                 oof_dir=None):
+        super().__init__(estimator, param_grid=None, scoring=scoring, cv=cv,
+                         verbose=verbose, n_jobs=n_jobs, random_state=random_state,
+                         trial_store=trial_store, coordinator=coordinator, metrics=metrics,
+                         cache_folds=cache_folds, time_budget_seconds=time_budget_seconds,
+                         keep_fold_models=keep_fold_models,
+                         latency_tolerance=latency_tolerance, oof_dir=oof_dir)
+        # 參數範圍 {參數名稱: (類型, 下限, 上限)}，類型為 'float'、'log_float' 或 'int'
+        self.param_space = validate_param_space(param_space)
+        self.n_trials = n_trials
+        self.n_startup_trials = n_startup_trials
+
+    def planned_fits(self, n_rows):
+        """估計所有試驗的訓練，樹數在參數範圍內時以範圍中點估計"""
+        if 'model__n_estimators' in self.param_space:
+            _, low, high = self.param_space['model__n_estimators']
+            n_trees = int(round((low + high) / 2))
+        else:
+            n_trees = self._n_trees({})
+        return [(n_rows, n_trees)] * (self.n_trials * self._n_folds())
+
+    def fit(self, X, y):
+        """依序建議並評估參數組合，直到試驗次數或時間用完"""
+        self._prepare_metrics()
+        self._check_latency_tolerance()
+        splits = list(check_cv(self.cv, y, classifier=True).split(X, y))
+        sampler = TPESampler(self.param_space, n_startup_trials=self.n_startup_trials,
+                             random_state=self.random_state)
+        self.total_combinations_ = self.n_trials
+        self._planned_work = sum(n_rows * n_trees for n_rows, n_trees in self.planned_fits(
+            int(np.mean([len(train_index) for train_index, _ in splits]))))
+
+        budget_text = (f"，時間上限 {self.time_budget_seconds} 秒"
+                       if self.time_budget_seconds else "")
+        print(f"開始 TPE 超參數搜尋，最多 {self.n_trials} 次試驗{budget_text}...")
+
+        stopped = False
+        self._fold_cache.clear()  # 快取只屬於這次搜尋的資料
+        self._start_clock()
+        self._open_store(X, y)
+        self._open_oof(X, y)
+        self._open_pool(X, y)
+        try:
+            for trial in range(self.n_trials):
+                if self._past_deadline():
+                    print(f"⏱️ 已達時間上限 ({self._elapsed():.1f} 秒)，完成 {trial} 次試驗")
+                    break
+
+                params = sampler.suggest()
+                n_recorded = len(self.cv_results_)
+                if self._run_candidates(X, y, [(trial, params, params)], splits):
+                    stopped = True
+                    break
+                if len(self.cv_results_) > n_recorded:
+                    sampler.observe(params, self.cv_results_[-1]['mean_test_score'])
+        finally:
+            self._close_pool()
+            self._close_store()
+
+        return self._finish(stopped, X, y)
+
+
 # 必要參數配置
 TARGET_COLUMN = 'is_recommended'
 
@@ -151,22 +1501,116 @@ RANDOM_STATE = 42
 SIMILARITY_CUTOFF = 0.6
 CATEGORICAL_THRESHOLD = 10  # 整數型類別數量閾值
 SIMILARITY_MATCHES_COUNT = 1  # 模糊匹配返回數量
+# 預處理輸出格式：'pandas' 回傳 DataFrame；'array' 直接交給 LightGBM 連續的 float32 矩陣（需自行選用，
+# LightGBM 以矩陣訓練時仍會記錄 Column_0... 欄位名稱，矩陣預測時 sklearn 會發出欄位名稱警告）
+PREPROCESS_OUTPUT = 'pandas'
+PREPROCESS_ENCODINGS = ('onehot', 'ordinal')  # DataPreprocess 字串型態欄位的編碼方式
 
 # 模型參數
 MODEL_N_ESTIMATORS = 250
 MODEL_LEARNING_RATE = 0.01
 MODEL_NUM_LEAVES = 60
 MODEL_SCALE_POS_WEIGHT = 0.55
-# 智能設定 n_jobs：如果 CPU 核心數 > 4，使用 -1，否則使用 max(1, CPU_COUNT-1)
+# CPU 核心預算：-1 表示使用全部核心，由執行緒預算管理器分配給外層工作者與內層執行緒
 MODEL_N_JOBS = -1
 MODEL_VERBOSE = 0  # -1/0: 靜默, 1: 基本資訊, 2: 詳細資訊
 
+# 最終模型重新訓練策略
+# 'full': 用全部資料重新訓練（預設）
+# 'none': 直接儲存以訓練組訓練的模型，不重新訓練
+# 'background': 在背景工作者中用全部資料重新訓練，同時進行評估、圖表與特徵重要性
+# 'iterations_from_split': 訓練組搭配早停，再以早停的樹數量用全部資料重新訓練
+REFIT_POLICY = 'full'
+REFIT_POLICIES = ('full', 'none', 'background', 'iterations_from_split')
+EARLY_STOPPING_ROUNDS = 50
+
+# 訓練後的樹數壓縮：在驗證組掃描只使用前 n 棵樹的預測，找出 TREE_COMPACTION_METRICS 每個指標
+# 與完整模型相差都不超過此值的最少樹數，並將最終模型截斷後儲存；None 表示不壓縮
+TREE_COMPACTION_EPSILON = None
+TREE_COMPACTION_METRICS = ('f1_macro', 'roc_auc')
+# 樹數壓縮在訓練組模型上選擇樹數，只適用於最終模型與訓練組模型相同或沿用其樹數的重新訓練策略
+TREE_COMPACTION_REFIT_POLICIES = ('none', 'iterations_from_split')
+
+# 決策門檻最佳化：以驗證組（超參數搜尋為 out-of-fold）預測機率找出此指標最高的門檻並存入模型檔，
+# 預測時正類別機率不低於門檻即預測為正類別；'f1_macro' 或 'balanced_accuracy'，None 表示維持 0.5
+DECISION_THRESHOLD_METRIC = None
+
+# update_model 繼續提升後不再適用的模型資訊（決策門檻、樹數壓縮與特徵修剪都以舊模型的驗證預測決定）
+UPDATE_STALE_INFO_KEYS = ('decision_threshold', 'compaction', 'feature_pruning')
+
+# 特徵修剪：從訓練組保留 FEATURE_PRUNING_HOLDOUT 比例的列，以其餘列訓練的模型在保留列上計算排列重要性
+# （獨熱編碼的每個值各自計算），只保留前 FEATURE_PRUNING_TOP_N 個輸出欄位，或移除重要性低於
+# FEATURE_PRUNING_THRESHOLD 的輸出欄位，再以較窄的特徵重新訓練；驗證組只用於比較：
+# FEATURE_PRUNING_METRICS 每個指標的驗證組下降都不超過 FEATURE_PRUNING_TOLERANCE 時才採用；都為 None 表示不修剪
+FEATURE_PRUNING_HOLDOUT = 0.2
+FEATURE_PRUNING_TOP_N = None
+FEATURE_PRUNING_THRESHOLD = None
+FEATURE_PRUNING_TOLERANCE = 0.005
+FEATURE_PRUNING_METRICS = ('f1_macro', 'roc_auc')
+
+# 分段模型：設定欄位名稱（如 'secondary_category'）時，train_model 以共用的前處理為每個分段平行訓練
+# 較小的模型，列數少於 SEGMENT_MIN_ROWS 或訓練時沒看過的分段由全域模型預測；None 表示單一模型
+SEGMENT_COLUMN = None
+SEGMENT_MIN_ROWS = 200
+SEGMENT_N_WORKERS = 4  # 同時訓練的分段模型數，與模型執行緒共用核心預算
+
+# 資料平行分散式訓練：工作者數量 <= 1 表示單機訓練
+DISTRIBUTED_WORKERS = 0
+DISTRIBUTED_MACHINES = None  # 可選 "host:port,host:port"，跨主機訓練時使用
+
 # 超參數調優參數
 CV_FOLDS = 5
 IMPORTANCE_N_REPEATS = 5
+IMPORTANCE_N_JOBS = 1  # 排列重要性的外層平行工作者數，與模型執行緒共用核心預算
+TUNING_N_JOBS = 1  # 超參數搜尋的平行工作者行程數，> 1 時以行程池平行評估參數組合
+# 搜尋模式：'grid' 完整網格搜尋，'halving' 逐次減半（先以小預算淘汰差的組合），
+# 'multi_fidelity' 兩階段多精度搜尋（先以抽樣資料評估整個網格，再以完整資料確認前幾名），
+# 'tpe' 序列模型式搜尋（在 PARAM_SPACE 連續範圍內依過去試驗結果建議參數）
+SEARCH_MODE = 'grid'
+SEARCH_MODES = ('grid', 'halving', 'multi_fidelity', 'tpe')
+HALVING_FACTOR = 3              # 每輪保留 1/HALVING_FACTOR 的組合，預算乘以 HALVING_FACTOR
+HALVING_RESOURCE = 'n_samples'  # 逐次減半的預算：'n_samples' 訓練資料列數，'n_estimators' 樹的數量
+HALVING_MIN_RESOURCES = 50      # 每輪預算下限（資料列數或樹數）
+MULTI_FIDELITY_SUBSAMPLE = 0.2  # 多精度搜尋第一階段使用的訓練資料比例（依目標類別分層抽樣）
+MULTI_FIDELITY_TOP_K = 5        # 多精度搜尋第二階段以完整資料重新評估的組合數
+TPE_N_TRIALS = 30               # TPE 搜尋的最大試驗次數
+# 超參數搜尋的時間預算（秒），適用所有搜尋模式：依量測的訓練成本略過來不及完成的組合，
+# 到期時中斷並回傳目前最佳結果與涵蓋範圍摘要；None 表示不限時間
+TUNING_TIME_BUDGET_SECONDS = None
+# 網格中只差在樹數量的組合共用一次訓練：以最大樹數訓練，較少樹數用前 n 棵樹的預測評分
+STAGED_N_ESTIMATORS = True
+# 每個 fold 只擬合一次前處理並建構一次 LightGBM Dataset（特徵分箱），所有參數組合共用；
+# 網格包含前處理參數（如 DataPreprocess__categorical_threshold）時每種前處理設定各快取一份，
+# 包含分箱參數（如 model__max_bin）時自動改回每個組合各自處理
+TUNING_CACHE_FOLDS = True
+# 保留最佳組合各 fold 已訓練的模型，以軟投票集成作為最佳模型，可直接預測或儲存為最終模型，
+# 不需再以最佳參數重新訓練；False 時只回傳最佳參數
+TUNING_KEEP_FOLD_MODELS = True
+# 開始訓練或搜尋前以抽樣資料的短訓練校準成本，輸出預估時間與峰值記憶體，搜尋中依實測更新剩餘時間
+COST_ESTIMATE = True
+COST_CALIBRATION_ROWS = 2000  # 校準使用的資料列數上限
+# 延遲容忍：搜尋同時量測每個組合的每列預測時間與模型大小並輸出分數與延遲的 Pareto 前緣；
+# 設定為分數差（如 0.002）時，選擇分數不低於最高分減此值的組合中預測最快者，None 表示只依分數選擇
+TUNING_LATENCY_TOLERANCE = None
+# out-of-fold 預測資料夾：每個試驗的驗證 fold 預測機率寫入記憶體映射的 .npy 陣列（每個試驗
+# 資料列數 × 類別數 × 4 bytes）與 manifest.json，供門檻調整、校準與堆疊分析重用；None 表示不保存
+TUNING_OOF_DIR = None
+# 試驗記錄：設定 SQLite 路徑（如 "output_models/tuning_trials.db"）時每個完成的 (參數組合, fold) 寫入記錄，
+# 重新執行時跳過已評估的部分；記錄不區分程式與套件版本，升級後應換用新路徑。None 表示不記錄
+TRIAL_STORE_PATH = None
+# 剪枝器：None 不剪枝，'median' 前幾個 fold 低於已完成組合的中位數即放棄，
+# 'bound' 其餘 fold 以最高分估計仍無法超越最佳組合時才放棄
+TUNING_PRUNER = None
+# 分散式搜尋協調者監聽位址，例如 '0.0.0.0:8765'；設定後由其他機器上的工作者
+# （python -m ai_utils.tuning_cluster --coordinator http://主機:8765）取得任務，None 表示不使用
+TUNING_COORDINATOR = None
+TUNING_HEARTBEAT_TIMEOUT = 30  # 工作者超過此秒數沒有心跳時，其任務重新分派給其他工作者
 GRID_SEARCH_VERBOSE_BASIC = 2
 GRID_SEARCH_VERBOSE_DETAILED = 3
 SCORING_METRIC = 'f1_macro'        # 主要評分指標：f1_macro, roc_auc, balanced_accuracy
+# 超參數搜尋同時記錄的指標：每個 fold 只預測一次機率並計算所有指標，依 SCORING_METRIC 排序；
+# None 表示只計算 SCORING_METRIC（可使用任何 sklearn 評分器名稱）
+TUNING_METRICS = ('f1_macro', 'roc_auc', 'balanced_accuracy')
 IMPORTANCE_SCORING = 'f1_macro'    # 特徵重要性評分：建議與主要指標保持一致
 
 # 檔案路徑參數
@@ -182,6 +1626,35 @@ PARAM_GRID = {
     'model__reg_alpha': [0, 0.5, 1],
 }
 
+# TPE 搜尋的參數範圍：(類型, 下限, 上限)，類型為 'float'、'log_float'（對數尺度）或 'int'
+PARAM_SPACE = {
+    'model__learning_rate': ('log_float', 0.003, 0.1),
+    'model__num_leaves': ('int', 16, 128),
+    'model__scale_pos_weight': ('float', 0.4, 1.0),
+    'model__reg_alpha': ('float', 0.0, 2.0),
+}
+
+
+def get_thread_budget():
+    """依目前的 MODEL_N_JOBS 設定建立 CPU 執行緒預算"""
+    return ThreadBudget(MODEL_N_JOBS)
+
+
+def apply_thread_budget(estimator, n_outer=1):
+    """
+    依 CPU 執行緒預算設定估計器的內層執行緒數
+
+    參數:
+        estimator: 模型或管線
+        n_outer (int): 外層平行工作者數量
+
+    回傳:
+        tuple: (外層工作者數, 每個工作者的內層執行緒數)
+    """
+    outer, inner = get_thread_budget().split(n_outer)
+    ThreadBudget.apply_to_estimator(estimator, inner)
+    return outer, inner
+
 
 def validate_input_parameters(**kwargs):
     """
@@ -218,6 +1691,46 @@ def validate_input_parameters(**kwargs):
         if not (0 < learning_rate <= 1):
             errors.append(f"learning_rate 必須在 0 和 1 之間，但得到: {learning_rate}")
 
+    if 'refit_policy' in kwargs:
+        refit_policy = kwargs['refit_policy']
+        if refit_policy not in REFIT_POLICIES:
+            errors.append(
+                f"refit_policy 必須是 {REFIT_POLICIES} 之一，但得到: {refit_policy}")
+
+    if kwargs.get('compaction_epsilon') is not None:
+        compaction_epsilon = kwargs['compaction_epsilon']
+        if not isinstance(compaction_epsilon, (int, float)) or compaction_epsilon < 0:
+            errors.append(f"compaction_epsilon 必須是非負數，但得到: {compaction_epsilon}")
+        refit_policy = kwargs.get('refit_policy')
+        if refit_policy is not None and refit_policy not in TREE_COMPACTION_REFIT_POLICIES:
+            errors.append(f"compaction_epsilon 需要 refit_policy 為 {TREE_COMPACTION_REFIT_POLICIES} 之一，"
+                          f"但得到: {refit_policy}")
+
+    if kwargs.get('prune_top_n') is not None:
+        prune_top_n = kwargs['prune_top_n']
+        if not isinstance(prune_top_n, int) or prune_top_n <= 0:
+            errors.append(f"prune_top_n 必須是正整數，但得到: {prune_top_n}")
+
+    if kwargs.get('prune_threshold') is not None:
+        if not isinstance(kwargs['prune_threshold'], (int, float)):
+            errors.append(f"prune_threshold 必須是數值，但得到: {kwargs['prune_threshold']}")
+
+    if kwargs.get('prune_tolerance') is not None:
+        prune_tolerance = kwargs['prune_tolerance']
+        if not isinstance(prune_tolerance, (int, float)) or prune_tolerance < 0:
+            errors.append(f"prune_tolerance 必須是非負數，但得到: {prune_tolerance}")
+
+    if 'encoding' in kwargs:
+        encoding = kwargs['encoding']
+        if encoding not in PREPROCESS_ENCODINGS:
+            errors.append(f"encoding 必須是 {PREPROCESS_ENCODINGS} 之一，但得到: {encoding}")
+
+    if kwargs.get('threshold_metric') is not None:
+        threshold_metric = kwargs['threshold_metric']
+        if threshold_metric not in THRESHOLD_METRICS:
+            errors.append(
+                f"threshold_metric 必須是 {THRESHOLD_METRICS} 之一，但得到: {threshold_metric}")
+
     if errors:
         print("❌ 參數驗證失敗:")
         for error in errors:
@@ -270,7 +1783,10 @@ def create_model_pipeline(n_estimators=MODEL_N_ESTIMATORS,
                           learning_rate=MODEL_LEARNING_RATE,
                           num_leaves=MODEL_NUM_LEAVES,
                           scale_pos_weight=MODEL_SCALE_POS_WEIGHT,
-                          random_state=RANDOM_STATE):
+                          random_state=RANDOM_STATE,
+                          categorical_threshold=None,
+                          encoding='onehot',
+                          output=None):
     """
     建立模型管線的通用函式
 
@@ -280,6 +1796,9 @@ def create_model_pipeline(n_estimators=MODEL_N_ESTIMATORS,
         num_leaves (int): 葉子節點數
         scale_pos_weight (float): 正樣本權重
         random_state (int): 隨機種子
+        categorical_threshold (int): 整數型類別數量閾值，None 表示使用 CATEGORICAL_THRESHOLD
+        encoding (str): 字串型態欄位的編碼 'onehot' 或 'ordinal'
+        output (str): 預處理輸出格式 'pandas' 或 'array'，None 表示使用 PREPROCESS_OUTPUT
 
     回傳:
         Pipeline: 包含預處理和模型的管線
@@ -289,11 +1808,48 @@ def create_model_pipeline(n_estimators=MODEL_N_ESTIMATORS,
         learning_rate=learning_rate,
         num_leaves=num_leaves,
         scale_pos_weight=scale_pos_weight,
-        n_jobs=MODEL_N_JOBS,
+        n_jobs=get_thread_budget().total_threads,
         random_state=random_state,
         verbose=MODEL_VERBOSE
     )
-    return Pipeline([('DataPreprocess', DataPreprocess()), ('model', model)])
+    preprocess = DataPreprocess(output=output if output is not None else PREPROCESS_OUTPUT,
+                                categorical_threshold=categorical_threshold, encoding=encoding)
+    return Pipeline([('DataPreprocess', preprocess), ('model', model)])
+
+
+def measure_preprocess_handoff(pipe, X, repeats=3):
+    """
+    量測 DataPreprocess 兩種輸出模式交給 LightGBM 預測的耗時
+
+    參數:
+        pipe (Pipeline): 已訓練的管線
+        X (DataFrame): 量測使用的資料
+        repeats (int): 重複次數，取最短時間
+
+    回傳:
+        dict: 每種輸出模式的 transform 與 predict_proba 秒數
+    """
+    preprocessor = copy.deepcopy(pipe.named_steps['DataPreprocess'])
+    model = pipe.named_steps['model']
+    timings = {}
+    for output in ('pandas', 'array'):
+        preprocessor.output = output
+        transform_seconds = []
+        predict_seconds = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            X_transformed = preprocessor.transform(X)
+            transform_seconds.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            model.predict_proba(X_transformed)
+            predict_seconds.append(time.perf_counter() - start)
+        timings[output] = {
+            'transform_seconds': min(transform_seconds),
+            'predict_seconds': min(predict_seconds)
+        }
+        print(f"[{output}] transform: {timings[output]['transform_seconds']*1000:.2f} ms, "
+              f"predict_proba: {timings[output]['predict_seconds']*1000:.2f} ms")
+    return timings
 
 
 def display_evaluation_metrics(y_true, y_pred, y_proba, dataset_name=""):
@@ -456,7 +2012,18 @@ def validate_data_types(data, feature_columns, target_column):
 
 
 class DataPreprocess(BaseEstimator, TransformerMixin):
-    def __init__(self):
+    def __init__(self, output='pandas', categorical_threshold=None, encoding='onehot',
+                 drop_features=None):
+        # output: 'pandas' 回傳 DataFrame；'array' 回傳 C-contiguous float32 矩陣，
+        # 可直接交給 LightGBM 而不需再轉換與複製，欄位名稱由 get_feature_names_out 提供
+        self.output = output
+        # categorical_threshold: 整數型類別數量閾值，None 表示使用 CATEGORICAL_THRESHOLD
+        # encoding: 字串型態欄位的編碼，'onehot' 獨熱編碼；'ordinal' 依出現次數排名編為單一欄位，
+        # 未見過的值為 NaN（LightGBM 視為缺值）
+        self.categorical_threshold = categorical_threshold
+        self.encoding = encoding
+        # drop_features: 不輸出的獨熱編碼欄位（特徵修剪），該值與其他未編碼的值相同，所有獨熱欄位為 0
+        self.drop_features = drop_features
         self.scaler = {}
         self.fillna_value = {}
         self.onehotencode_value = {}
@@ -464,7 +2031,14 @@ class DataPreprocess(BaseEstimator, TransformerMixin):
         self.final_field_names = []
 
     def fit(self, X, y=None, field_names=None):
-        self.__init__()
+        if self.encoding not in PREPROCESS_ENCODINGS:
+            raise ValueError(f"encoding 必須是 {PREPROCESS_ENCODINGS} 之一，但得到: {self.encoding}")
+        self.__init__(output=self.output, categorical_threshold=self.categorical_threshold,
+                      encoding=self.encoding, drop_features=self.drop_features)
+        dropped = self._dropped
+        categorical_threshold = self.categorical_threshold
+        if categorical_threshold is None:
+            categorical_threshold = CATEGORICAL_THRESHOLD
         if field_names is None:
             self.field_names = X.columns.tolist()
         else:
@@ -491,7 +2065,7 @@ class DataPreprocess(BaseEstimator, TransformerMixin):
                 if X[fname].isin([0, 1]).all():  # 當數值只有0跟1
                     pass  # 不用轉換
                 # 是否簡單的整數型類別且數量小於閾值
-                elif pd.api.types.is_integer_dtype(X[fname]) and X[fname].nunique() <= CATEGORICAL_THRESHOLD:
+                elif pd.api.types.is_integer_dtype(X[fname]) and X[fname].nunique() <= categorical_threshold:
                     self.scaler[fname] = MinMaxScaler()
                     self.scaler[fname].fit(X[[fname]])
                 else:  # 其他的數字型態
@@ -502,8 +2076,13 @@ class DataPreprocess(BaseEstimator, TransformerMixin):
             if (X[fname].dtype == object) or (X[fname].dtype == str):  # 字串型態欄位, onehotencode
                 field_value = X[fname].value_counts().index
                 self.onehotencode_value[fname] = field_value
+                if self.encoding == 'ordinal':  # 依出現次數排名編為單一欄位
+                    self.final_field_names.append(fname)
+                    continue
                 for value in field_value:
                     fn = fname+"_"+value
+                    if fn in dropped:
+                        continue
                     # data[fn] = (data[fname] == value).astype('int8')
                     self.final_field_names.append(fn)
             elif X[fname].dtype == bool:  # 布林型態 轉成0跟1
@@ -523,9 +2102,15 @@ class DataPreprocess(BaseEstimator, TransformerMixin):
                 else:
                     X[fname] = [np.nan]
             data = pd.DataFrame(X)
+        elif getattr(self, 'output', 'pandas') == 'array':  # 直接寫入輸出矩陣，不需複製
+            data = X
         else:  # 將資料複製一份，不修改原本的資料
             data = X.copy()
 
+        if getattr(self, 'output', 'pandas') == 'array':
+            return self._transform_to_array(data)
+
+        dropped = self._dropped
         for fname in self.field_names:
             # 自動補空值
             if data[fname].isnull().any():  # 有空值
@@ -538,17 +2123,118 @@ class DataPreprocess(BaseEstimator, TransformerMixin):
 
             # 自動編碼
             if (data[fname].dtype == object) or (data[fname].dtype == str):  # 字串型態欄位, onehotencode
-                if fname in self.onehotencode_value:
+                if fname in self.onehotencode_value and self._ordinal:
+                    data[fname] = self._ordinal_codes(fname, data[fname])
+                elif fname in self.onehotencode_value:
                     field_value = self.onehotencode_value[fname]
                     for value in field_value:
                         fn = fname+"_"+value
-                        data[fn] = (data[fname] == value).astype('int8')
+                        if fn not in dropped:
+                            data[fn] = (data[fname] == value).astype('int8')
             elif data[fname].dtype == bool:  # 布林型態 轉成0跟1
                 data[fname] = data[fname].astype(int)
             else:  # 數字型態 不用重新編碼
                 pass
         return data[self.final_field_names]
 
+    def _transform_to_array(self, data):
+        """轉換為 C-contiguous float32 矩陣，欄位順序與 final_field_names 相同"""
+        column_index = {fn: i for i, fn in enumerate(self.final_field_names)}
+        result = np.empty((len(data), len(self.final_field_names)),
+                          dtype=np.float32, order='C')
+
+        for fname in self.field_names:
+            column = data[fname]
+            # 自動補空值
+            if column.isnull().any():
+                column = column.fillna(self.fillna_value[fname])
+
+            if fname in self.onehotencode_value and self._ordinal:  # 字串型態欄位, 排名編碼
+                result[:, column_index[fname]] = self._ordinal_codes(fname, column)
+            elif fname in self.onehotencode_value:  # 字串型態欄位, onehotencode
+                values = column.to_numpy()
+                for value in self.onehotencode_value[fname]:
+                    index = column_index.get(fname+"_"+value)
+                    if index is not None:  # 被修剪的欄位不輸出
+                        result[:, index] = (values == value)
+            elif fname in self.scaler:  # 自動尺度轉換(scaling)
+                result[:, column_index[fname]] = self.scaler[fname].transform(
+                    column.to_frame()).ravel()
+            else:  # 布林型態與不需轉換的數字型態
+                result[:, column_index[fname]] = column.to_numpy(dtype=np.float32)
+        return result
+
+    def __setstate__(self, state):
+        # 舊版本儲存的前處理沒有這些參數：使用儲存當時的行為（全域閾值與獨熱編碼）
+        state.setdefault('categorical_threshold', None)
+        state.setdefault('encoding', 'onehot')
+        state.setdefault('drop_features', None)
+        super().__setstate__(state)
+
+    @property
+    def _ordinal(self):
+        return self.encoding == 'ordinal'
+
+    @property
+    def _dropped(self):
+        return frozenset(self.drop_features or ())
+
+    def output_fields(self):
+        """
+        每個原始欄位對應的輸出欄位
+
+        回傳:
+            dict: {原始欄位: [final_field_names 中的欄位]}，獨熱編碼欄位的值全被修剪時為空列表
+        """
+        outputs = {}
+        remaining = set(self.final_field_names)
+        for fname in self.field_names:
+            if fname in self.onehotencode_value and not self._ordinal:
+                names = [fname+"_"+value for value in self.onehotencode_value[fname]]
+            else:
+                names = [fname]
+            outputs[fname] = [fn for fn in names if fn in remaining]
+        return outputs
+
+    def _ordinal_codes(self, fname, column):
+        """字串值在訓練資料中的出現次數排名（0 為最常見），未見過的值為 NaN"""
+        codes = self.onehotencode_value[fname].get_indexer(column)
+        return np.where(codes >= 0, codes, np.nan).astype(np.float32)
+
+    def get_feature_names_out(self, input_features=None):
+        """回傳轉換後的欄位名稱（array 輸出模式下對應矩陣的每一欄）"""
+        return np.asarray(self.final_field_names, dtype=object)
+
+    def extend_vocabulary(self, X):
+        """
+        將新資料中未見過的類別值加入獨熱編碼詞彙
+
+        新欄位一律附加在 final_field_names 最後，既有欄位的位置保持不變，
+        讓已訓練的模型可以在擴充後的特徵上繼續提升(boosting)
+
+        參數:
+            X (DataFrame): 新資料
+
+        回傳:
+            list: 新增的獨熱編碼欄位名稱
+        """
+        new_field_names = []
+        for fname, field_value in self.onehotencode_value.items():
+            if fname not in X:
+                continue
+            values = X[fname].fillna(self.fillna_value[fname]).value_counts().index
+            unseen = [value for value in values if value not in field_value]
+            if not unseen:
+                continue
+            self.onehotencode_value[fname] = field_value.append(pd.Index(unseen))
+            if self._ordinal:  # 新值接在既有排名之後，不增加欄位
+                continue
+            for value in unseen:
+                fn = fname+"_"+value
+                self.final_field_names.append(fn)
+                new_field_names.append(fn)
+        return new_field_names
+
     def save(self, file_name):
         with open(file_name, "wb") as f:
             pickle.dump(self, f)
@@ -575,7 +2261,18 @@ def train_model(data_path=DEFAULT_TRAIN_DATA_PATH,
                 n_repeats=IMPORTANCE_N_REPEATS,
                 plot_width=600,
                 plot_height=500,
-                plot_height_square=600):
+                plot_height_square=600,
+                refit_policy=None,
+                distributed_workers=None,
+                distributed_machines=None,
+                compaction_epsilon=None,
+                threshold_metric=None,
+                categorical_threshold=None,
+                encoding='onehot',
+                segment_column=None,
+                prune_top_n=None,
+                prune_threshold=None,
+                prune_tolerance=None):
     """
     訓練 Sephora 產品推薦模型
 
@@ -597,6 +2294,17 @@ def train_model(data_path=DEFAULT_TRAIN_DATA_PATH,
         plot_width (int): 圖表寬度
         plot_height (int): 圖表高度
         plot_height_square (int): 方形圖表高度
+        refit_policy (str): 最終模型重新訓練策略，None 表示使用 REFIT_POLICY
+        distributed_workers (int): 資料平行訓練的本機工作者數量，None 表示使用 DISTRIBUTED_WORKERS
+        distributed_machines (str or list): 跨主機的 "host:port" 機器列表，None 表示使用 DISTRIBUTED_MACHINES
+        compaction_epsilon (float): 樹數壓縮允許的指標下降量，None 表示使用 TREE_COMPACTION_EPSILON
+        threshold_metric (str): 決策門檻最佳化的指標，None 表示使用 DECISION_THRESHOLD_METRIC
+        categorical_threshold (int): 整數型類別數量閾值，None 表示使用 CATEGORICAL_THRESHOLD
+        encoding (str): 字串型態欄位的編碼 'onehot' 或 'ordinal'
+        segment_column (str): 分段模型的分段欄位，None 表示使用 SEGMENT_COLUMN，空字串表示單一模型
+        prune_top_n (int): 特徵修剪保留的輸出欄位數，None 表示使用 FEATURE_PRUNING_TOP_N
+        prune_threshold (float): 特徵修剪移除重要性低於此值的輸出欄位，None 表示使用 FEATURE_PRUNING_THRESHOLD
+        prune_tolerance (float): 採用修剪後模型允許的指標下降量，None 表示使用 FEATURE_PRUNING_TOLERANCE
 
     回傳:
         dict: 包含模型和評估結果的字典，如果被停止則回傳 None
@@ -606,6 +2314,51 @@ def train_model(data_path=DEFAULT_TRAIN_DATA_PATH,
         print("[停止機制] 訓練在開始前被停止")
         return None
 
+    if refit_policy is None:
+        refit_policy = REFIT_POLICY
+    if compaction_epsilon is None:
+        compaction_epsilon = TREE_COMPACTION_EPSILON
+    if threshold_metric is None:
+        threshold_metric = DECISION_THRESHOLD_METRIC
+    if prune_top_n is None:
+        prune_top_n = FEATURE_PRUNING_TOP_N
+    if prune_threshold is None:
+        prune_threshold = FEATURE_PRUNING_THRESHOLD
+    if prune_tolerance is None:
+        prune_tolerance = FEATURE_PRUNING_TOLERANCE
+    prune = prune_top_n is not None or prune_threshold is not None
+    if not validate_input_parameters(refit_policy=refit_policy,
+                                     compaction_epsilon=compaction_epsilon,
+                                     threshold_metric=threshold_metric,
+                                     encoding=encoding,
+                                     prune_top_n=prune_top_n,
+                                     prune_threshold=prune_threshold,
+                                     prune_tolerance=prune_tolerance):
+        return None
+    if distributed_workers is None:
+        distributed_workers = DISTRIBUTED_WORKERS
+    if distributed_machines is None:
+        distributed_machines = DISTRIBUTED_MACHINES
+    if segment_column is None:
+        segment_column = SEGMENT_COLUMN
+    segment_column = segment_column or None
+    if segment_column is not None:
+        # 分段模型沒有單一的 LightGBM 模型，不支援需要單一模型的選項
+        conflicts = [name for name, used in (
+            ("refit_policy='iterations_from_split'", refit_policy == 'iterations_from_split'),
+            ('compaction_epsilon', compaction_epsilon is not None),
+            ('prune_top_n / prune_threshold', prune),
+            ('distributed_workers / distributed_machines',
+             bool(distributed_machines) or (distributed_workers or 0) > 1)) if used]
+        if conflicts:
+            print(f"❌ 分段模型不支援 {', '.join(conflicts)}")
+            return None
+    fit_options = {
+        'distributed_workers': distributed_workers,
+        'distributed_machines': distributed_machines,
+        'random_state': random_state
+    }
+
     # 載入和驗證資料
     data, feature_cols, target_col = load_and_validate_data(
         data_path, feature_columns, target_column, default_target_column, exclude_columns)
@@ -639,8 +2392,19 @@ def train_model(data_path=DEFAULT_TRAIN_DATA_PATH,
         learning_rate=learning_rate,
         num_leaves=num_leaves,
         scale_pos_weight=scale_pos_weight,
-        random_state=random_state
+        random_state=random_state,
+        categorical_threshold=categorical_threshold,
+        encoding=encoding
     )
+    if segment_column is not None:
+        if segment_column not in feature_cols:
+            print(f"❌ 分段欄位 '{segment_column}' 不在特徵欄位中")
+            return None
+        pipe = SegmentedClassifier(pipe.named_steps['DataPreprocess'], pipe.named_steps['model'],
+                                   segment_column, min_segment_rows=SEGMENT_MIN_ROWS,
+                                   n_workers=SEGMENT_N_WORKERS)
+        print(f"分段模型：依 '{segment_column}' 分段，每段至少 {SEGMENT_MIN_ROWS} 筆，"
+              f"同時訓練 {SEGMENT_N_WORKERS} 個模型")
 
     # 分割資料
     X_train, X_valid, y_train, y_valid = train_test_split(
@@ -654,9 +2418,27 @@ def train_model(data_path=DEFAULT_TRAIN_DATA_PATH,
         print("[停止機制] 訓練在資料分割後被停止")
         return None
 
+    # 依 CPU 執行緒預算分配模型與原生執行緒池的執行緒數
+    # 背景重新訓練時，評估與重新訓練兩個工作者平分核心預算
+    budget = get_thread_budget()
+    _, model_threads = apply_thread_budget(
+        pipe, 2 if refit_policy == 'background' else 1)
+    print(f"CPU 執行緒預算：{budget.total_threads} 個執行緒")
+    print(f"最終模型重新訓練策略：{refit_policy}")
+    if COST_ESTIMATE:
+        _report_training_estimate(pipe, X_train, y_train, len(X), refit_policy, budget,
+                                  model_threads, random_state, prune=prune)
+
     print("開始訓練模型...")
     print("[注意] 模型訓練階段無法中途停止，請等待完成...")
-    pipe.fit(X_train, y_train)
+    with budget.limit(model_threads):
+        if refit_policy == 'iterations_from_split':
+            best_iteration = _fit_pipeline_with_early_stopping(
+                pipe, X_train, y_train, X_valid, y_valid)
+            print(f"早停於第 {best_iteration} 棵樹")
+        else:
+            pipe = _fit_training_pipeline(
+                pipe, X_train, y_train, budget, model_threads, **fit_options)
     print("模型訓練完成!")
 
     # 檢查停止標誌
@@ -664,6 +2446,38 @@ def train_model(data_path=DEFAULT_TRAIN_DATA_PATH,
         print("[停止機制] 訓練在模型訓練後被停止")
         return None
 
+    # 特徵修剪：較窄的模型在驗證組的指標都在容許範圍內時，取代訓練組模型並縮減特徵欄位
+    feature_pruning = None
+    if prune:
+        pruning = _prune_features(
+            pipe, feature_cols, X_train, y_train, X_valid, y_valid, prune_top_n,
+            prune_threshold, prune_tolerance, refit_policy, n_repeats, random_state,
+            budget, model_threads, fit_options)
+        if pruning is None:
+            return None
+        feature_pruning, pruned_pipe, pruned_iteration = pruning
+        if feature_pruning['accepted']:
+            pipe = pruned_pipe
+            feature_cols = feature_pruning['kept_columns']
+            X, X_train, X_valid = X[feature_cols], X_train[feature_cols], X_valid[feature_cols]
+            if refit_policy == 'iterations_from_split':
+                best_iteration = pruned_iteration
+
+    # 背景重新訓練：評估、圖表與特徵重要性在訓練組模型上同時進行
+    # 原生執行緒上限是整個行程共用的設定：重疊期間只由主執行緒設定一次，背景工作者不自行設定，
+    # 避免兩個執行緒的 threadpool_limits 以非後進先出的順序還原
+    overlap_limit = ExitStack()
+    refit_executor = None
+    refit_future = None
+    if refit_policy == 'background':
+        print("\n在背景工作者中用全部資料重新訓練最終模型...")
+        final_pipe = clone(pipe)
+        overlap_limit.enter_context(budget.limit(model_threads))
+        refit_executor = ThreadPoolExecutor(max_workers=1)
+        refit_future = refit_executor.submit(
+            _fit_training_pipeline, final_pipe, X, y, budget, model_threads,
+            limit_threads=False, **fit_options)
+
     # 評估模型
     prediction_train = pipe.predict(X_train)
     proba_train = pipe.predict_proba(X_train)[:, 1]
@@ -675,6 +2489,24 @@ def train_model(data_path=DEFAULT_TRAIN_DATA_PATH,
     valid_metrics = display_evaluation_metrics(
         y_valid, prediction_valid, proba_valid, "驗證組")
 
+    # 樹數壓縮在訓練組模型上掃描（最終模型重新訓練時會覆寫此模型，也已看過驗證組）
+    compaction = None
+    if compaction_epsilon is not None:
+        with budget.limit(model_threads):
+            compaction = _plan_tree_compaction(pipe, X_valid, y_valid, compaction_epsilon)
+
+    # 決策門檻以驗證組機率最佳化（有壓縮時使用截斷後樹數的機率，與儲存的模型一致）
+    decision_threshold = None
+    if threshold_metric is not None:
+        if compaction is None:
+            valid_proba = pipe.predict_proba(X_valid)
+        else:
+            valid_proba = pipe.named_steps['model'].predict_proba(
+                pipe.named_steps['DataPreprocess'].transform(X_valid),
+                num_iteration=compaction['selected_trees'])
+        decision_threshold = _optimize_decision_threshold(
+            y_valid, valid_proba, pipe.classes_, threshold_metric, '驗證組')
+
     # 顯示圖表
     if show_plots:
         # ROC 曲線 - 訓練組
@@ -750,16 +2582,45 @@ def train_model(data_path=DEFAULT_TRAIN_DATA_PATH,
         )
         fig.show()
 
-    # 用全部資料重新訓練最終模型
-    print("\n用全部資料重新訓練最終模型...")
+    if refit_policy == 'background':
+        # 特徵重要性在訓練組模型上計算，與背景重新訓練重疊執行
+        feature_importance_sorted = _compute_feature_importance(
+            pipe, X, y, n_repeats, random_state, budget, n_outer=2)
+        if feature_importance_sorted is None:
+            refit_executor.shutdown(wait=False, cancel_futures=True)
+            overlap_limit.close()
+            return None
 
-    # 檢查停止標誌
-    if is_training_stopped():
-        print("[停止機制] 訓練在最終模型訓練前被停止")
-        return None
+        print("\n等待背景重新訓練完成...")
+        try:
+            final_pipe = refit_future.result()
+        finally:
+            refit_executor.shutdown()
+            overlap_limit.close()
+        if final_pipe is None:
+            print("[停止機制] 背景重新訓練被停止")
+            return None
+        apply_thread_budget(final_pipe)
+    elif refit_policy == 'none':
+        print("\n重新訓練策略為 'none'，直接使用訓練組模型作為最終模型")
+        final_pipe = pipe
+    else:
+        # 用全部資料重新訓練最終模型
+        print("\n用全部資料重新訓練最終模型...")
+        final_pipe = pipe
+        if refit_policy == 'iterations_from_split':
+            final_pipe = clone(pipe)
+            final_pipe.set_params(model__n_estimators=best_iteration)
+            print(f"使用早停的樹數量：{best_iteration}")
+
+        # 檢查停止標誌
+        if is_training_stopped():
+            print("[停止機制] 訓練在最終模型訓練前被停止")
+            return None
 
-    print("[注意] 最終模型訓練階段無法中途停止，請等待完成...")
-    pipe.fit(X, y)
+        print("[注意] 最終模型訓練階段無法中途停止，請等待完成...")
+        final_pipe = _fit_training_pipeline(
+            final_pipe, X, y, budget, model_threads, **fit_options)
 
     # 檢查停止標誌
     if is_training_stopped():
@@ -768,17 +2629,449 @@ def train_model(data_path=DEFAULT_TRAIN_DATA_PATH,
 
     # 儲存模型和欄位資訊
     model_info = {
-        'pipeline': pipe,
+        'pipeline': final_pipe,
         'feature_columns': feature_cols,
         'target_column': target_col
     }
+    if compaction is not None:
+        compaction = _apply_tree_compaction(final_pipe, X_valid, compaction,
+                                            measured_on='final' if final_pipe is pipe else 'split')
+        model_info['compaction'] = compaction
+    if decision_threshold is not None:
+        model_info['decision_threshold'] = decision_threshold
+    if feature_pruning is not None:
+        model_info['feature_pruning'] = feature_pruning
+    segments = None
+    if segment_column is not None:
+        segments = _report_segments(final_pipe, X_valid, y_valid, pipe)
+        model_info['segments'] = segments
 
     with open(output_path, "wb") as f:
         pickle.dump(model_info, f)
     print(f"模型已儲存至: {output_path}")
     print(f"包含欄位資訊: 特徵欄位={len(feature_cols)}個, 目標欄位='{target_col}'")
 
-    # 特徵重要性分析
+    if refit_policy != 'background':
+        feature_importance_sorted = _compute_feature_importance(
+            final_pipe, X, y, n_repeats, random_state, budget)
+        if feature_importance_sorted is None:
+            return None
+
+    # 回傳結果
+    results = {
+        'model': final_pipe,
+        'feature_columns': feature_cols,
+        'target_column': target_col,
+        'train_metrics': train_metrics,
+        'valid_metrics': valid_metrics,
+        'feature_importance': feature_importance_sorted,
+        'refit_policy': refit_policy,
+        'compaction': compaction,
+        'decision_threshold': decision_threshold,
+        'segments': segments,
+        'feature_pruning': feature_pruning
+    }
+
+    return results
+
+
+def _plan_tree_compaction(pipe, X_valid, y_valid, epsilon, metrics=None):
+    """
+    在驗證組掃描訓練組模型的前綴樹數，選擇指標下降不超過 epsilon 的最少樹數
+
+    參數:
+        pipe (Pipeline): 以訓練組訓練的 DataPreprocess + LGBMClassifier 管線
+        X_valid, y_valid: 驗證資料
+        epsilon (float): 每個指標允許的下降量
+        metrics (tuple): 評估的指標，None 表示使用 TREE_COMPACTION_METRICS
+
+    回傳:
+        dict: 壓縮設定與每個樹數的驗證指標（'curve'）
+    """
+    if metrics is None:
+        metrics = TREE_COMPACTION_METRICS
+    model = pipe.named_steps['model']
+    # 早停的模型只考慮最佳樹數以內的前綴
+    n_trees = model.best_iteration_ or model.booster_.current_iteration()
+    X_transformed = pipe.named_steps['DataPreprocess'].transform(X_valid)
+    curve = staged_metrics(model, X_transformed, y_valid, sweep_tree_counts(n_trees), metrics)
+    n_selected = select_tree_count(curve, epsilon)
+    print(f"\n樹數壓縮：驗證組上 {n_selected}/{n_trees} 棵樹的 "
+          + "、".join(f"{name} {curve[n_selected][name]:.4f}（完整 {curve[n_trees][name]:.4f}）"
+                     for name in curve[n_trees])
+          + f"，容許下降 {epsilon}")
+    return {
+        'epsilon': epsilon,
+        'metrics': tuple(curve[n_trees]),
+        'swept_trees': n_trees,
+        'selected_trees': n_selected,
+        'valid_metrics_full': curve[n_trees],
+        'valid_metrics': curve[n_selected],
+        'curve': [dict(values, n_trees=n) for n, values in curve.items()]
+    }
+
+
+def _plan_feature_pruning(feature_importance, preprocessor, top_n=None, threshold=None):
+    """
+    依輸出欄位的重要性選擇要保留的欄位，並換算為要移除的原始欄位與獨熱編碼欄位
+
+    參數:
+        feature_importance (list): 依重要性排序的 (輸出欄位, 重要性) 列表
+        preprocessor (DataPreprocess): 已擬合的前處理
+        top_n (int): 只保留重要性最高的前 n 個輸出欄位，None 表示不限
+        threshold (float): 移除重要性低於此值的輸出欄位，None 表示不限
+
+    回傳:
+        dict: 'drop_columns'（所有輸出欄位都被移除的原始欄位）與 'drop_features'
+              （其餘被移除的獨熱編碼欄位）；沒有可移除的欄位時回傳 None
+    """
+    kept = [name for name, importance in feature_importance
+            if threshold is None or importance >= threshold]
+    if top_n is not None:
+        kept = kept[:top_n]
+    if not kept:  # 至少保留最重要的欄位
+        kept = [feature_importance[0][0]]
+    kept = set(kept)
+
+    drop_columns, drop_features = [], []
+    for fname, outputs in preprocessor.output_fields().items():
+        removed = [fn for fn in outputs if fn not in kept]
+        if len(removed) == len(outputs):
+            drop_columns.append(fname)
+        else:
+            drop_features.extend(removed)
+    if not drop_columns and not drop_features:
+        return None
+    return {'drop_columns': drop_columns, 'drop_features': drop_features}
+
+
+def _transform_predict_latency(pipe, X):
+    """每列的前處理轉換與模型預測秒數：各取多次的最短時間"""
+    preprocessor = pipe.named_steps['DataPreprocess']
+    model = pipe.named_steps['model']
+    transform_best = predict_best = np.inf
+    for _ in range(_LATENCY_REPEATS):
+        start = time.perf_counter()
+        X_transformed = preprocessor.transform(X)
+        middle = time.perf_counter()
+        model.predict_proba(X_transformed)
+        end = time.perf_counter()
+        transform_best = min(transform_best, middle - start)
+        predict_best = min(predict_best, end - middle)
+    n_rows = max(1, len(X))
+    return transform_best / n_rows, predict_best / n_rows
+
+
+def _prune_features(pipe, feature_cols, X_train, y_train, X_valid, y_valid, top_n, threshold,
+                    tolerance, refit_policy, n_repeats, random_state, budget, n_threads,
+                    fit_options):
+    """
+    依訓練組保留列的排列重要性修剪特徵，以訓練組重新訓練較窄的管線並比較驗證指標與速度
+
+    重要性不使用驗證組，驗證組只用於判斷是否採用，避免選擇特徵與評估使用同一批資料
+
+    參數:
+        pipe (Pipeline): 以訓練組訓練的管線
+        feature_cols (list): 目前的特徵欄位
+        X_train, y_train, X_valid, y_valid: 訓練與驗證資料
+        top_n, threshold: 修剪條件，見 _plan_feature_pruning
+        tolerance (float): FEATURE_PRUNING_METRICS 每個指標允許的下降量
+        refit_policy (str): 'iterations_from_split' 時較窄的管線同樣以驗證組早停
+        n_repeats, random_state: 排列重要性的設定
+        budget (ThreadBudget): CPU 執行緒預算
+        n_threads (int): 模型執行緒數
+        fit_options (dict): _fit_training_pipeline 的分散式訓練設定
+
+    回傳:
+        tuple: (修剪報告, 較窄的管線, 早停樹數)，沒有可移除的欄位時管線為 None；被停止時回傳 None
+    """
+    X_fit, X_holdout, y_fit, y_holdout = train_test_split(
+        X_train, y_train, test_size=FEATURE_PRUNING_HOLDOUT, random_state=random_state,
+        stratify=y_train)
+    print(f"\n特徵修剪：以 {len(X_fit)} 筆訓練列訓練，在保留的 {len(X_holdout)} 筆訓練列計算重要性")
+    print("[注意] 重要性模型訓練階段無法中途停止，請等待完成...")
+    importance_pipe = _fit_training_pipeline(
+        clone(pipe), X_fit, y_fit, budget, n_threads, **fit_options)
+    if importance_pipe is None or is_training_stopped():
+        print("[停止機制] 訓練在特徵修剪時被停止")
+        return None
+    feature_importance = _compute_feature_importance(
+        importance_pipe, X_holdout, y_holdout, n_repeats, random_state, budget)
+    if feature_importance is None:
+        return None
+    preprocessor = pipe.named_steps['DataPreprocess']
+    report = {
+        'top_n': top_n,
+        'threshold': threshold,
+        'tolerance': tolerance,
+        'accepted': False,
+        'importance_rows': len(X_holdout),
+        'importance': feature_importance,
+    }
+    plan = _plan_feature_pruning(feature_importance, preprocessor, top_n, threshold)
+    if plan is None:
+        print("特徵修剪：沒有可移除的特徵，維持完整特徵")
+        return report, None, None
+
+    pruned_cols = [col for col in feature_cols if col not in plan['drop_columns']]
+    pruned_pipe = clone(pipe).set_params(
+        DataPreprocess__drop_features=tuple(plan['drop_features']) or None)
+    print(f"特徵修剪：移除 {len(plan['drop_columns'])} 個原始欄位與 "
+          f"{len(plan['drop_features'])} 個獨熱編碼欄位，以訓練組重新訓練...")
+    print("[注意] 修剪後模型訓練階段無法中途停止，請等待完成...")
+    pruned_iteration = None
+    if refit_policy == 'iterations_from_split':
+        with budget.limit(n_threads):
+            pruned_iteration = _fit_pipeline_with_early_stopping(
+                pruned_pipe, X_train[pruned_cols], y_train, X_valid[pruned_cols], y_valid)
+    else:
+        pruned_pipe = _fit_training_pipeline(
+            pruned_pipe, X_train[pruned_cols], y_train, budget, n_threads, **fit_options)
+    if pruned_pipe is None or is_training_stopped():
+        print("[停止機制] 訓練在特徵修剪時被停止")
+        return None
+
+    with budget.limit(n_threads):
+        full_metrics = score_from_proba(y_valid, pipe.predict_proba(X_valid), pipe.classes_,
+                                        FEATURE_PRUNING_METRICS)
+        pruned_metrics = score_from_proba(
+            y_valid, pruned_pipe.predict_proba(X_valid[pruned_cols]), pruned_pipe.classes_,
+            FEATURE_PRUNING_METRICS)
+        full_transform, full_predict = _transform_predict_latency(pipe, X_valid)
+        pruned_transform, pruned_predict = _transform_predict_latency(
+            pruned_pipe, X_valid[pruned_cols])
+    accepted = all(pruned_metrics[name] >= full_metrics[name] - tolerance
+                   for name in FEATURE_PRUNING_METRICS)
+    n_features = len(preprocessor.final_field_names)
+    n_pruned = len(pruned_pipe.named_steps['DataPreprocess'].final_field_names)
+    report.update({
+        'accepted': accepted,
+        'kept_columns': pruned_cols,
+        'drop_columns': plan['drop_columns'],
+        'drop_features': plan['drop_features'],
+        'n_features': {'full': n_features, 'pruned': n_pruned},
+        'valid_metrics_full': full_metrics,
+        'valid_metrics': pruned_metrics,
+        'transform_seconds_per_row': {'full': full_transform, 'pruned': pruned_transform},
+        'predict_seconds_per_row': {'full': full_predict, 'pruned': pruned_predict},
+        'speedup': {'transform': full_transform / max(pruned_transform, 1e-12),
+                    'predict': full_predict / max(pruned_predict, 1e-12)},
+    })
+
+    print(f"特徵修剪：輸出欄位 {n_features} → {n_pruned}，原始欄位 {len(feature_cols)} → {len(pruned_cols)}")
+    print("   驗證組 " + "、".join(f"{name} {pruned_metrics[name]:.4f}（完整 {full_metrics[name]:.4f}）"
+                             for name in FEATURE_PRUNING_METRICS) + f"，容許下降 {tolerance}")
+    print(f"   每列轉換 {full_transform * 1e6:.2f} → {pruned_transform * 1e6:.2f} 微秒"
+          f"（{report['speedup']['transform']:.2f}x），"
+          f"每列預測 {full_predict * 1e6:.2f} → {pruned_predict * 1e6:.2f} 微秒"
+          f"（{report['speedup']['predict']:.2f}x）")
+    if accepted:
+        print("✅ 採用修剪後的特徵")
+    else:
+        print("⚠️ 修剪後的指標下降超過容許範圍，維持完整特徵")
+    return report, pruned_pipe, pruned_iteration
+
+
+def _report_segments(final_pipe, X_valid, y_valid, split_pipe):
+    """
+    整理並輸出分段模型的路由資訊與各分段在驗證組的表現（以訓練組模型評估）
+
+    參數:
+        final_pipe (SegmentedClassifier): 儲存的最終模型
+        X_valid, y_valid: 驗證資料
+        split_pipe (SegmentedClassifier): 以訓練組訓練的模型
+
+    回傳:
+        dict: 'column'、'segment_rows'（最終模型每個分段的訓練列數，全域模型以全部資料訓練）
+              與 'valid_metrics'（{分段: {'rows', 'f1_macro'}}，None 為全域模型預測的列）
+    """
+    routes = split_pipe.route(X_valid)
+    y_pred = split_pipe.predict(X_valid)
+    names = list(split_pipe.segment_models_)
+    y_valid = np.asarray(y_valid)
+    valid_metrics = {}
+    for route in np.unique(routes):
+        rows = routes == route
+        valid_metrics[None if route < 0 else names[route]] = {
+            'rows': int(rows.sum()),
+            'f1_macro': float(f1_score(y_valid[rows], y_pred[rows], average='macro'))
+        }
+    segments = {
+        'column': final_pipe.segment_column,
+        'segment_rows': dict(final_pipe.segment_rows_),
+        'valid_metrics': valid_metrics
+    }
+    print(f"\n🧭 分段模型：{len(final_pipe.segment_models_)} 個分段模型 + 全域模型（'{final_pipe.segment_column}'）")
+    for segment, values in valid_metrics.items():
+        name = '全域模型' if segment is None else segment
+        print(f"   {name}: 驗證組 {values['rows']} 筆，f1_macro {values['f1_macro']:.4f}")
+    return segments
+
+
+def _optimize_decision_threshold(y_true, proba, classes, metric, source):
+    """
+    找出指標最高的決策門檻並輸出與預設門檻 0.5 的比較
+
+    參數:
+        y_true: 真實類別
+        proba (ndarray): 預測機率（out-of-fold 陣列中沒有預測的列為 NaN，會被略過）
+        classes (ndarray): 模型的 classes_
+        metric (str): 'f1_macro' 或 'balanced_accuracy'
+        source (str): 機率來源的說明，例如 '驗證組'
+
+    回傳:
+        dict: optimize_threshold 的結果加上 'source'
+    """
+    result = dict(optimize_threshold(y_true, proba, classes, metric), source=source)
+    print(f"\n🎯 決策門檻最佳化（{source} {result['n_rows']} 筆）：門檻 {result['threshold']:.4f}，"
+          f"{metric} {result['default_score']:.4f} → {result['score']:.4f}（門檻 0.5 → 最佳門檻）")
+    return result
+
+
+def _apply_tree_compaction(final_pipe, X_valid, compaction, measured_on):
+    """
+    將最終模型截斷為壓縮選擇的樹數，並記錄截斷前後的每列預測時間與模型大小
+
+    參數:
+        final_pipe (Pipeline): 儲存的最終模型
+        X_valid: 驗證資料
+        compaction (dict): _plan_tree_compaction 的結果
+        measured_on (str): 驗證指標來自哪個模型，'final' 為最終模型本身，
+                           'split' 為以訓練組訓練的模型（最終模型以相同樹數重新訓練）
+
+    回傳:
+        dict: 加上 'measured_on'、'original_trees'、'trees'、'latency_full'、'latency'、
+              'model_bytes_full'、'model_bytes' 與 'speedup' 的壓縮資訊
+    """
+    model = final_pipe.named_steps['model']
+    original_trees = model.booster_.current_iteration()
+    n_trees = min(compaction['selected_trees'], original_trees)
+    X_transformed = final_pipe.named_steps['DataPreprocess'].transform(X_valid)
+    latency_full = _predict_latency(model, X_transformed)
+    bytes_full = _model_size_bytes(model)
+    truncate_model(model, n_trees)
+    latency = _predict_latency(model, X_transformed)
+    compaction = dict(compaction,
+                      measured_on=measured_on,
+                      original_trees=original_trees,
+                      trees=n_trees,
+                      latency_full=latency_full,
+                      latency=latency,
+                      model_bytes_full=bytes_full,
+                      model_bytes=_model_size_bytes(model),
+                      speedup=latency_full / latency if latency > 0 else None)
+    speedup_text = f"，預測加速 {compaction['speedup']:.1f} 倍" if compaction['speedup'] else ""
+    print(f"✂️ 最終模型由 {original_trees} 棵樹截斷為 {n_trees} 棵：每列預測 "
+          f"{latency_full * 1e6:.2f} → {latency * 1e6:.2f} µs，模型 "
+          f"{format_bytes(bytes_full)} → {format_bytes(compaction['model_bytes'])}{speedup_text}")
+    if measured_on == 'split':
+        print("   壓縮的驗證指標是在訓練組模型上量測，最終模型以全部資料重新訓練")
+    return compaction
+
+
+def _report_training_estimate(pipe, X_train, y_train, n_rows, refit_policy, budget, n_threads,
+                              random_state=RANDOM_STATE, prune=False):
+    """
+    校準訓練成本並輸出 train_model 的預估時間與峰值記憶體（不含特徵重要性計算）
+
+    回傳:
+        CostEstimate: 校準結果
+    """
+    # 分段模型：各分段合計與全域模型各訓練一次全部列，由平行工作者分攤
+    segmented = isinstance(pipe, SegmentedClassifier)
+    n_workers = 1
+    if segmented:
+        n_workers = pipe.n_workers
+        pipe = pipe.template_pipeline()
+    with budget.limit(n_threads):
+        estimate = calibrate(pipe, X_train, y_train, sample_rows=COST_CALIBRATION_ROWS,
+                             random_state=random_state)
+    n_trees = pipe.get_params()['model__n_estimators']
+    fits = [(len(X_train), n_trees)]
+    if prune:
+        # 特徵修剪：計算重要性的模型與修剪後重新訓練（特徵較少，為上限）
+        fits.append((int(len(X_train) * (1 - FEATURE_PRUNING_HOLDOUT)), n_trees))
+        fits.append((len(X_train), n_trees))
+    if refit_policy != 'none':
+        fits.append((n_rows, n_trees))  # 以全部資料重新訓練（早停時樹數只會更少）
+    if segmented:
+        fits = fits * 2
+    seconds = estimate.search_seconds(fits, n_workers=min(n_workers, 2))
+    finish = pd.Timestamp.now() + pd.Timedelta(seconds=seconds)
+    print(f"成本校準：每棵樹每千列 {estimate.seconds_per_tree_per_1k_rows * 1000:.2f} 毫秒"
+          f"（{estimate.n_features} 個特徵）")
+    print(f"預估訓練時間：約 {format_duration(seconds)}（{len(fits)} 次訓練，"
+          f"預估完成時間 {finish.strftime('%H:%M:%S')}）")
+    print(f"預估峰值記憶體：約 {format_bytes(estimate.peak_memory_bytes(n_rows, n_rows))}")
+    return estimate
+
+
+def _fit_training_pipeline(pipe, X, y, budget, n_threads, distributed_workers=0,
+                           distributed_machines=None, random_state=RANDOM_STATE,
+                           limit_threads=True):
+    """
+    在執行緒預算限制下訓練管線並回傳管線
+
+    設定 distributed_workers > 1 或 distributed_machines 時，
+    改以多個工作行程的 LightGBM 資料平行模式訓練，被停止時回傳 None；
+    limit_threads=False 時不設定原生執行緒上限（背景工作者由主執行緒統一設定）
+    """
+    if distributed_machines or (distributed_workers or 0) > 1:
+        return fit_pipeline_data_parallel(
+            pipe, X, y, n_workers=distributed_workers, machines=distributed_machines,
+            random_state=random_state, n_jobs=n_threads, should_stop=is_training_stopped)
+
+    if not limit_threads:
+        return pipe.fit(X, y)
+    with budget.limit(n_threads):
+        pipe.fit(X, y)
+    return pipe
+
+
+def _fit_pipeline_with_early_stopping(pipe, X_train, y_train, X_valid, y_valid,
+                                      early_stopping_rounds=None):
+    """
+    以驗證組早停訓練管線
+
+    參數:
+        pipe (Pipeline): 包含 DataPreprocess 和 model 的管線
+        X_train, y_train: 訓練資料
+        X_valid, y_valid: 早停使用的驗證資料
+        early_stopping_rounds (int): 早停輪數，None 表示使用 EARLY_STOPPING_ROUNDS
+
+    回傳:
+        int: 早停時的最佳樹數量
+    """
+    if early_stopping_rounds is None:
+        early_stopping_rounds = EARLY_STOPPING_ROUNDS
+
+    preprocessor = pipe.named_steps['DataPreprocess']
+    model = pipe.named_steps['model']
+    preprocessor.fit(X_train, y_train)
+    model.fit(preprocessor.transform(X_train), y_train,
+              eval_set=[(preprocessor.transform(X_valid), y_valid)],
+              callbacks=[lgb.early_stopping(early_stopping_rounds, verbose=False)])
+    return model.best_iteration_ or model.n_estimators
+
+
+def _compute_feature_importance(pipe, X, y, n_repeats, random_state, budget, n_outer=1):
+    """
+    計算並顯示排列特徵重要性
+
+    單一模型的管線先轉換一次，再對模型逐一排列每個輸出欄位（獨熱編碼的每個值各自計算）；
+    分段模型的路由需要原始欄位，因此排列原始欄位
+
+    參數:
+        pipe (Pipeline or SegmentedClassifier): 已訓練的管線
+        X, y: 計算重要性使用的資料
+        n_repeats (int): 重複次數
+        random_state (int): 隨機種子
+        budget (ThreadBudget): CPU 執行緒預算
+        n_outer (int): 與其他工作同時進行時共用預算的工作者數
+
+    回傳:
+        list: 依重要性排序的 (特徵, 重要性) 列表，如果被停止則回傳 None
+    """
     print("\n計算特徵重要性...")
 
     # 檢查停止標誌
@@ -787,13 +3080,26 @@ def train_model(data_path=DEFAULT_TRAIN_DATA_PATH,
         return None
 
     print("[注意] 特徵重要性計算階段無法中途停止，請等待完成...")
-    result = permutation_importance(
-        pipe, X, y, scoring=IMPORTANCE_SCORING, n_repeats=n_repeats, random_state=random_state)
+    # 外層平行工作者與模型內層執行緒共用同一份核心預算
+    _, available_threads = budget.split(n_outer)
+    importance_workers, importance_threads = ThreadBudget(
+        available_threads).split(IMPORTANCE_N_JOBS)
+    if isinstance(pipe, SegmentedClassifier):
+        estimator, X_permuted = pipe, X
+        features = list(X.columns)
+    else:
+        # 排列前處理的輸出欄位，重要性與預處理器的最終欄位名稱一一對應
+        preprocessor = pipe.named_steps['DataPreprocess']
+        estimator, X_permuted = pipe.named_steps['model'], preprocessor.transform(X)
+        features = preprocessor.final_field_names
+    ThreadBudget.apply_to_estimator(pipe, importance_threads)
+    with budget.limit(importance_threads):
+        result = permutation_importance(
+            estimator, X_permuted, y, scoring=IMPORTANCE_SCORING, n_repeats=n_repeats,
+            random_state=random_state, n_jobs=importance_workers)
+    apply_thread_budget(pipe)
 
     importances = getattr(result, 'importances_mean')
-    # 使用預處理器的最終欄位名稱而不是原始欄位名稱
-    preprocessor = pipe.named_steps['DataPreprocess']
-    features = preprocessor.final_field_names
 
     feature_importance = list(zip(features, importances))
     feature_importance_sorted = sorted(
@@ -803,17 +3109,7 @@ def train_model(data_path=DEFAULT_TRAIN_DATA_PATH,
     for feature, importance in feature_importance_sorted:
         print(f"{feature}: {importance:.4f}")
 
-    # 回傳結果
-    results = {
-        'model': pipe,
-        'feature_columns': feature_cols,
-        'target_column': target_col,
-        'train_metrics': train_metrics,
-        'valid_metrics': valid_metrics,
-        'feature_importance': feature_importance_sorted
-    }
-
-    return results
+    return feature_importance_sorted
 
 
 def hyperparameter_tuning(data_path=DEFAULT_TRAIN_DATA_PATH,
@@ -825,7 +3121,18 @@ def hyperparameter_tuning(data_path=DEFAULT_TRAIN_DATA_PATH,
                           random_state=RANDOM_STATE,
                           cv_folds=CV_FOLDS,
                           param_grid=None,
-                          exclude_columns=None):
+                          exclude_columns=None,
+                          search_mode=None,
+                          param_space=None,
+                          n_trials=None,
+                          time_budget_seconds=None,
+                          trial_store_path=None,
+                          pruner=None,
+                          coordinator_address=None,
+                          output_path=None,
+                          latency_tolerance=None,
+                          oof_dir=None,
+                          threshold_metric=None):
     """
     執行超參數調優
 
@@ -840,11 +3147,65 @@ def hyperparameter_tuning(data_path=DEFAULT_TRAIN_DATA_PATH,
         cv_folds (int): 交叉驗證折數
         param_grid (dict): 參數搜尋網格，None表示使用預設
         exclude_columns (list): 要排除的高相關度欄位列表，如 ['rating'] (相關度0.885)，None表示不排除任何欄位
+        search_mode (str): 'grid'、'halving'、'multi_fidelity' 或 'tpe'，None表示使用 SEARCH_MODE 設定
+        param_space (dict): TPE 模式的參數範圍 {參數: (類型, 下限, 上限)}，None表示使用 PARAM_SPACE
+        n_trials (int): TPE 模式的最大試驗次數，None表示使用 TPE_N_TRIALS
+        time_budget_seconds (float): 搜尋的時間預算（秒），None表示使用 TUNING_TIME_BUDGET_SECONDS
+        trial_store_path (str): 試驗記錄 SQLite 路徑，None表示使用 TRIAL_STORE_PATH，空字串表示不記錄
+        pruner (str): 網格/逐次減半模式的剪枝器 'median' 或 'bound'，None表示使用 TUNING_PRUNER
+        coordinator_address (str): 分散式協調者監聽位址 'host:port'，None表示使用 TUNING_COORDINATOR
+        output_path (str): 可選，最佳模型為 fold 模型集成時直接儲存為最終模型檔，不需重新訓練
+        latency_tolerance (float): 分數容忍值，選擇容忍範圍內每列預測最快的組合，None表示使用 TUNING_LATENCY_TOLERANCE
+        oof_dir (str): out-of-fold 預測資料夾，None表示使用 TUNING_OOF_DIR，空字串表示不保存
+        threshold_metric (str): 決策門檻最佳化的指標，None表示使用 DECISION_THRESHOLD_METRIC；
+            有 out-of-fold 預測時以最佳組合的 out-of-fold 機率最佳化，否則使用驗證組
 
     回傳:
         dict: 最佳參數和模型，如果被停止則回傳 None
     """
     print("開始超參數調優...")
+    if search_mode is None:
+        search_mode = SEARCH_MODE
+    if trial_store_path is None:
+        trial_store_path = TRIAL_STORE_PATH
+    trial_store_path = trial_store_path or None
+    if pruner is None:
+        pruner = TUNING_PRUNER
+    if time_budget_seconds is None:
+        time_budget_seconds = TUNING_TIME_BUDGET_SECONDS
+    if latency_tolerance is None:
+        latency_tolerance = TUNING_LATENCY_TOLERANCE
+    if oof_dir is None:
+        oof_dir = TUNING_OOF_DIR
+    oof_dir = oof_dir or None
+    if threshold_metric is None:
+        threshold_metric = DECISION_THRESHOLD_METRIC
+    if latency_tolerance is not None and latency_tolerance < 0:
+        print(f"❌ latency_tolerance 必須大於或等於 0，但得到: {latency_tolerance}")
+        return None
+    if not validate_input_parameters(threshold_metric=threshold_metric):
+        return None
+    try:
+        pruner = get_pruner(pruner)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return None
+    if search_mode not in SEARCH_MODES:
+        print(f"❌ search_mode 必須為 {SEARCH_MODES} 之一，但得到: {search_mode}")
+        return None
+    if TUNING_METRICS is not None:
+        try:
+            validate_metrics((SCORING_METRIC,) + tuple(TUNING_METRICS))
+        except ValueError as e:
+            print(f"❌ {e}")
+            return None
+    if coordinator_address is None:
+        coordinator_address = TUNING_COORDINATOR
+    if coordinator_address:
+        host, _, port = str(coordinator_address).rpartition(':')
+        if not port.isdigit():
+            print(f"❌ 協調者位址必須為 'host:port' 格式，但得到: {coordinator_address}")
+            return None
 
     # 載入和驗證資料
     data, feature_cols, target_col = load_and_validate_data(
@@ -869,9 +3230,9 @@ def hyperparameter_tuning(data_path=DEFAULT_TRAIN_DATA_PATH,
     X_train, X_valid, y_train, y_valid = train_test_split(
         X, y, test_size=test_size, random_state=random_state, stratify=y)
 
-    model = LGBMClassifier(n_jobs=MODEL_N_JOBS,
-                           random_state=random_state, verbose=MODEL_VERBOSE)
-    pipe = Pipeline([('DataPreprocess', DataPreprocess()), ('model', model)])
+    model = LGBMClassifier(random_state=random_state, verbose=MODEL_VERBOSE)
+    pipe = Pipeline([('DataPreprocess', DataPreprocess(output=PREPROCESS_OUTPUT)),
+                     ('model', model)])
 
     # 使用傳入的參數網格或預設網格
     if param_grid is None:
@@ -880,32 +3241,137 @@ def hyperparameter_tuning(data_path=DEFAULT_TRAIN_DATA_PATH,
     cv = StratifiedKFold(n_splits=cv_folds, shuffle=True,
                          random_state=random_state)
 
-    # 使用可停止的網格搜尋
-    grid_search = StoppableGridSearchCV(
-        estimator=pipe,
-        param_grid=param_grid,
-        scoring=SCORING_METRIC,
-        cv=cv,
-        verbose=2,  # 顯示詳細進度
-        n_jobs=1    # 使用單執行緒確保停止機制正常運作
-    )
-
-    # 計算總組合數
-    total_combinations = (len(param_grid['model__n_estimators']) *
-                          len(param_grid['model__learning_rate']) *
-                          len(param_grid['model__num_leaves']) *
-                          len(param_grid['model__scale_pos_weight']) *
-                          len(param_grid['model__reg_alpha']))
-    total_fits = total_combinations * cv_folds
+    # 依 CPU 執行緒預算分配搜尋工作者與模型執行緒
+    budget = get_thread_budget()
+    n_workers, model_threads = apply_thread_budget(pipe, TUNING_N_JOBS)
+
+    # 分散式搜尋：工作者從相同的資料路徑載入資料，依列標籤重建訓練集
+    coordinator = None
+    if coordinator_address:
+        coordinator = TuningCoordinator(data_path, host=host or '127.0.0.1', port=int(port),
+                                        heartbeat_timeout=TUNING_HEARTBEAT_TIMEOUT).start()
+
+    if search_mode == 'tpe':
+        # TPE 序列搜尋：依已完成試驗的分數逐次建議下一組參數
+        if param_space is None:
+            param_space = PARAM_SPACE
+        if n_trials is None:
+            n_trials = TPE_N_TRIALS
+        try:
+            grid_search = StoppableTPESearchCV(
+                estimator=pipe,
+                param_space=param_space,
+                scoring=SCORING_METRIC,
+                cv=cv,
+                verbose=2,
+                n_jobs=n_workers,
+                n_trials=n_trials,
+                time_budget_seconds=time_budget_seconds,
+                random_state=random_state,
+                trial_store=trial_store_path,
+                coordinator=coordinator,
+                metrics=TUNING_METRICS,
+                cache_folds=TUNING_CACHE_FOLDS,
+                keep_fold_models=TUNING_KEEP_FOLD_MODELS,
+                latency_tolerance=latency_tolerance,
+                oof_dir=oof_dir
+            )
+        except ValueError as e:
+            print(f"❌ 參數範圍設定錯誤: {e}")
+            if coordinator is not None:
+                coordinator.close()
+            return None
+        total_combinations = n_trials
+        search_space = param_space
+    else:
+        # 使用可停止的網格搜尋（平行工作者共用停止事件，停止機制仍然有效）
+        grid_search = StoppableGridSearchCV(
+            estimator=pipe,
+            param_grid=param_grid,
+            scoring=SCORING_METRIC,
+            cv=cv,
+            verbose=2,  # 顯示詳細進度
+            n_jobs=n_workers,
+            search_mode=search_mode,
+            factor=HALVING_FACTOR,
+            resource=HALVING_RESOURCE,
+            min_resources=HALVING_MIN_RESOURCES,
+            random_state=random_state,
+            staged_n_estimators=STAGED_N_ESTIMATORS,
+            trial_store=trial_store_path,
+            pruner=pruner,
+            coordinator=coordinator,
+            metrics=TUNING_METRICS,
+            cache_folds=TUNING_CACHE_FOLDS,
+            time_budget_seconds=time_budget_seconds,
+            subsample=MULTI_FIDELITY_SUBSAMPLE,
+            top_k=MULTI_FIDELITY_TOP_K,
+            keep_fold_models=TUNING_KEEP_FOLD_MODELS,
+            latency_tolerance=latency_tolerance,
+            oof_dir=oof_dir
+        )
+        total_combinations = len(ParameterGrid(param_grid))
+        search_space = param_grid
+
+    # 計算總訓練次數（只差在樹數量的組合共用一次訓練，逐次減半與多精度搜尋的前段只用部分預算）
+    n_fit_rows = len(X_train) * (cv_folds - 1) // cv_folds
+    planned_fits = grid_search.planned_fits(n_fit_rows)
+    total_fits = len(planned_fits)
+    n_preprocess_settings = _count_preprocess_settings(search_space, search_mode)
+
+    # 以抽樣資料的短訓練校準成本，外推整個搜尋的時間與記憶體
+    cost_estimate = None
+    if COST_ESTIMATE:
+        with budget.limit(model_threads):
+            cost_estimate = calibrate(pipe, X_train, y_train, sample_rows=COST_CALIBRATION_ROWS,
+                                      random_state=random_state)
 
     print(f"\n=== 超參數調優配置 ===")
     print(f"參數組合數：{total_combinations} 個")
     print(f"交叉驗證：{cv_folds} fold")
+    print(f"搜尋模式：{search_mode}")
+    if coordinator is not None:
+        print(f"分散式協調者：{coordinator.address}（工作者執行 "
+              f"python -m ai_utils.tuning_cluster --coordinator {coordinator.address}）")
+    else:
+        print(f"平行工作者：{n_workers} 個（每個 {model_threads} 個執行緒）")
+    print(f"試驗記錄：{trial_store_path or '不記錄'}")
+    print(f"剪枝器：{pruner if pruner is not None else '不剪枝'}")
+    print(f"fold 前處理與分箱快取：{'啟用' if TUNING_CACHE_FOLDS else '停用'}")
+    if n_preprocess_settings is None:
+        print("前處理設定：依 TPE 取樣而定")
+    elif n_preprocess_settings > 1:
+        print(f"前處理設定：{n_preprocess_settings} 種"
+              f"{'（每個 fold 每種設定只前處理一次）' if TUNING_CACHE_FOLDS else ''}")
+    print(f"時間預算：{f'{time_budget_seconds} 秒' if time_budget_seconds else '不限'}")
+    print(f"最佳模型：{'各 fold 模型的軟投票集成' if TUNING_KEEP_FOLD_MODELS else '僅回傳最佳參數'}")
+    if TUNING_METRICS is not None:
+        print(f"評分指標：{', '.join(grid_search.metrics)}（依 {SCORING_METRIC} 排序）")
     print(f"總計算次數：{total_fits} 次模型訓練")
+    if cost_estimate is not None:
+        n_parallel = 1 if coordinator is not None else n_workers
+        # fold 快取讓每個工作者的每個 fold 在每種前處理設定下只前處理並建構一次 Dataset
+        n_setups = None
+        if TUNING_CACHE_FOLDS and n_preprocess_settings is not None:
+            n_setups = (len({n_rows for n_rows, _ in planned_fits}) * cv_folds * n_parallel
+                        * n_preprocess_settings)
+        search_seconds = cost_estimate.search_seconds(planned_fits, n_parallel, n_setups)
+        if time_budget_seconds:
+            search_seconds = min(search_seconds, time_budget_seconds)
+        memory = cost_estimate.peak_memory_bytes(
+            len(X_train), n_fit_rows, n_workers=n_parallel,
+            n_resident_folds=cv_folds * (n_preprocess_settings or 1) if TUNING_CACHE_FOLDS else 1)
+        print(f"成本校準：每棵樹每千列 {cost_estimate.seconds_per_tree_per_1k_rows * 1000:.2f} 毫秒"
+              f"（{cost_estimate.n_features} 個特徵）")
+        finish = pd.Timestamp.now() + pd.Timedelta(seconds=search_seconds)
+        print(f"預估搜尋時間：約 {format_duration(search_seconds)}"
+              f"{'（單一工作者，實際依遠端工作者數而定）' if coordinator is not None else ''}，"
+              f"預估完成時間 {finish.strftime('%H:%M:%S')}")
+        print(f"預估峰值記憶體：約 {format_bytes(memory)}")
     print(f"開始時間：{pd.Timestamp.now().strftime('%H:%M:%S')}")
 
     print(f"\n參數搜尋範圍：")
-    for param, values in param_grid.items():
+    for param, values in search_space.items():
         print(f"  {param}: {values}")
 
     print(f"\n開始執行超參數搜尋...")
@@ -914,10 +3380,17 @@ def hyperparameter_tuning(data_path=DEFAULT_TRAIN_DATA_PATH,
     # 檢查停止標誌
     if is_training_stopped():
         print("[停止機制] 超參數調優在網格搜尋前被停止")
+        if coordinator is not None:
+            coordinator.close()
         return None
 
     print("✅ 現在支援中途停止超參數搜尋!")
-    result = grid_search.fit(X_train, y_train)
+    try:
+        with budget.limit(model_threads):
+            result = grid_search.fit(X_train, y_train)
+    finally:
+        if coordinator is not None:
+            coordinator.close()
 
     # 檢查是否因停止而提前結束
     if result is None:
@@ -944,27 +3417,85 @@ def hyperparameter_tuning(data_path=DEFAULT_TRAIN_DATA_PATH,
         return None
 
     print("最佳參數組合:", grid_search.best_params_)
-    print("最佳 f1_macro 分數:", grid_search.best_score_)
+    print(f"最佳 {SCORING_METRIC} 分數:", grid_search.best_score_)
+    best_metrics = grid_search.best_metrics_
+    if best_metrics:
+        for name, value in best_metrics.items():
+            print(f"   {name}: {value:.4f}")
 
     best_model = grid_search.best_estimator_
 
-    # 檢查停止標誌，如果被停止則跳過驗證步驟
-    if not is_training_stopped():
-        y_pred = best_model.predict(X_valid)
+    # 檢查停止標誌，如果被停止則跳過驗證步驟（未訓練的最佳估計器無法預測）
+    decision_threshold = None
+    if not is_training_stopped() and isinstance(best_model, CVEnsembleClassifier):
+        with budget.limit(model_threads):
+            valid_proba = best_model.predict_proba(X_valid)
+        if threshold_metric is not None:
+            # out-of-fold 機率涵蓋整個訓練組且來自集成中的 fold 模型，比驗證組穩定
+            best_oof = grid_search.best_oof_
+            if best_oof is not None:
+                decision_threshold = _optimize_decision_threshold(
+                    y_train, best_oof, best_model.classes_, threshold_metric, 'out-of-fold')
+            else:
+                decision_threshold = _optimize_decision_threshold(
+                    y_valid, valid_proba, best_model.classes_, threshold_metric, '驗證組')
+            y_pred = apply_threshold(valid_proba, best_model.classes_,
+                                     decision_threshold['threshold'])
+        else:
+            y_pred = best_model.classes_[np.argmax(valid_proba, axis=1)]
         print("\n最佳模型在驗證組的表現:")
         print(classification_report(y_valid, y_pred))
-    else:
+    elif is_training_stopped():
         print("\n[停止機制] 跳過模型驗證步驟")
 
+    model_path = None
+    if output_path and isinstance(best_model, CVEnsembleClassifier):
+        # 與 train_model 相同的模型檔格式，預測範例與 load_model_with_info 可直接載入
+        model_info = {
+            'pipeline': best_model,
+            'feature_columns': feature_cols,
+            'target_column': target_col,
+            'best_params': grid_search.best_params_
+        }
+        if decision_threshold is not None:
+            model_info['decision_threshold'] = decision_threshold
+        with open(output_path, "wb") as f:
+            pickle.dump(model_info, f)
+        model_path = output_path
+        print(f"fold 集成模型已儲存至: {output_path}（不需再以最佳參數重新訓練）")
+
     return {
         'best_params': grid_search.best_params_,
         'best_score': grid_search.best_score_,
+        'best_metrics': best_metrics,
+        'coverage': grid_search.coverage_,
+        'speedup': grid_search.speedup_,
+        'pareto_front': grid_search.pareto_front_,
+        'oof_dir': oof_dir,
+        'decision_threshold': decision_threshold,
         'best_model': best_model,
+        'model_path': model_path,
         'feature_columns': feature_cols,
         'target_column': target_col
     }
 
 
+def _count_preprocess_settings(search_space, search_mode):
+    """
+    搜尋範圍中不同的前處理設定（DataPreprocess__* 參數的組合）數量
+
+    回傳:
+        int: 設定數量，TPE 範圍包含前處理參數時無法事先得知，回傳 None
+    """
+    preprocess = {key: values for key, values in search_space.items()
+                  if key.startswith('DataPreprocess__')}
+    if not preprocess:
+        return 1
+    if search_mode == 'tpe':
+        return None
+    return len(ParameterGrid(preprocess))
+
+
 def load_model_with_info(model_path, default_target_column=TARGET_COLUMN):
     """
     載入模型和欄位資訊
@@ -983,14 +3514,17 @@ def load_model_with_info(model_path, default_target_column=TARGET_COLUMN):
         # 兼容舊版本模型檔案（只有 pipeline）
         if hasattr(model_info, 'predict'):  # 這是舊版本的 pipeline 物件
             print("⚠️  載入的是舊版本模型，缺少欄位資訊，需要手動指定特徵欄位")
-            return {
+            model_info = {
                 'pipeline': model_info,
                 'feature_columns': None,  # 需要手動指定
                 'target_column': default_target_column
             }
         else:  # 新版本包含完整資訊
             print("✅ 載入新版本模型，包含完整欄位資訊")
-            return model_info
+
+        # 訓練時的執行緒設定不一定適合目前機器，依本機核心預算重新設定
+        apply_thread_budget(model_info['pipeline'])
+        return model_info
 
     except FileNotFoundError:
         print(f"❌ 找不到模型檔案: {model_path}")
@@ -1000,6 +3534,177 @@ def load_model_with_info(model_path, default_target_column=TARGET_COLUMN):
         return None
 
 
+def predict_with_info(model_info, X):
+    """
+    以模型檔資訊預測，模型檔有決策門檻時以門檻取代預設的 0.5
+
+    參數:
+        model_info (dict): load_model_with_info 載入的模型資訊
+        X (DataFrame): 特徵資料
+
+    回傳:
+        tuple: (預測類別, 預測機率)
+    """
+    pipeline = model_info['pipeline']
+    probabilities = pipeline.predict_proba(X)
+    decision_threshold = model_info.get('decision_threshold')
+    if decision_threshold is None:
+        predictions = pipeline.classes_[np.argmax(probabilities, axis=1)]
+    else:
+        predictions = apply_threshold(probabilities, pipeline.classes_,
+                                      decision_threshold['threshold'])
+    return predictions, probabilities
+
+
+def update_model(model_path,
+                 new_data_path,
+                 extra_trees=50,
+                 output_path=None,
+                 base_data_path=None,
+                 extend_vocabulary=False,
+                 learning_rate=None):
+    """
+    以新資料繼續提升(boosting)既有模型，不需從頭重新訓練
+
+    參數:
+        model_path (str): 既有模型檔案路徑
+        new_data_path (str): 新評論資料路徑
+        extra_trees (int): 要額外增加的樹數量
+        output_path (str): 更新後模型的輸出路徑，None 表示覆寫原模型
+        base_data_path (str): 原始訓練資料路徑，提供時以「原始 + 新資料」繼續訓練
+        extend_vocabulary (bool): 是否將新資料中未見過的類別值加入獨熱編碼
+        learning_rate (float): 新增樹使用的學習率，None 表示沿用原模型設定
+
+    回傳:
+        dict: 包含更新後模型和評估結果的字典，如果失敗或被停止則回傳 None
+    """
+    if is_training_stopped():
+        print("[停止機制] 模型更新在開始前被停止")
+        return None
+
+    if not validate_input_parameters(n_estimators=extra_trees):
+        return None
+    if learning_rate is not None and not validate_input_parameters(learning_rate=learning_rate):
+        return None
+
+    model_info = load_model_with_info(model_path)
+    if model_info is None:
+        return None
+    feature_cols = model_info['feature_columns']
+    target_col = model_info['target_column']
+    if feature_cols is None:
+        print("❌ 舊版本模型缺少特徵欄位資訊，無法繼續訓練，請改用 train_model 重新訓練")
+        return None
+
+    # 載入新資料（以及可選的原始資料）
+    data, _, _ = load_and_validate_data(
+        new_data_path, feature_cols, target_col, target_col)
+    if data is None:
+        return None
+    if base_data_path is not None:
+        base_data, _, _ = load_and_validate_data(
+            base_data_path, feature_cols, target_col, target_col)
+        if base_data is None:
+            return None
+        data = pd.concat([base_data, data], ignore_index=True)
+        print(f"以原始資料與新資料合併繼續訓練，共 {len(data)} 筆")
+
+    if is_training_stopped():
+        print("[停止機制] 模型更新在資料載入後被停止")
+        return None
+
+    X = data[feature_cols]
+    y = data[target_col].astype(int)
+
+    # 沿用已擬合的預處理器，避免改動原模型物件
+    old_pipe = model_info['pipeline']
+    if isinstance(old_pipe, CVEnsembleClassifier):
+        print("❌ fold 集成模型無法繼續提升，請改用 train_model 訓練單一模型後再更新")
+        return None
+    if isinstance(old_pipe, SegmentedClassifier):
+        print("❌ 分段模型無法繼續提升，請以 train_model(segment_column=...) 重新訓練")
+        return None
+    old_model = old_pipe.named_steps['model']
+    preprocessor = copy.deepcopy(old_pipe.named_steps['DataPreprocess'])
+
+    new_columns = []
+    if extend_vocabulary:
+        new_columns = preprocessor.extend_vocabulary(X)
+        if new_columns:
+            print(f"新增 {len(new_columns)} 個獨熱編碼欄位: {new_columns}")
+
+    budget = get_thread_budget()
+    with budget.limit():
+        X_transformed = preprocessor.transform(X)
+
+        # 更新前的模型在新資料上的表現，作為比較基準
+        if not new_columns:
+            proba_before = old_model.predict_proba(X_transformed)[:, 1]
+            display_evaluation_metrics(
+                y, (proba_before > 0.5).astype(int), proba_before, "更新前模型（新資料）")
+
+    model = clone(old_model)
+    model.set_params(n_estimators=extra_trees)
+    if learning_rate is not None:
+        model.set_params(learning_rate=learning_rate)
+    if new_columns:
+        # 既有的樹只使用前面的欄位，允許以較寬的特徵矩陣計算初始分數
+        model.set_params(predict_disable_shape_check=True)
+    _, model_threads = apply_thread_budget(model)
+
+    print(f"以既有的 {old_model.booster_.num_trees()} 棵樹為基礎，繼續訓練 {extra_trees} 棵樹...")
+    with budget.limit(model_threads):
+        model.fit(X_transformed, y, init_model=old_model.booster_)
+    if new_columns:
+        model.set_params(predict_disable_shape_check=False)
+    total_trees = model.booster_.num_trees()
+    print(f"模型更新完成! 目前共 {total_trees} 棵樹")
+
+    if is_training_stopped():
+        print("[停止機制] 模型更新在繼續訓練後被停止")
+        return None
+
+    with budget.limit(model_threads):
+        proba = model.predict_proba(X_transformed)[:, 1]
+    metrics = display_evaluation_metrics(
+        y, (proba > 0.5).astype(int), proba, "更新後模型（新資料）")
+
+    pipe = Pipeline([('DataPreprocess', preprocessor), ('model', model)])
+    update_history = list(model_info.get('update_history', []))
+    update_history.append({
+        'timestamp': pd.Timestamp.now().isoformat(),
+        'new_data_path': new_data_path,
+        'base_data_path': base_data_path,
+        'rows': len(data),
+        'extra_trees': extra_trees,
+        'total_trees': total_trees,
+        'new_columns': new_columns
+    })
+    # 依舊模型的驗證預測得到的資訊在繼續提升後不再成立，不帶入更新後的模型
+    stale_info = [key for key in UPDATE_STALE_INFO_KEYS if key in model_info]
+    if stale_info:
+        print(f"⚠️ 模型已改變，移除過時的模型資訊: {', '.join(stale_info)}"
+              "（需要時請以 train_model 重新訓練）")
+    update_history[-1]['dropped_info'] = stale_info
+    updated_info = {key: value for key, value in model_info.items() if key not in stale_info}
+    updated_info.update({'pipeline': pipe, 'update_history': update_history})
+
+    if output_path is None:
+        output_path = model_path
+    with open(output_path, "wb") as f:
+        pickle.dump(updated_info, f)
+    print(f"更新後模型已儲存至: {output_path}")
+
+    return {
+        'model': pipe,
+        'feature_columns': feature_cols,
+        'target_column': target_col,
+        'metrics': metrics,
+        'total_trees': total_trees,
+        'new_columns': new_columns
+    }
+
+
 # 主程式執行區塊
 if __name__ == "__main__":
     print("=== Sephora 產品推薦模型訓練 ===")
@@ -1016,26 +3721,32 @@ if __name__ == "__main__":
         print("\n超參數調優完成!")
 
     elif choice == "3":
-        # 先執行超參數調優
-        tuning_results = hyperparameter_tuning()
+        # 先執行超參數調優，最佳模型為 fold 集成時直接儲存為最終模型
+        tuning_results = hyperparameter_tuning(output_path=DEFAULT_MODEL_OUTPUT_PATH)
 
         if tuning_results:
-            print("\n現在用最佳參數訓練最終模型...")
-
             # 提取最佳參數
             best_params = tuning_results['best_params']
 
-            # 用最佳參數訓練模型
-            results = train_model(
-                n_estimators=best_params.get(
-                    'model__n_estimators', MODEL_N_ESTIMATORS),
-                learning_rate=best_params.get(
-                    'model__learning_rate', MODEL_LEARNING_RATE),
-                num_leaves=best_params.get(
-                    'model__num_leaves', MODEL_NUM_LEAVES),
-                scale_pos_weight=best_params.get(
-                    'model__scale_pos_weight', MODEL_SCALE_POS_WEIGHT)
-            )
+            if tuning_results.get('model_path'):
+                print("\n已使用最佳參數的 fold 集成模型作為最終模型，不需重新訓練")
+            else:
+                print("\n現在用最佳參數訓練最終模型...")
+
+                # 用最佳參數訓練模型
+                results = train_model(
+                    n_estimators=best_params.get(
+                        'model__n_estimators', MODEL_N_ESTIMATORS),
+                    learning_rate=best_params.get(
+                        'model__learning_rate', MODEL_LEARNING_RATE),
+                    num_leaves=best_params.get(
+                        'model__num_leaves', MODEL_NUM_LEAVES),
+                    scale_pos_weight=best_params.get(
+                        'model__scale_pos_weight', MODEL_SCALE_POS_WEIGHT),
+                    categorical_threshold=best_params.get(
+                        'DataPreprocess__categorical_threshold'),
+                    encoding=best_params.get('DataPreprocess__encoding', 'onehot')
+                )
 
             print(f"\n🎯 使用的最佳參數:")
             for param, value in best_params.items():
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+超參數搜尋的 out-of-fold 預測儲存
+每個試驗（參數組合與預算）的驗證 fold 預測機率寫入一個以資料列位置為索引的記憶體映射 .npy 陣列，
+另以 manifest.json 記錄每個陣列對應的參數與分數；門檻調整、機率校準與堆疊分析可直接載入，不需重新訓練
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from ai_utils.trial_store import dataset_fingerprint, params_key
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def trial_key(params, rung=0, n_resources=None):
+    """試驗的穩定鍵：參數組合加上逐次減半的輪次與預算"""
+    params = {name: _to_python(value) for name, value in params.items()}
+    return params_key({'params': params, 'iter': rung, 'n_resources': _to_python(n_resources)})
+
+
+class OOFStore:
+    """記憶體映射的 out-of-fold 預測機率儲存類別"""
+
+    def __init__(self, directory):
+        """
+        Args:
+            directory: 存放 .npy 陣列與 manifest.json 的資料夾
+        """
+        self.directory = directory
+        self.manifest = None
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.directory, MANIFEST_NAME)
+
+    def open(self, X, y):
+        """
+        準備寫入：同一份資料的既有陣列保留（搜尋重新執行時補齊缺少的 fold），資料不同時清除舊陣列
+
+        Args:
+            X, y: 搜尋資料，陣列的列順序與 X 相同
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        dataset = dataset_fingerprint(X, y)
+        manifest = read_manifest(self.directory)
+        if manifest is not None and manifest['dataset'] != dataset:
+            for entry in manifest['trials'].values():
+                path = os.path.join(self.directory, entry['file'])
+                if os.path.exists(path):
+                    os.remove(path)
+            manifest = None
+        if manifest is None:
+            manifest = {'dataset': dataset, 'n_rows': len(X),
+                        'classes': [_to_python(c) for c in np.unique(np.asarray(y))],
+                        'trials': {}}
+        self.manifest = manifest
+        self._write_manifest()
+        return self
+
+    def _file_name(self, key):
+        return f"oof_{hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]}.npy"
+
+    def _array(self, file_name):
+        """開啟（或建立以 NaN 填滿的）陣列，形狀為 (資料列數, 類別數)"""
+        path = os.path.join(self.directory, file_name)
+        if os.path.exists(path):
+            return np.load(path, mmap_mode='r+')
+        array = np.lib.format.open_memmap(
+            path, mode='w+', dtype=np.float32,
+            shape=(self.manifest['n_rows'], len(self.manifest['classes'])))
+        array[:] = np.nan
+        return array
+
+    def write(self, params, test_index, proba, rung=0, n_resources=None):
+        """
+        寫入一個 fold 的驗證列預測機率
+
+        Args:
+            params: 參數組合
+            test_index: 驗證列在搜尋資料中的位置
+            proba: 驗證列的預測機率，欄位順序與 manifest 的 classes 相同
+        """
+        file_name = self._file_name(trial_key(params, rung, n_resources))
+        array = self._array(file_name)
+        array[np.asarray(test_index)] = np.asarray(proba, dtype=np.float32)
+        array.flush()
+        del array
+
+    def finish(self, params, candidate_index, mean_score, rung=0, n_resources=None,
+               pruned=False):
+        """
+        記錄完成的試驗，沒有寫入任何 fold 時不記錄
+
+        Returns:
+            str: 陣列檔名，沒有陣列時為 None
+        """
+        key = trial_key(params, rung, n_resources)
+        file_name = self._file_name(key)
+        path = os.path.join(self.directory, file_name)
+        if not os.path.exists(path):
+            return None
+        array = np.load(path, mmap_mode='r')
+        filled = int(np.sum(~np.isnan(array[:, 0])))
+        del array
+        self.manifest['trials'][key] = {
+            'file': file_name,
+            'params': {name: _to_python(value) for name, value in params.items()},
+            'iter': rung,
+            'n_resources': _to_python(n_resources),
+            'candidate_index': int(candidate_index),
+            'mean_test_score': float(mean_score),
+            'pruned': bool(pruned),
+            'filled_rows': filled,
+        }
+        self._write_manifest()
+        return file_name
+
+    def _write_manifest(self):
+        """先寫入暫存檔再取代，中斷時不會留下不完整的 manifest"""
+        temp_path = self.manifest_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=1)
+        os.replace(temp_path, self.manifest_path)
+
+
+def _to_python(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def read_manifest(directory):
+    """讀取 manifest，不存在時回傳 None"""
+    path = os.path.join(directory, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_oof(directory, params, rung=0, n_resources=None):
+    """
+    以唯讀記憶體映射載入一個試驗的 out-of-fold 預測機率
+
+    Args:
+        directory: OOFStore 的資料夾
+        params: 參數組合（與搜尋結果 cv_results_ 的 'params' 相同）
+        rung, n_resources: 逐次減半的輪次與預算，網格搜尋為 0 與 None
+
+    Returns:
+        np.memmap: (資料列數, 類別數)，沒有預測的列（來自試驗記錄的 fold）為 NaN；找不到時回傳 None
+    """
+    manifest = read_manifest(directory)
+    if manifest is None:
+        return None
+    entry = manifest['trials'].get(trial_key(params, rung, n_resources))
+    if entry is None:
+        return None
+    return np.load(os.path.join(directory, entry['file']), mmap_mode='r')
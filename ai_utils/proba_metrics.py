@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+由預測機率一次計算多個評分指標
+每個驗證 fold 只呼叫一次 predict_proba，再以同一份機率向量化地計算所有指標，
+數值與 sklearn 同名評分器一致（預測類別取機率最大者，與 LGBMClassifier.predict 相同）
+"""
+
+import numpy as np
+from scipy.stats import rankdata
+
+# 只需要預測類別的指標
+LABEL_METRICS = ('accuracy', 'balanced_accuracy', 'f1_macro', 'f1', 'precision', 'recall')
+# 需要正類別機率的指標（僅限二元分類）
+RANKING_METRICS = ('roc_auc', 'average_precision')
+PROBA_METRICS = LABEL_METRICS + RANKING_METRICS + ('neg_log_loss',)
+_BINARY_ONLY = ('f1', 'precision', 'recall') + RANKING_METRICS
+
+
+def validate_metrics(metrics):
+    """
+    檢查指標名稱
+
+    參數:
+        metrics (list): 指標名稱列表
+
+    回傳:
+        tuple: 去除重複後的指標名稱
+
+    例外:
+        ValueError: 包含不支援的指標時
+    """
+    metrics = tuple(dict.fromkeys(metrics))
+    unknown = [name for name in metrics if name not in PROBA_METRICS]
+    if unknown:
+        raise ValueError(f"不支援的評分指標 {unknown}，可用的指標: {PROBA_METRICS}")
+    if not metrics:
+        raise ValueError("至少需要一個評分指標")
+    return metrics
+
+
+def _safe_divide(numerator, denominator):
+    """分母為 0 時回傳 0（與 sklearn zero_division 預設結果相同）"""
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    return np.divide(numerator, denominator, out=np.zeros_like(numerator),
+                     where=denominator != 0)
+
+
+def _roc_auc(y_positive, scores):
+    """以 Mann-Whitney U 統計量計算 ROC AUC（同分取平均名次）"""
+    n_pos = y_positive.sum()
+    n_neg = len(y_positive) - n_pos
+    if n_pos == 0 or n_neg == 0:
+        return np.nan
+    ranks = rankdata(scores)
+    return (ranks[y_positive].sum() - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg)
+
+
+def _average_precision(y_positive, scores):
+    """在每個不同的分數門檻累計精確率，與 sklearn average_precision_score 相同"""
+    order = np.argsort(scores, kind='mergesort')[::-1]
+    sorted_scores = scores[order]
+    hits = y_positive[order]
+    threshold_idx = np.r_[np.flatnonzero(np.diff(sorted_scores)), len(hits) - 1]
+    tps = np.cumsum(hits)[threshold_idx]
+    if tps[-1] == 0:
+        return np.nan
+    precision = tps / (threshold_idx + 1)
+    recall = tps / tps[-1]
+    return float(np.sum(np.diff(np.r_[0.0, recall]) * precision))
+
+
+def score_from_proba(y_true, proba, classes, metrics):
+    """
+    由預測機率計算多個指標
+
+    參數:
+        y_true (array-like): 真實類別
+        proba (ndarray): predict_proba 的輸出，欄位順序與 classes 相同
+        classes (ndarray): 模型的 classes_
+        metrics (tuple): 要計算的指標名稱
+
+    回傳:
+        dict: {指標名稱: 分數}
+    """
+    y_true = np.asarray(y_true)
+    proba = np.asarray(proba, dtype=float)
+    classes = np.asarray(classes)
+    if len(classes) != 2 and any(name in _BINARY_ONLY for name in metrics):
+        raise ValueError(f"{_BINARY_ONLY} 僅支援二元分類")
+
+    y_pred = classes[np.argmax(proba, axis=1)]
+    # 與 sklearn 相同：標籤為真實與預測類別的聯集
+    labels = np.union1d(y_true, y_pred)
+    true_idx = np.searchsorted(labels, y_true)
+    pred_idx = np.searchsorted(labels, y_pred)
+    n_labels = len(labels)
+    confusion = np.bincount(true_idx * n_labels + pred_idx,
+                            minlength=n_labels * n_labels).reshape(n_labels, n_labels)
+    tp = np.diag(confusion)
+    support = confusion.sum(axis=1)
+    predicted = confusion.sum(axis=0)
+
+    results = {}
+    for name in metrics:
+        if name == 'accuracy':
+            results[name] = tp.sum() / len(y_true)
+        elif name == 'balanced_accuracy':
+            results[name] = np.mean(tp[support > 0] / support[support > 0])
+        elif name == 'f1_macro':
+            results[name] = np.mean(_safe_divide(2 * tp, support + predicted))
+        elif name in ('f1', 'precision', 'recall'):
+            positive = classes[1]
+            pos_tp = np.sum((y_true == positive) & (y_pred == positive))
+            n_true = np.sum(y_true == positive)
+            n_pred = np.sum(y_pred == positive)
+            if name == 'precision':
+                results[name] = float(_safe_divide(pos_tp, n_pred))
+            elif name == 'recall':
+                results[name] = float(_safe_divide(pos_tp, n_true))
+            else:
+                results[name] = float(_safe_divide(2 * pos_tp, n_true + n_pred))
+        elif name == 'roc_auc':
+            results[name] = _roc_auc(y_true == classes[1], proba[:, 1])
+        elif name == 'average_precision':
+            results[name] = _average_precision(y_true == classes[1], proba[:, 1])
+        elif name == 'neg_log_loss':
+            eps = np.finfo(proba.dtype).eps
+            clipped = np.clip(proba, eps, 1 - eps)
+            class_idx = np.searchsorted(classes, y_true)
+            results[name] = -np.mean(-np.log(clipped[np.arange(len(y_true)), class_idx]))
+    return {name: float(score) for name, score in results.items()}
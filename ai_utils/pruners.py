@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+超參數搜尋剪枝器
+在參數組合只完成部分 fold 時判斷它是否還有機會超越目前最佳結果，
+沒有機會的組合提前放棄，省下其餘 fold 的訓練時間
+"""
+
+import numpy as np
+
+PRUNER_NAMES = ('median', 'bound')
+
+
+class BasePruner:
+    """剪枝器基礎類別"""
+
+    def __init__(self, n_warmup_folds=1, n_startup_candidates=1):
+        """
+        Args:
+            n_warmup_folds: 組合至少完成幾個 fold 後才考慮剪枝
+            n_startup_candidates: 至少有幾個完整評估的組合後才開始剪枝
+        """
+        self.n_warmup_folds = n_warmup_folds
+        self.n_startup_candidates = n_startup_candidates
+
+    def should_prune(self, partial_scores, n_folds, completed_scores):
+        """
+        判斷是否放棄此參數組合
+
+        Args:
+            partial_scores: 此組合已完成 fold 的分數（依 fold 順序）
+            n_folds: 總 fold 數
+            completed_scores: 已完整評估（未被剪枝）組合的各 fold 分數列表
+
+        Returns:
+            bool: True 表示放棄此組合
+        """
+        n_done = len(partial_scores)
+        if n_done < self.n_warmup_folds or n_done >= n_folds:
+            return False
+        if len(completed_scores) < self.n_startup_candidates:
+            return False
+        return self._should_prune(np.asarray(partial_scores, dtype=float), n_folds,
+                                  [np.asarray(scores, dtype=float)
+                                   for scores in completed_scores])
+
+    def _should_prune(self, partial_scores, n_folds, completed_scores):
+        raise NotImplementedError
+
+    def __repr__(self):
+        return (f"{type(self).__name__}(n_warmup_folds={self.n_warmup_folds}, "
+                f"n_startup_candidates={self.n_startup_candidates})")
+
+
+class MedianPruner(BasePruner):
+    """中位數剪枝：前 k 個 fold 的平均低於已完成組合前 k 個 fold 平均的中位數時放棄"""
+
+    def __init__(self, n_warmup_folds=1, n_startup_candidates=3):
+        super().__init__(n_warmup_folds, n_startup_candidates)
+
+    def _should_prune(self, partial_scores, n_folds, completed_scores):
+        n_done = len(partial_scores)
+        reference = np.median([scores[:n_done].mean() for scores in completed_scores])
+        return partial_scores.mean() < reference
+
+
+class BoundPruner(BasePruner):
+    """
+    上界剪枝：假設其餘 fold 都拿到目前觀察到的最高 fold 分數，
+    平均仍低於最佳組合的平均分數時放棄（不會誤刪真正可能勝出的組合）
+    """
+
+    def __init__(self, n_warmup_folds=1, n_startup_candidates=1, max_fold_score=None):
+        """
+        Args:
+            max_fold_score: 其餘 fold 的樂觀分數上限，None 表示使用目前觀察到的最高 fold 分數
+        """
+        super().__init__(n_warmup_folds, n_startup_candidates)
+        self.max_fold_score = max_fold_score
+
+    def _should_prune(self, partial_scores, n_folds, completed_scores):
+        upper = self.max_fold_score
+        if upper is None:
+            upper = max(partial_scores.max(), max(scores.max() for scores in completed_scores))
+        n_remaining = n_folds - len(partial_scores)
+        optimistic = (partial_scores.sum() + n_remaining * upper) / n_folds
+        best = max(scores.mean() for scores in completed_scores)
+        return optimistic < best
+
+
+def get_pruner(pruner):
+    """
+    取得剪枝器
+
+    參數:
+        pruner (str or BasePruner or None): 'median'、'bound'、剪枝器物件或 None（不剪枝）
+
+    回傳:
+        BasePruner or None
+    """
+    if pruner is None or isinstance(pruner, BasePruner):
+        return pruner
+    if pruner == 'median':
+        return MedianPruner()
+    if pruner == 'bound':
+        return BoundPruner()
+    raise ValueError(f"剪枝器必須為 {PRUNER_NAMES} 之一或 None，但得到: {pruner}")
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+依分段欄位（如 secondary_category）訓練的分段模型
+所有分段共用一個以全部訓練資料擬合的 DataPreprocess，每個資料量足夠的分段在平行工作者中各自訓練
+一個較小的 LightGBM 模型，另訓練一個全域模型處理資料量不足或訓練時沒看過的分段；
+預測時只轉換一次特徵，再依分段把列分組，每組一次交給對應的模型
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, ClassifierMixin, clone
+from sklearn.pipeline import Pipeline
+
+from ai_utils.thread_budget import ThreadBudget
+
+
+def _as_matrix(X_transformed):
+    """前處理輸出轉為 float32 矩陣，分組時以列位置取子集"""
+    if isinstance(X_transformed, pd.DataFrame):
+        return X_transformed.to_numpy(dtype=np.float32)
+    return np.asarray(X_transformed)
+
+
+class SegmentedClassifier(ClassifierMixin, BaseEstimator):
+    """
+    分段模型：前處理共用，依分段欄位路由到各分段的模型
+
+    訓練後的物件即為路由組合，可直接存檔並以 predict / predict_proba 預測
+    """
+
+    def __init__(self, preprocess, model, segment_column, min_segment_rows=200, n_workers=1):
+        """
+        Args:
+            preprocess: 尚未擬合的 DataPreprocess
+            model: 尚未訓練的 LGBMClassifier，作為每個分段模型與全域模型的設定；
+                其 n_jobs 為整體執行緒預算，由平行工作者平分
+            segment_column: 分段欄位名稱，必須是特徵欄位之一
+            min_segment_rows: 分段至少需要的訓練列數，不足或只有一個類別的分段由全域模型預測
+            n_workers: 同時訓練的模型數
+        """
+        self.preprocess = preprocess
+        self.model = model
+        self.segment_column = segment_column
+        self.min_segment_rows = min_segment_rows
+        self.n_workers = n_workers
+
+    def template_pipeline(self):
+        """與分段模型設定相同的單一管線（尚未訓練），供成本估計使用"""
+        return Pipeline([('DataPreprocess', clone(self.preprocess)), ('model', clone(self.model))])
+
+    def _segments(self, X):
+        if self.segment_column not in X:
+            raise ValueError(f"資料缺少分段欄位 '{self.segment_column}'")
+        return pd.Series(X[self.segment_column]).to_numpy()
+
+    def fit(self, X, y):
+        """
+        擬合共用的前處理，再平行訓練全域模型與每個分段模型
+
+        Returns:
+            SegmentedClassifier: 自身
+        """
+        segments = self._segments(X)
+        y = np.asarray(y)
+        self.classes_ = np.unique(y)
+        self.preprocess_ = clone(self.preprocess).fit(X, y)
+        X_transformed = _as_matrix(self.preprocess_.transform(X))
+
+        # None 為全域模型；依列數由大到小排程，讓最久的訓練最先開始
+        tasks = {None: np.arange(len(y))}
+        codes, uniques = pd.factorize(segments)  # 缺值的代碼為 -1，由全域模型預測
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        for code in np.argsort(-counts, kind='stable'):
+            if counts[code] < self.min_segment_rows:
+                break
+            rows = np.flatnonzero(codes == code)
+            if len(np.unique(y[rows])) == len(self.classes_):
+                tasks[uniques[code]] = rows
+
+        budget = ThreadBudget(self.model.get_params().get('n_jobs'))
+        n_workers, n_threads = budget.split(min(self.n_workers, len(tasks)))
+
+        def fit_one(rows):
+            model = clone(self.model).set_params(n_jobs=n_threads)
+            return model.fit(X_transformed[rows], y[rows])
+
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            futures = {segment: executor.submit(fit_one, rows) for segment, rows in tasks.items()}
+            models = {segment: future.result() for segment, future in futures.items()}
+
+        self.fallback_model_ = models.pop(None)
+        self.segment_models_ = models
+        self.segment_rows_ = {segment: int(len(tasks[segment])) for segment in models}
+        return self
+
+    def __sklearn_is_fitted__(self):
+        return hasattr(self, 'fallback_model_')
+
+    def route(self, X):
+        """
+        每列使用的分段模型
+
+        Returns:
+            ndarray: 分段模型在 segment_models_ 中的位置，-1 表示全域模型
+        """
+        return pd.Index(list(self.segment_models_)).get_indexer(self._segments(X))
+
+    def predict_proba(self, X):
+        routes = self.route(X)
+        X_transformed = _as_matrix(self.preprocess_.transform(X))
+        models = list(self.segment_models_.values())
+        proba = np.empty((len(routes), len(self.classes_)))
+        for route in np.unique(routes):
+            rows = np.flatnonzero(routes == route)
+            model = self.fallback_model_ if route < 0 else models[route]
+            proba[rows] = model.predict_proba(X_transformed[rows])
+        return proba
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
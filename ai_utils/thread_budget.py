@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CPU 執行緒預算管理器
+將設定的核心預算分配給外層工作者（平行交叉驗證、排列重要性等）
+與內層 LightGBM / BLAS 執行緒，避免 CPU 過度訂閱
+"""
+
+import os
+from contextlib import contextmanager
+
+from threadpoolctl import threadpool_limits
+
+
+def resolve_n_jobs(n_jobs):
+    """
+    將 n_jobs 設定轉換為實際可用的核心數
+
+    參數:
+        n_jobs (int): -1 表示全部核心，-2 表示保留一個核心，以此類推；
+                      正數表示指定核心數（不會超過實際核心數）
+
+    回傳:
+        int: 實際核心數，至少為 1
+    """
+    cpu_count = os.cpu_count() or 1
+    if n_jobs is None:
+        return cpu_count
+    n_jobs = int(n_jobs)
+    if n_jobs < 0:
+        return max(1, cpu_count + 1 + n_jobs)
+    return max(1, min(n_jobs, cpu_count))
+
+
+class ThreadBudget:
+    """CPU 執行緒預算類別"""
+
+    def __init__(self, n_jobs=-1):
+        """
+        初始化執行緒預算
+
+        Args:
+            n_jobs: 核心預算設定，語意與 MODEL_N_JOBS 相同
+        """
+        self.n_jobs = n_jobs
+        self.total_threads = resolve_n_jobs(n_jobs)
+
+    def split(self, n_outer=1):
+        """
+        將核心預算分配給外層工作者與內層執行緒
+
+        Args:
+            n_outer: 希望的外層平行工作者數量
+
+        Returns:
+            tuple: (外層工作者數, 每個工作者的內層執行緒數)
+        """
+        outer = max(1, min(int(n_outer), self.total_threads))
+        inner = max(1, self.total_threads // outer)
+        return outer, inner
+
+    @contextmanager
+    def limit(self, n_threads=None):
+        """
+        限制 BLAS / OpenMP 原生執行緒池的執行緒數
+
+        Args:
+            n_threads: 執行緒上限，None 表示使用全部預算
+        """
+        if n_threads is None:
+            n_threads = self.total_threads
+        with threadpool_limits(limits=n_threads):
+            yield n_threads
+
+    @staticmethod
+    def apply_to_estimator(estimator, n_threads):
+        """
+        設定估計器（或 Pipeline 內所有步驟）的 n_jobs 參數
+
+        Args:
+            estimator: sklearn 相容的估計器
+            n_threads: 要設定的執行緒數
+
+        Returns:
+            估計器本身
+        """
+        if not hasattr(estimator, 'get_params'):
+            return estimator
+        n_jobs_params = {key: n_threads for key in estimator.get_params(deep=True)
+                         if key == 'n_jobs' or key.endswith('__n_jobs')}
+        if n_jobs_params:
+            estimator.set_params(**n_jobs_params)
+        return estimator
+
+    def __repr__(self):
+        return f"ThreadBudget(n_jobs={self.n_jobs}, total_threads={self.total_threads})"
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TPE（Tree-structured Parzen Estimator）參數取樣器
+依已完成試驗的分數將觀測值分為「好」與「差」兩組，各自以 Parzen 視窗估計密度，
+選擇 l(x) / g(x) 最大的候選參數，讓搜尋集中在表現好的區域
+"""
+
+import numpy as np
+from scipy.special import logsumexp, ndtr
+
+# 支援的參數範圍類型
+PARAM_TYPES = ('float', 'log_float', 'int')
+
+
+def validate_param_space(param_space):
+    """
+    檢查參數範圍設定
+
+    參數:
+        param_space (dict): {參數名稱: (類型, 下限, 上限)}，類型為 'float'、'log_float' 或 'int'
+
+    回傳:
+        dict: 同樣的參數範圍設定
+    """
+    if not param_space:
+        raise ValueError("參數範圍不可為空")
+    for name, spec in param_space.items():
+        if len(spec) != 3:
+            raise ValueError(f"參數 {name} 的範圍必須為 (類型, 下限, 上限)，但得到: {spec}")
+        kind, low, high = spec
+        if kind not in PARAM_TYPES:
+            raise ValueError(f"參數 {name} 的類型必須為 {PARAM_TYPES} 之一，但得到: {kind}")
+        if low >= high:
+            raise ValueError(f"參數 {name} 的下限必須小於上限，但得到: {low} >= {high}")
+        if kind == 'log_float' and low <= 0:
+            raise ValueError(f"參數 {name} 使用對數範圍時下限必須大於 0，但得到: {low}")
+    return param_space
+
+
+class TPESampler:
+    """TPE 參數取樣器類別"""
+
+    def __init__(self, param_space, n_startup_trials=10, gamma=0.25,
+                 n_ei_candidates=24, random_state=None):
+        """
+        初始化取樣器
+
+        Args:
+            param_space: {參數名稱: (類型, 下限, 上限)}
+            n_startup_trials: 開始建模前的隨機試驗數
+            gamma: 視為「好」的試驗比例
+            n_ei_candidates: 每次建議時從好組密度抽出的候選數
+            random_state: 隨機種子
+        """
+        self.param_space = validate_param_space(param_space)
+        self.n_startup_trials = n_startup_trials
+        self.gamma = gamma
+        self.n_ei_candidates = n_ei_candidates
+        self.rng = np.random.RandomState(random_state)
+        self.history = []
+
+    def observe(self, params, score):
+        """記錄一次已完成試驗的參數與分數（分數越高越好）"""
+        self.history.append((params, score))
+
+    def suggest(self):
+        """
+        建議下一組參數
+
+        Returns:
+            dict: 參數名稱 -> 參數值
+        """
+        if len(self.history) < self.n_startup_trials:
+            internal = {name: self.rng.uniform(*self._bounds(name))
+                        for name in self.param_space}
+            return self._to_params(internal)
+
+        ranked = sorted(self.history, key=lambda item: -item[1])
+        n_good = max(1, int(np.ceil(self.gamma * len(ranked))))
+        good, bad = ranked[:n_good], ranked[n_good:]
+
+        # 各參數獨立建模，候選的分數為各參數 log l(x) - log g(x) 的總和
+        candidates = {}
+        acquisition = np.zeros(self.n_ei_candidates)
+        for name in self.param_space:
+            low, high = self._bounds(name)
+            good_values = np.array([self._to_internal(name, p[name]) for p, _ in good])
+            bad_values = np.array([self._to_internal(name, p[name]) for p, _ in bad])
+            good_mus, good_sigmas = self._parzen(good_values, low, high)
+            bad_mus, bad_sigmas = self._parzen(bad_values, low, high)
+
+            samples = self._sample(good_mus, good_sigmas, low, high, self.n_ei_candidates)
+            acquisition += (self._log_density(samples, good_mus, good_sigmas, low, high) -
+                            self._log_density(samples, bad_mus, bad_sigmas, low, high))
+            candidates[name] = samples
+
+        best = int(np.argmax(acquisition))
+        return self._to_params({name: values[best] for name, values in candidates.items()})
+
+    def _bounds(self, name):
+        """參數在內部空間的上下限（對數範圍取 log，整數範圍向外擴 0.5 以便四捨五入）"""
+        kind, low, high = self.param_space[name]
+        if kind == 'log_float':
+            return np.log(low), np.log(high)
+        if kind == 'int':
+            return low - 0.5, high + 0.5
+        return float(low), float(high)
+
+    def _to_internal(self, name, value):
+        """將參數值轉換到內部空間"""
+        return np.log(value) if self.param_space[name][0] == 'log_float' else float(value)
+
+    def _to_params(self, internal):
+        """將內部空間的值轉回參數值"""
+        params = {}
+        for name, value in internal.items():
+            kind, low, high = self.param_space[name]
+            if kind == 'log_float':
+                params[name] = float(np.clip(np.exp(value), low, high))
+            elif kind == 'int':
+                params[name] = int(np.clip(np.round(value), low, high))
+            else:
+                params[name] = float(np.clip(value, low, high))
+        return params
+
+    @staticmethod
+    def _parzen(values, low, high):
+        """
+        建立 Parzen 視窗：每個觀測值一個常態分佈，再加上一個涵蓋整個範圍的先驗分佈
+
+        頻寬取相鄰觀測值的最大距離，並限制在合理範圍內
+        """
+        width = high - low
+        prior_mu = (low + high) / 2
+        if len(values) == 0:
+            return np.array([prior_mu]), np.array([width])
+
+        mus = np.append(values, prior_mu)
+        order = np.argsort(mus)
+        sorted_mus = mus[order]
+        padded = np.concatenate([[low], sorted_mus, [high]])
+        sigmas_sorted = np.maximum(padded[1:-1] - padded[:-2], padded[2:] - padded[1:-1])
+        sigmas = np.empty_like(mus)
+        sigmas[order] = sigmas_sorted
+        sigmas = np.clip(sigmas, width / min(100.0, 1.0 + len(mus)), width)
+        sigmas[-1] = width  # 先驗分佈
+        return mus, sigmas
+
+    def _sample(self, mus, sigmas, low, high, n_samples):
+        """從截斷常態混合分佈抽樣"""
+        components = self.rng.randint(len(mus), size=n_samples)
+        samples = self.rng.normal(mus[components], sigmas[components])
+        # 超出範圍的樣本重新抽樣，少數仍超出時截斷到邊界
+        for _ in range(10):
+            outside = (samples < low) | (samples > high)
+            if not outside.any():
+                break
+            samples[outside] = self.rng.normal(mus[components[outside]],
+                                               sigmas[components[outside]])
+        return np.clip(samples, low, high)
+
+    @staticmethod
+    def _log_density(x, mus, sigmas, low, high):
+        """截斷常態混合分佈（等權重）的對數密度"""
+        z = (x[:, None] - mus[None, :]) / sigmas[None, :]
+        normalizer = ndtr((high - mus) / sigmas) - ndtr((low - mus) / sigmas)
+        log_pdf = (-0.5 * z ** 2 - np.log(sigmas * np.sqrt(2 * np.pi)) -
+                   np.log(np.maximum(normalizer, 1e-12)))
+        return logsumexp(log_pdf, axis=1) - np.log(len(mus))
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+訓練後的樹數壓縮
+在驗證資料上掃描提升樹的前綴（只使用前 n 棵樹），找出評分指標與完整模型相差不超過 epsilon 的最少樹數，
+再將模型截斷為該樹數；預測成本與移除的樹數成比例下降
+"""
+
+import numpy as np
+
+from ai_utils.proba_metrics import score_from_proba, validate_metrics
+
+DEFAULT_METRICS = ('f1_macro', 'roc_auc')
+MAX_SWEEP_POINTS = 200  # 樹數很多時平均取樣的前綴數上限，完整樹數一定包含在內
+
+
+def _proba_from_raw(model, raw):
+    """將累加的原始分數轉為類別機率，不支援的目標函數回傳 None"""
+    objective = model.objective_ if isinstance(model.objective_, str) else None
+    if objective == 'binary':
+        sigmoid = model.get_params().get('sigmoid', 1.0)
+        positive = 1.0 / (1.0 + np.exp(-sigmoid * raw))
+        return np.vstack((1.0 - positive, positive)).transpose()
+    if objective in ('multiclass', 'softmax'):
+        exp = np.exp(raw - raw.max(axis=1, keepdims=True))
+        return exp / exp.sum(axis=1, keepdims=True)
+    return None
+
+
+def sweep_tree_counts(n_trees, max_points=MAX_SWEEP_POINTS):
+    """要評估的前綴樹數：1 到 n_trees 之間最多 max_points 個遞增的整數"""
+    return np.unique(np.linspace(1, n_trees, min(n_trees, max_points)).round().astype(int))
+
+
+def staged_metrics(model, X, y, tree_counts, metrics=DEFAULT_METRICS):
+    """
+    計算模型前 n 棵樹在每個樹數下的評分指標
+
+    原始分數依樹數區段累加，每棵樹只預測一次；目標函數不是 binary / multiclass 時改為每個樹數各自預測
+
+    Args:
+        model: 已訓練的 LGBMClassifier
+        X: 已前處理的特徵矩陣
+        y: 目標變數
+        tree_counts: 遞增的樹數
+        metrics: proba_metrics 支援的指標
+
+    Returns:
+        dict: {樹數: {指標: 分數}}
+    """
+    metrics = validate_metrics(metrics)
+    y = np.asarray(y)
+    booster = model.booster_
+    results = {}
+    raw, start = 0.0, 0
+    for n in tree_counts:
+        raw = raw + booster.predict(X, raw_score=True, start_iteration=start,
+                                    num_iteration=n - start)
+        start = n
+        proba = _proba_from_raw(model, raw)
+        if proba is None:
+            proba = model.predict_proba(X, num_iteration=n)
+        results[int(n)] = score_from_proba(y, proba, model.classes_, metrics)
+    return results
+
+
+def select_tree_count(curve, epsilon):
+    """
+    找出所有指標與完整模型相差不超過 epsilon 的最少樹數
+
+    Args:
+        curve: staged_metrics 的結果，最大的樹數視為完整模型
+        epsilon: 每個指標允許的下降量
+
+    Returns:
+        int: 選擇的樹數
+    """
+    full = curve[max(curve)]
+    for n in sorted(curve):
+        if all(curve[n][name] >= full[name] - epsilon for name in full):
+            return n
+    return max(curve)
+
+
+def truncate_model(model, n_trees):
+    """
+    將已訓練的 LGBMClassifier 截斷為前 n_trees 棵樹（就地修改）
+
+    以 Booster.model_from_string 就地重新載入前 n_trees 棵樹，截斷後的模型可照常預測、存檔，
+    並可作為 update_model 繼續訓練的起點
+
+    Returns:
+        LGBMClassifier: 同一個模型
+    """
+    booster = model.booster_
+    if n_trees < booster.current_iteration():
+        booster.model_from_string(booster.model_to_string(num_iteration=n_trees))
+        model.set_params(n_estimators=n_trees)
+    return model
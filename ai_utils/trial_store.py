@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+超參數搜尋試驗結果儲存
+將每個完成的 (參數組合, fold) 結果寫入內嵌的 SQLite 資料庫，
+以資料集指紋、交叉驗證切分、評分指標與參數組合為鍵，搜尋中斷或重新執行時可跳過已評估的部分
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trials (
+    dataset TEXT NOT NULL,
+    split TEXT NOT NULL,
+    scoring TEXT NOT NULL,
+    params TEXT NOT NULL,
+    fold INTEGER NOT NULL,
+    score REAL NOT NULL,
+    fit_seconds REAL NOT NULL,
+    metrics TEXT,
+    latency REAL,
+    model_bytes INTEGER,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (dataset, split, scoring, params, fold)
+)
+"""
+
+
+def _hash_data(data, digest):
+    """將 DataFrame / Series / 陣列的內容加入雜湊"""
+    if isinstance(data, (pd.DataFrame, pd.Series)):
+        if isinstance(data, pd.DataFrame):
+            digest.update(repr(list(data.columns)).encode())
+            digest.update(repr([str(dtype) for dtype in data.dtypes]).encode())
+        digest.update(pd.util.hash_pandas_object(data, index=False).values.tobytes())
+    else:
+        array = np.ascontiguousarray(data)
+        digest.update(repr((array.shape, str(array.dtype))).encode())
+        if array.dtype == object:
+            # 物件陣列的位元組是指標，需依內容雜湊
+            frame = pd.DataFrame(array.reshape(len(array), -1))
+            digest.update(pd.util.hash_pandas_object(frame, index=False).values.tobytes())
+        else:
+            digest.update(array.tobytes())
+
+
+def dataset_fingerprint(X, y):
+    """
+    計算資料集指紋
+
+    參數:
+        X (DataFrame or array-like): 特徵資料
+        y (Series or array-like): 目標變數
+
+    回傳:
+        str: 資料內容的 SHA-256 雜湊
+    """
+    digest = hashlib.sha256()
+    _hash_data(X, digest)
+    _hash_data(y, digest)
+    return digest.hexdigest()
+
+
+def split_fingerprint(splits):
+    """
+    計算交叉驗證切分的指紋
+
+    參數:
+        splits (list): [(訓練列索引, 驗證列索引), ...]
+
+    回傳:
+        str: 各 fold 列索引的 SHA-256 雜湊
+    """
+    digest = hashlib.sha256()
+    for train_index, test_index in splits:
+        digest.update(np.asarray(train_index, dtype=np.int64).tobytes())
+        digest.update(b'|')
+        digest.update(np.asarray(test_index, dtype=np.int64).tobytes())
+        digest.update(b'#')
+    return digest.hexdigest()
+
+
+def params_key(params):
+    """將參數組合轉換為穩定的字串鍵"""
+    return json.dumps(params, sort_keys=True, default=str)
+
+
+class TrialStore:
+    """SQLite 試驗結果儲存類別"""
+
+    def __init__(self, path):
+        """
+        開啟（或建立）試驗結果資料庫
+
+        Args:
+            path: SQLite 檔案路徑，':memory:' 表示只存在記憶體中
+        """
+        self.path = path
+        if path != ':memory:':
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(_SCHEMA)
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(trials)")]
+        # 舊版資料庫沒有多指標、預測延遲與模型大小欄位
+        for name, column_type in (('metrics', 'TEXT'), ('latency', 'REAL'),
+                                  ('model_bytes', 'INTEGER')):
+            if name not in columns:
+                self.connection.execute(f"ALTER TABLE trials ADD COLUMN {name} {column_type}")
+        self.connection.commit()
+
+    def load(self, dataset, split, scoring, params):
+        """
+        讀取指定參數組合已完成的 fold 結果
+
+        Returns:
+            dict: fold 編號 -> {'score': 分數, 'fit_seconds': 訓練秒數}，
+                  有多指標結果時另有 'metrics': {指標: 分數}，
+                  有量測時另有 'latency': 每列預測秒數與 'model_bytes': 模型大小
+        """
+        rows = self.connection.execute(
+            "SELECT fold, score, fit_seconds, metrics, latency, model_bytes FROM trials "
+            "WHERE dataset = ? AND split = ? AND scoring = ? AND params = ?",
+            (dataset, split, scoring, params_key(params))).fetchall()
+        results = {}
+        for fold, score, fit_seconds, metrics, latency, model_bytes in rows:
+            results[fold] = {'score': score, 'fit_seconds': fit_seconds}
+            if metrics is not None:
+                results[fold]['metrics'] = json.loads(metrics)
+            if latency is not None:
+                results[fold]['latency'] = latency
+            if model_bytes is not None:
+                results[fold]['model_bytes'] = model_bytes
+        return results
+
+    def save(self, dataset, split, scoring, params, fold, result):
+        """寫入一個 fold 的結果並立即提交，程式中斷時已完成的結果不會遺失"""
+        self.connection.execute(
+            "INSERT OR REPLACE INTO trials "
+            "(dataset, split, scoring, params, fold, score, fit_seconds, metrics, latency, "
+            "model_bytes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (dataset, split, scoring, params_key(params), int(fold),
+             float(result['score']), float(result['fit_seconds']),
+             json.dumps(result['metrics']) if result.get('metrics') is not None else None,
+             float(result['latency']) if result.get('latency') is not None else None,
+             int(result['model_bytes']) if result.get('model_bytes') is not None else None))
+        self.connection.commit()
+
+    def count(self, dataset=None):
+        """已儲存的 fold 結果數量，可依資料集指紋篩選"""
+        if dataset is None:
+            return self.connection.execute("SELECT COUNT(*) FROM trials").fetchone()[0]
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM trials WHERE dataset = ?", (dataset,)).fetchone()[0]
+
+    def close(self):
+        """關閉資料庫連線"""
+        self.connection.close()
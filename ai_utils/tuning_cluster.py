@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分散式超參數搜尋：協調者 / 工作者
+協調者以簡單的 HTTP + JSON 協定提供 (參數組合, fold) 任務，
+其他機器（或測試中的本機行程）上的工作者從共享資料路徑載入資料、取得任務、評估後回報分數。
+工作者執行任務期間定期送出心跳，逾時的任務會重新分派；停止時透過心跳回應廣播給所有工作者。
+
+協定僅供受信任的內部網路使用，傳輸內容為 JSON，不傳送任何 pickle 物件。
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing as mp
+import os
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from ai_utils.thread_budget import ThreadBudget
+from ai_utils.trial_store import dataset_fingerprint
+
+DEFAULT_HEARTBEAT_TIMEOUT = 30.0
+DEFAULT_HEARTBEAT_INTERVAL = 5.0
+
+
+def _to_json(value):
+    """將 numpy 型別轉換為 JSON 可序列化的 Python 型別"""
+    if isinstance(value, dict):
+        return {str(k): _to_json(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray, pd.Index)):
+        return [_to_json(v) for v in value]
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    if isinstance(value, np.bool_):
+        return bool(value)
+    return value
+
+
+def estimator_spec(estimator):
+    """取出管線各步驟的基本型別參數，工作者據此重建相同的估計器（不含執行緒數）"""
+    return {key: _to_json(value) for key, value in estimator.get_params(deep=True).items()
+            if '__' in key and not key.endswith('n_jobs')
+            and isinstance(value, (str, int, float, bool, type(None), np.generic))}
+
+
+class TuningCoordinator:
+    """
+    分散式搜尋協調者類別
+
+    提供與 concurrent.futures.Executor 相同的 submit / shutdown 介面，
+    StoppableGridSearchCV 可以像使用本機行程池一樣使用它
+    """
+
+    def __init__(self, data_path, host='127.0.0.1', port=0,
+                 heartbeat_timeout=DEFAULT_HEARTBEAT_TIMEOUT):
+        """
+        Args:
+            data_path: 工作者讀取的共享資料路徑（CSV）
+            host: 監聽位址，跨機器使用時設為 '0.0.0.0'
+            port: 監聽連接埠，0 表示自動選擇
+            heartbeat_timeout: 超過此秒數沒有心跳的任務會重新分派
+        """
+        self.data_path = data_path
+        self.heartbeat_timeout = heartbeat_timeout
+        self._lock = threading.Lock()
+        self._task_ids = itertools.count()
+        self._job_ids = itertools.count(1)
+        self._job = None
+        self._tasks = {}
+        self._pending = deque()
+        self.stop_event = threading.Event()
+        self.reassigned_tasks = 0
+        self.workers = {}
+
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def address(self):
+        """協調者的 HTTP 位址"""
+        host, port = self._server.server_address[:2]
+        if host in ('0.0.0.0', ''):
+            host = socket.gethostname()
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """在背景執行緒啟動 HTTP 服務"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self):
+        """結束目前的工作並關閉 HTTP 服務，工作者連線失敗後會自行結束"""
+        self.shutdown(cancel_futures=True)
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # ---- 搜尋端介面 ----
+
+    def start_job(self, X, y, estimator, scoring=None):
+        """
+        開始一個新的搜尋工作
+
+        Args:
+            X: 搜尋資料（DataFrame，索引為共享資料檔中的列標籤）
+            y: 目標變數
+            estimator: 基礎估計器
+            scoring: 評分指標（任務中也會帶入）
+
+        Returns:
+            TuningCoordinator: 自己，供 submit / shutdown 使用
+        """
+        if not isinstance(X, pd.DataFrame):
+            raise ValueError("分散式搜尋需要 DataFrame 資料，工作者依列標籤從共享資料檔重建")
+        with self._lock:
+            self.stop_event = threading.Event()
+            self._job = {
+                'job_id': next(self._job_ids),
+                'data_path': self.data_path,
+                'feature_columns': list(X.columns),
+                'target_column': y.name,
+                'row_labels': _to_json(X.index),
+                'fingerprint': dataset_fingerprint(X, y),
+                'estimator_params': estimator_spec(estimator),
+                'scoring': scoring,
+            }
+        self.start()
+        return self
+
+    def submit(self, fn, *args):
+        """
+        加入一個 (參數組合, fold) 任務
+
+        Args:
+            fn: 必須為 model_traning._run_search_task，工作者端執行相同的評估
+            args: (參數, 訓練列索引, 驗證列索引, 評分指標, 樹數列表, 多指標列表)
+        """
+        if getattr(fn, '__name__', None) != '_run_search_task':
+            raise ValueError(f"協調者只能分派搜尋任務，但得到: {fn}")
+        params, train_index, test_index, scoring = args[:4]
+        n_iterations = args[4] if len(args) > 4 else None
+        metrics = args[5] if len(args) > 5 else None
+        return_proba = args[7] if len(args) > 7 else False
+        future = Future()
+        with self._lock:
+            if self._job is None:
+                raise RuntimeError("尚未開始搜尋工作")
+            task_id = next(self._task_ids)
+            self._tasks[task_id] = {
+                'future': future,
+                'started': False,
+                'worker': None,
+                'last_seen': None,
+                'payload': {
+                    'task_id': task_id,
+                    'job_id': self._job['job_id'],
+                    'params': _to_json(params),
+                    'train_index': _to_json(train_index),
+                    'test_index': _to_json(test_index),
+                    'scoring': scoring,
+                    'n_iterations': _to_json(n_iterations),
+                    'metrics': _to_json(metrics),
+                    'return_proba': bool(return_proba),
+                },
+            }
+            self._pending.append(task_id)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        """結束目前的工作：廣播停止並取消尚未完成的任務"""
+        with self._lock:
+            self.stop_event.set()
+            for task in self._tasks.values():
+                task['future'].cancel()
+            self._tasks.clear()
+            self._pending.clear()
+            self._job = None
+
+    # ---- 工作者端協定 ----
+
+    def _requeue_stale_tasks(self, now):
+        """將心跳逾時的任務放回佇列（需持有鎖）"""
+        for task_id, task in self._tasks.items():
+            if task['worker'] is not None and now - task['last_seen'] > self.heartbeat_timeout:
+                print(f"💔 工作者 {task['worker']} 心跳逾時，重新分派任務 {task_id}")
+                task['worker'] = None
+                self.reassigned_tasks += 1
+                self._pending.appendleft(task_id)
+
+    def _handle_task_request(self, worker):
+        """分派下一個任務給工作者"""
+        now = time.time()
+        with self._lock:
+            self.workers[worker] = now
+            if self._job is None:
+                return {'status': 'wait'}
+            if self.stop_event.is_set():
+                return {'status': 'stop'}
+            self._requeue_stale_tasks(now)
+            while self._pending:
+                task_id = self._pending.popleft()
+                task = self._tasks.get(task_id)
+                if task is None or task['worker'] is not None:
+                    continue
+                if not task['started']:
+                    if not task['future'].set_running_or_notify_cancel():
+                        del self._tasks[task_id]  # 搜尋端已取消（例如被剪枝）
+                        continue
+                    task['started'] = True
+                task['worker'] = worker
+                task['last_seen'] = now
+                return {'status': 'task', 'task': task['payload']}
+            return {'status': 'wait'}
+
+    def _handle_heartbeat(self, worker, task_id):
+        """更新任務心跳，回傳工作者是否應該停止目前的任務"""
+        now = time.time()
+        with self._lock:
+            self.workers[worker] = now
+            task = self._tasks.get(task_id)
+            if self.stop_event.is_set() or task is None or task['worker'] != worker:
+                return {'stop': True}
+            task['last_seen'] = now
+            self._requeue_stale_tasks(now)
+            return {'stop': False}
+
+    def _handle_result(self, worker, task_id, result=None, error=None):
+        """接收工作者回報的結果，重新分派後較晚回報的重複結果會被忽略"""
+        with self._lock:
+            self.workers[worker] = time.time()
+            task = self._tasks.pop(task_id, None)
+            if task is not None and task['worker'] != worker:
+                # 任務已重新分派給其他工作者，仍接受先完成的結果
+                self._pending = deque(t for t in self._pending if t != task_id)
+        if task is None or task['future'].done():
+            return {'ok': False}
+        if error is not None:
+            task['future'].set_exception(RuntimeError(f"工作者 {worker}: {error}"))
+        else:
+            # JSON 物件的鍵一律是字串，樹數鍵轉回整數
+            for key in ('scores', 'metric_scores', 'latencies', 'model_sizes', 'probas'):
+                if result.get(key) is not None:
+                    result[key] = {int(n): value for n, value in result[key].items()}
+            task['future'].set_result(result)
+        return {'ok': True}
+
+    def _handle_job(self):
+        """回傳目前工作的資料與估計器設定"""
+        with self._lock:
+            return {'status': 'job', 'job': self._job} if self._job else {'status': 'wait'}
+
+    def _make_handler(self):
+        """建立 HTTP 請求處理類別"""
+        coordinator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, payload, status=200):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path == '/job':
+                    self._reply(coordinator._handle_job())
+                else:
+                    self._reply({'error': 'not found'}, 404)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                try:
+                    message = json.loads(self.rfile.read(length) or b'{}')
+                except ValueError:
+                    self._reply({'error': 'invalid json'}, 400)
+                    return
+                worker = message.get('worker', self.client_address[0])
+                if self.path == '/task':
+                    self._reply(coordinator._handle_task_request(worker))
+                elif self.path == '/heartbeat':
+                    self._reply(coordinator._handle_heartbeat(worker, message.get('task_id')))
+                elif self.path == '/result':
+                    self._reply(coordinator._handle_result(
+                        worker, message.get('task_id'), message.get('result'),
+                        message.get('error')))
+                else:
+                    self._reply({'error': 'not found'}, 404)
+
+            def log_message(self, format, *args):
+                pass  # 不輸出每個請求的存取記錄
+
+        return Handler
+
+
+# ---- 工作者 ----
+
+def _request(url, payload=None, timeout=10):
+    """送出 JSON 請求並解析回應"""
+    data = None if payload is None else json.dumps(payload).encode('utf-8')
+    request = urllib.request.Request(url, data=data,
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def _load_job_data(job, data_path=None):
+    """依工作設定從共享資料檔重建搜尋資料與估計器，並以指紋確認資料一致"""
+    from ai_utils.model_traning import create_model_pipeline
+
+    data = pd.read_csv(data_path or job['data_path'])
+    rows = data.loc[job['row_labels']]
+    X = rows[job['feature_columns']]
+    y = rows[job['target_column']].astype(int)
+    if dataset_fingerprint(X, y) != job['fingerprint']:
+        raise ValueError("工作者載入的資料與協調者的資料指紋不符，請確認共享資料路徑")
+    estimator = create_model_pipeline()
+    estimator.set_params(**job['estimator_params'])
+    return estimator, X, y
+
+
+def _heartbeat_loop(url, worker_id, task_id, interval, stop_task, finished):
+    """任務執行期間定期送出心跳，收到停止回應時通知訓練中斷"""
+    while not finished.wait(interval):
+        try:
+            if _request(f"{url}/heartbeat", {'worker': worker_id, 'task_id': task_id})['stop']:
+                stop_task.set()
+                return
+        except (urllib.error.URLError, OSError):
+            stop_task.set()  # 協調者已關閉
+            return
+
+
+def run_worker(coordinator_url, worker_id=None, data_path=None, n_jobs=-1,
+               heartbeat_interval=DEFAULT_HEARTBEAT_INTERVAL, poll_interval=0.5,
+               idle_timeout=30.0, max_tasks=None):
+    """
+    工作者主迴圈：取得任務、評估、回報，直到協調者關閉
+
+    參數:
+        coordinator_url (str): 協調者位址，例如 http://192.168.1.10:8765
+        worker_id (str): 工作者名稱，None 表示使用 主機名稱-行程編號
+        data_path (str): 覆寫共享資料路徑（各機器掛載位置不同時使用）
+        n_jobs (int): 此工作者的 CPU 核心預算
+        heartbeat_interval (float): 心跳間隔秒數
+        poll_interval (float): 沒有任務時的輪詢間隔秒數
+        idle_timeout (float): 無法連線到協調者超過此秒數後結束
+        max_tasks (int): 完成此數量的任務後結束，None 表示不限
+
+    回傳:
+        int: 完成的任務數
+    """
+    from ai_utils.model_traning import _fit_and_score, _FoldCache, TrainingStoppedError
+
+    url = coordinator_url.rstrip('/')
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    budget = ThreadBudget(n_jobs)
+    job_id, estimator, X, y = None, None, None, None
+    fold_cache = _FoldCache()  # 同一個工作中重用已處理的 fold
+    completed = 0
+    last_contact = time.time()
+
+    print(f"工作者 {worker_id} 連線至協調者 {url}")
+    while max_tasks is None or completed < max_tasks:
+        try:
+            reply = _request(f"{url}/task", {'worker': worker_id})
+            last_contact = time.time()
+        except (urllib.error.URLError, OSError):
+            if time.time() - last_contact > idle_timeout:
+                print(f"工作者 {worker_id} 無法連線至協調者，結束")
+                break
+            time.sleep(poll_interval)
+            continue
+
+        if reply['status'] != 'task':
+            time.sleep(poll_interval)
+            continue
+
+        task = reply['task']
+        stop_task, finished = threading.Event(), threading.Event()
+        heartbeat = threading.Thread(
+            target=_heartbeat_loop,
+            args=(url, worker_id, task['task_id'], heartbeat_interval, stop_task, finished),
+            daemon=True)
+        heartbeat.start()
+        message = {'worker': worker_id, 'task_id': task['task_id']}
+        try:
+            if task['job_id'] != job_id:
+                estimator, X, y = _load_job_data(_request(f"{url}/job")['job'], data_path)
+                budget.apply_to_estimator(estimator, budget.total_threads)
+                fold_cache.clear()
+                job_id = task['job_id']
+            with budget.limit():
+                result = _fit_and_score(
+                    estimator, task['params'], X, y, np.asarray(task['train_index']),
+                    np.asarray(task['test_index']), task['scoring'],
+                    should_stop=stop_task.is_set, n_iterations=task['n_iterations'],
+                    metrics=tuple(task['metrics']) if task.get('metrics') else None,
+                    fold_cache=fold_cache, return_proba=task.get('return_proba', False))
+            message['result'] = _to_json(result)
+        except TrainingStoppedError:
+            message = None  # 任務被停止或已重新分派，不回報
+        except Exception as e:
+            message['error'] = f"{type(e).__name__}: {e}"
+        finally:
+            finished.set()
+            heartbeat.join()
+
+        if message is not None:
+            try:
+                _request(f"{url}/result", message)
+                completed += 'result' in message
+            except (urllib.error.URLError, OSError):
+                pass
+    return completed
+
+
+def _local_worker_main(coordinator_url, worker_id, data_path, n_jobs, heartbeat_interval,
+                       poll_interval, idle_timeout):
+    """本機工作者行程進入點"""
+    run_worker(coordinator_url, worker_id=worker_id, data_path=data_path, n_jobs=n_jobs,
+               heartbeat_interval=heartbeat_interval, poll_interval=poll_interval,
+               idle_timeout=idle_timeout)
+
+
+def start_local_workers(coordinator_url, n_workers, data_path=None, n_jobs=-1,
+                        heartbeat_interval=DEFAULT_HEARTBEAT_INTERVAL, poll_interval=0.2,
+                        idle_timeout=5.0):
+    """
+    在本機啟動多個工作者行程（測試或單機使用）
+
+    回傳:
+        list: 工作者行程列表，協調者關閉後會自行結束
+    """
+    _, n_threads = ThreadBudget(n_jobs).split(n_workers)
+    ctx = mp.get_context('spawn')
+    processes = []
+    for i in range(n_workers):
+        process = ctx.Process(
+            target=_local_worker_main,
+            args=(coordinator_url, f"local-{i}", data_path, n_threads, heartbeat_interval,
+                  poll_interval, idle_timeout),
+            daemon=True)
+        process.start()
+        processes.append(process)
+    return processes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="分散式超參數搜尋工作者")
+    parser.add_argument('--coordinator', required=True, help="協調者位址，例如 http://host:8765")
+    parser.add_argument('--data', default=None, help="可選，覆寫共享資料路徑")
+    parser.add_argument('--n-jobs', type=int, default=-1, help="此工作者的 CPU 核心預算")
+    parser.add_argument('--worker-id', default=None, help="可選，工作者名稱")
+    parser.add_argument('--idle-timeout', type=float, default=60.0,
+                        help="無法連線至協調者超過此秒數後結束")
+    args = parser.parse_args()
+    run_worker(args.coordinator, worker_id=args.worker_id, data_path=args.data,
+               n_jobs=args.n_jobs, idle_timeout=args.idle_timeout)
@@ -81,5 +81,6 @@ BEST_PARAMS_MAPPING = {
     'model__learning_rate': ('model_learning_rate', 'float'),
     'model__num_leaves': ('model_num_leaves', 'int'),
     'model__scale_pos_weight': ('model_scale_pos_weight', 'float'),
-    'model__reg_alpha': ('model_reg_alpha', 'float')  # 如果有的話
+    'model__reg_alpha': ('model_reg_alpha', 'float'),  # 如果有的話
+    'DataPreprocess__categorical_threshold': ('categorical_threshold', 'int')  # 前處理參數在網格中時
 }
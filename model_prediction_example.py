@@ -42,14 +42,17 @@ def load_model(model_path):
         # 檢查是否為新版本模型（包含完整資訊）
         if hasattr(model_info, 'predict'):  # 舊版本只有 pipeline
             print("⚠️  載入的是舊版本模型，缺少欄位資訊")
-            return {
+            model_info = {
                 'pipeline': model_info,
                 'feature_columns': None,
                 'target_column': None
             }
         else:  # 新版本包含完整資訊
             print("✅ 載入新版本模型，包含完整欄位資訊")
-            return model_info
+
+        # 依本機 CPU 執行緒預算設定預測時使用的執行緒數
+        ai_utils.model_traning.apply_thread_budget(model_info['pipeline'])
+        return model_info
 
     except FileNotFoundError:
         print(f"❌ 找不到模型檔案: {model_path}")
@@ -73,15 +76,13 @@ def predict_single_product(model_info, product_data):
     if model_info is None:
         return {"error": "模型載入失敗"}
 
-    pipeline = model_info['pipeline']
-
     # 將產品資料轉換為 DataFrame
     df = pd.DataFrame([product_data])
 
     try:
-        # 進行預測
-        prediction = pipeline.predict(df)[0]
-        probability = pipeline.predict_proba(df)[0]
+        # 進行預測（模型檔有決策門檻時以門檻判斷）
+        predictions, probabilities = ai_utils.model_traning.predict_with_info(model_info, df)
+        prediction, probability = predictions[0], probabilities[0]
 
         return {
             "prediction": int(prediction),
@@ -115,11 +116,9 @@ def predict_batch_products(model_info, csv_path, output_path=None):
         df = pd.read_csv(csv_path)
         print(f"✅ 載入 {len(df)} 筆產品資料")
 
-        pipeline = model_info['pipeline']
-
-        # 進行預測
-        predictions = pipeline.predict(df)
-        probabilities = pipeline.predict_proba(df)
+        # 進行預測（限制原生執行緒池不超過 CPU 執行緒預算，模型檔有決策門檻時以門檻判斷）
+        with ai_utils.model_traning.get_thread_budget().limit():
+            predictions, probabilities = ai_utils.model_traning.predict_with_info(model_info, df)
 
         # 將結果加入資料框
         df['prediction'] = predictions
@@ -169,6 +168,11 @@ def show_model_info(model_info):
 
     print(f"\n模型類型: {type(model_info['pipeline']).__name__}")
 
+    decision_threshold = model_info.get('decision_threshold')
+    if decision_threshold:
+        print(f"決策門檻: {decision_threshold['threshold']:.4f}"
+              f"（{decision_threshold['source']}最佳化 {decision_threshold['metric']}）")
+
 
 # 使用範例
 if __name__ == "__main__":
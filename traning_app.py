@@ -268,9 +268,11 @@ class ModelTrainingApp:
                     self.update_status("訓練已被停止")
                     return
 
-                # 先執行超參數調優
+                # 先執行超參數調優，最佳模型為 fold 集成時直接儲存，不需重新訓練
+                output_path = os.path.join(
+                    self.model_output_folder.get(), self.model_filename.get())
                 tuning_results = model_traning.hyperparameter_tuning(
-                    exclude_columns=exclude_cols)
+                    exclude_columns=exclude_cols, output_path=output_path)
 
                 if tuning_results:
                     # 檢查是否被請求停止
@@ -290,28 +292,33 @@ class ModelTrainingApp:
                     # 自動回填最佳參數到GUI欄位
                     self.apply_best_parameters(best_params)
 
-                    self.update_status("\n現在用最佳參數訓練最終模型...")
-
-                    # 檢查是否被請求停止
-                    if not self.is_training:
-                        self.update_status("訓練已被停止")
-                        return
-
-                    # 用最佳參數訓練模型
-                    output_path = os.path.join(
-                        self.model_output_folder.get(), self.model_filename.get())
-                    results = model_traning.train_model(
-                        output_path=output_path,
-                        exclude_columns=exclude_cols,
-                        n_estimators=best_params.get(
-                            'model__n_estimators', model_traning.MODEL_N_ESTIMATORS),
-                        learning_rate=best_params.get(
-                            'model__learning_rate', model_traning.MODEL_LEARNING_RATE),
-                        num_leaves=best_params.get(
-                            'model__num_leaves', model_traning.MODEL_NUM_LEAVES),
-                        scale_pos_weight=best_params.get(
-                            'model__scale_pos_weight', model_traning.MODEL_SCALE_POS_WEIGHT)
-                    )
+                    if tuning_results.get('model_path'):
+                        self.update_status(
+                            f"\n✅ 已將最佳參數的 fold 集成模型儲存至 {tuning_results['model_path']}，不需重新訓練")
+                    else:
+                        self.update_status("\n現在用最佳參數訓練最終模型...")
+
+                        # 檢查是否被請求停止
+                        if not self.is_training:
+                            self.update_status("訓練已被停止")
+                            return
+
+                        # 用最佳參數訓練模型
+                        results = model_traning.train_model(
+                            output_path=output_path,
+                            exclude_columns=exclude_cols,
+                            n_estimators=best_params.get(
+                                'model__n_estimators', model_traning.MODEL_N_ESTIMATORS),
+                            learning_rate=best_params.get(
+                                'model__learning_rate', model_traning.MODEL_LEARNING_RATE),
+                            num_leaves=best_params.get(
+                                'model__num_leaves', model_traning.MODEL_NUM_LEAVES),
+                            scale_pos_weight=best_params.get(
+                                'model__scale_pos_weight', model_traning.MODEL_SCALE_POS_WEIGHT),
+                            categorical_threshold=best_params.get(
+                                'DataPreprocess__categorical_threshold'),
+                            encoding=best_params.get('DataPreprocess__encoding', 'onehot')
+                        )
 
                     self.update_status("\n所有訓練完成!")
                 else:
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+單元測試共用的模擬資料、搜尋物件與測試執行器
+
+檔名刻意不以 test_ 開頭，避免被 run_all_tests.py 當成測試檔案執行
+"""
+
+import unittest
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import StratifiedKFold
+
+# 確保能夠匯入專案模組
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+def make_sample_data(n_rows=300, random_state=0, noise=0.2, price_cutoff=50,
+                     skin_types=('dry', 'oily', 'normal')):
+    """
+    建立小型的模擬訓練資料：價格低於 price_cutoff 的商品較可能被推薦
+
+    參數:
+        n_rows (int): 資料列數
+        random_state (int): 隨機種子
+        noise (float): 標籤被翻轉的比例
+        price_cutoff (float): 推薦的價格門檻
+        skin_types (tuple): skin_type 欄位的可能值
+
+    回傳:
+        DataFrame: 包含 is_recommended 目標欄位的資料
+    """
+    rng = np.random.RandomState(random_state)
+    data = pd.DataFrame({
+        'price_usd': rng.uniform(5, 100, n_rows),
+        'child_count': rng.randint(0, 5, n_rows),
+        'online_only': rng.randint(0, 2, n_rows),
+        'skin_type': rng.choice(list(skin_types), n_rows),
+    })
+    data['is_recommended'] = ((data['price_usd'] < price_cutoff) ^
+                              (rng.rand(n_rows) < noise)).astype(int)
+    return data
+
+
+def make_pipeline(n_jobs=1, n_estimators=10, **params):
+    """
+    建立測試用的小型模型管線，並依外層工作者數設定內層執行緒
+
+    參數:
+        n_jobs (int): 外層平行工作者數量
+        n_estimators (int): 樹的數量
+        **params: 額外傳給 set_params 的管線參數
+
+    回傳:
+        Pipeline: 尚未訓練的管線
+    """
+    from ai_utils import model_traning
+    pipe = model_traning.create_model_pipeline(
+        n_estimators=n_estimators, learning_rate=0.1, num_leaves=4, scale_pos_weight=1.0)
+    if params:
+        pipe.set_params(**params)
+    model_traning.apply_thread_budget(pipe, max(1, n_jobs))
+    return pipe
+
+
+def make_search(param_grid, n_jobs=1, n_estimators=10, n_splits=3, scoring='f1_macro',
+                estimator=None, **options):
+    """
+    建立使用小型管線與固定分割的 StoppableGridSearchCV
+
+    參數:
+        param_grid (dict or list): 參數網格
+        n_jobs (int): 外層平行工作者數量
+        n_estimators (int): 管線預設的樹數量
+        n_splits (int): 交叉驗證折數
+        scoring (str): 評分指標
+        estimator: 自訂的管線，None 時使用 make_pipeline 建立
+        **options: 其他傳給 StoppableGridSearchCV 的參數
+
+    回傳:
+        StoppableGridSearchCV: 尚未執行的搜尋物件
+    """
+    from ai_utils import model_traning
+    if estimator is None:
+        estimator = make_pipeline(n_jobs, n_estimators)
+    return model_traning.StoppableGridSearchCV(
+        estimator=estimator, param_grid=param_grid, scoring=scoring,
+        cv=StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=0),
+        n_jobs=n_jobs, **options)
+
+
+def run_test_cases(title, *test_cases):
+    """
+    執行測試類別並印出結果摘要
+
+    參數:
+        title (str): 測試名稱
+        *test_cases: unittest.TestCase 子類別
+
+    回傳:
+        bool: 所有測試都通過時為 True
+    """
+    print(f"=== {title} ===")
+
+    suite = unittest.TestSuite()
+    for test_case in test_cases:
+        suite.addTests(unittest.TestLoader().loadTestsFromTestCase(test_case))
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(suite)
+
+    print(f"\n=== 測試結果摘要 ===")
+    print(f"執行測試數: {result.testsRun}")
+    print(f"失敗: {len(result.failures)}")
+    print(f"錯誤: {len(result.errors)}")
+
+    return result.wasSuccessful()
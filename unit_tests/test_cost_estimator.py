@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+訓練與超參數搜尋成本估計單元測試
+"""
+
+import unittest
+import sys
+import os
+
+# 確保能夠匯入專案模組
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from ai_utils.cost_estimator import (  # noqa: E402
+    CostEstimate, calibrate, format_bytes, format_duration
+)
+from shared_fixtures import make_sample_data, make_search, run_test_cases  # noqa: E402
+
+
+class TestCostEstimate(unittest.TestCase):
+    """測試校準與外推"""
+
+    def setUp(self):
+        from ai_utils import model_traning
+        self.model_traning = model_traning
+        data = make_sample_data(4000)
+        self.X = data.drop(columns=['is_recommended'])
+        self.y = data['is_recommended']
+        self.pipe = model_traning.create_model_pipeline(
+            n_estimators=200, learning_rate=0.1, num_leaves=16, scale_pos_weight=1.0)
+        model_traning.apply_thread_budget(self.pipe, 1)
+
+    def test_calibrate(self):
+        """測試校準結果的欄位，且不修改傳入的管線"""
+        estimate = calibrate(self.pipe, self.X, self.y, sample_rows=1000)
+        self.assertEqual(estimate.sample_rows, 1000)
+        n_features = self.pipe.named_steps['DataPreprocess'].fit_transform(self.X).shape[1]
+        self.assertEqual(estimate.n_features, n_features)
+        self.assertGreater(estimate.seconds_per_tree_per_1k_rows + estimate.seconds_per_tree, 0)
+        self.assertGreater(estimate.raw_bytes_per_row, 0)
+        self.assertEqual(self.pipe.get_params()['model__n_estimators'], 200)
+
+    def test_extrapolates_to_full_fit(self):
+        """測試由校準樣本外推到完整資料：前處理與開銷隨列數線性增加，樹的成本隨列數與樹數增加"""
+        estimate = CostEstimate(seconds_per_tree_per_1k_rows=0.001, seconds_per_tree=0.0005,
+                                overhead_seconds_per_1k_rows=0.01,
+                                preprocess_seconds_per_1k_rows=0.02, raw_bytes_per_row=100,
+                                transformed_bytes_per_row=24, n_features=6, sample_rows=1000)
+        self.assertAlmostEqual(estimate.setup_seconds(4000), 4 * 0.03)
+        self.assertAlmostEqual(estimate.tree_seconds(4000, 200), 200 * (0.0005 + 4 * 0.001))
+        self.assertAlmostEqual(estimate.fit_seconds(4000, 200), 0.12 + 0.9)
+        self.assertAlmostEqual(estimate.fit_seconds(4000, 200) - estimate.fit_seconds(1000, 200),
+                               3 * (0.03 + 200 * 0.001))
+        self.assertAlmostEqual(estimate.fit_seconds(4000, 200) - estimate.fit_seconds(4000, 100),
+                               100 * (0.0005 + 4 * 0.001))
+
+    def test_search_seconds(self):
+        """測試工作者分攤與 fold 快取共用前處理的計算"""
+        estimate = CostEstimate(seconds_per_tree_per_1k_rows=0.001, seconds_per_tree=0.0005,
+                                overhead_seconds_per_1k_rows=0.01,
+                                preprocess_seconds_per_1k_rows=0.02, raw_bytes_per_row=100,
+                                transformed_bytes_per_row=24, n_features=6, sample_rows=1000)
+        self.assertAlmostEqual(estimate.fit_seconds(2000, 100), 2 * 0.03 + 100 * (0.0005 + 0.002))
+        fits = [(2000, 100)] * 6
+        self.assertAlmostEqual(estimate.search_seconds(fits, n_workers=2),
+                               3 * estimate.fit_seconds(2000, 100))
+        self.assertAlmostEqual(estimate.search_seconds(fits, n_setups=3),
+                               6 * estimate.tree_seconds(2000, 100) + 3 * estimate.setup_seconds(2000))
+        self.assertEqual(estimate.peak_memory_bytes(1000, 500),
+                         1000 * 100 + 500 * (24 + 6 + 32))
+        self.assertEqual(estimate.peak_memory_bytes(1000, 500, n_workers=2, n_resident_folds=3),
+                         3 * 1000 * 100 + 2 * 3 * 500 * (24 + 6 + 32))
+
+    def test_format(self):
+        """測試時間與容量的顯示格式"""
+        self.assertEqual(format_duration(12.34), "12.3 秒")
+        self.assertEqual(format_duration(125), "2 分 5 秒")
+        self.assertEqual(format_duration(7380), "2 小時 3 分")
+        self.assertEqual(format_bytes(512), "512 B")
+        self.assertEqual(format_bytes(3 * 1024 ** 2), "3 MB")
+        self.assertEqual(format_bytes(1.5 * 1024 ** 3), "1.5 GB")
+
+
+class TestPlannedFits(unittest.TestCase):
+    """測試搜尋類別的訓練規劃與剩餘時間"""
+
+    def setUp(self):
+        from ai_utils import model_traning
+        self.model_traning = model_traning
+        self.model_traning.reset_stop_training_flag()
+        self.param_grid = {'model__n_estimators': [10, 30], 'model__num_leaves': [4, 8, 16]}
+
+    def make_search(self, **options):
+        return make_search(self.param_grid, **options)
+
+    def test_grid(self):
+        """測試網格搜尋只差在樹數的組合共用一次訓練"""
+        fits = self.make_search().planned_fits(800)
+        self.assertEqual(fits, [(800, 30)] * 9)
+        fits = self.make_search(staged_n_estimators=False).planned_fits(800)
+        self.assertEqual(sorted(fits), sorted([(800, 10)] * 9 + [(800, 30)] * 9))
+
+    def test_reduced_budgets(self):
+        """測試逐次減半與多精度搜尋前段輪次的預算"""
+        fits = self.make_search(search_mode='multi_fidelity', subsample=0.25,
+                                top_k=2).planned_fits(800)
+        self.assertEqual(fits.count((200, 30)), 9)
+        self.assertEqual(len([f for f in fits if f[0] == 800]), 2 * 3)
+
+        fits = self.make_search(search_mode='halving', resource='n_samples',
+                                min_resources=50).planned_fits(900)
+        self.assertEqual({n_rows for n_rows, _ in fits}, {300, 900})
+
+        fits = self.make_search(search_mode='halving', resource='n_estimators',
+                                min_resources=5).planned_fits(900)
+        self.assertEqual({n_rows for n_rows, _ in fits}, {900})
+        self.assertLess(min(n_trees for _, n_trees in fits), 30)
+
+    def test_tpe(self):
+        """測試 TPE 以樹數範圍中點估計每次試驗"""
+        pipe = self.model_traning.create_model_pipeline(
+            n_estimators=10, learning_rate=0.1, num_leaves=4, scale_pos_weight=1.0)
+        search = self.model_traning.StoppableTPESearchCV(
+            estimator=pipe, param_space={'model__n_estimators': ('int', 20, 60)},
+            scoring='f1_macro', cv=3, n_trials=4)
+        self.assertEqual(search.planned_fits(500), [(500, 40)] * 12)
+
+    def test_eta_reaches_zero(self):
+        """測試搜尋中更新剩餘時間，完成時為 0"""
+        data = make_sample_data(600)
+        search = self.make_search(verbose=1).fit(data.drop(columns=['is_recommended']),
+                                                 data['is_recommended'])
+        self.assertEqual(search.eta_seconds_, 0)
+
+
+def run_cost_estimator_tests():
+    """執行成本估計測試"""
+    return run_test_cases("訓練與超參數搜尋成本估計單元測試", TestCostEstimate, TestPlannedFits)
+
+
+if __name__ == "__main__":
+    success = run_cost_estimator_tests()
+    if success:
+        print("\n✅ 所有成本估計測試通過！")
+    else:
+        print("\n❌ 有成本估計測試失敗！")
+        sys.exit(1)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LightGBM 資料平行分散式訓練單元測試（本機 2 個工作者）
+"""
+
+import unittest
+import sys
+import os
+import pickle
+import tempfile
+
+import numpy as np
+
+# 確保能夠匯入專案模組
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from ai_utils import distributed_training  # noqa: E402
+from shared_fixtures import make_sample_data, run_test_cases  # noqa: E402
+
+
+class TestDistributedTraining(unittest.TestCase):
+    """測試資料平行訓練協調者"""
+
+    def test_shard_rows_stratified(self):
+        """測試分片涵蓋全部資料列且類別比例一致"""
+        y = np.array([0] * 40 + [1] * 60)
+        shards = distributed_training.shard_rows(y, 4, random_state=0)
+        self.assertEqual(len(shards), 4)
+        all_rows = np.sort(np.concatenate(shards))
+        np.testing.assert_array_equal(all_rows, np.arange(100))
+        for shard in shards:
+            self.assertAlmostEqual(y[shard].mean(), 0.6, places=1)
+
+    def test_parse_machines(self):
+        """測試機器列表解析與重複檢查"""
+        machines = distributed_training.parse_machines("127.0.0.1:12400,10.0.0.2:12400")
+        self.assertEqual(machines, [('127.0.0.1', 12400), ('10.0.0.2', 12400)])
+        with self.assertRaises(ValueError):
+            distributed_training.parse_machines(["127.0.0.1:1", "127.0.0.1:1"])
+
+    def test_find_free_ports(self):
+        """測試取得不重複的本機連接埠"""
+        ports = distributed_training.find_free_ports(3)
+        self.assertEqual(len(set(ports)), 3)
+
+    def test_remote_machines_require_shard_dir(self):
+        """測試包含遠端主機時必須提供共享資料夾"""
+        with self.assertRaises(ValueError):
+            distributed_training.train_data_parallel(
+                np.zeros((10, 2)), np.array([0, 1] * 5), {},
+                machines="127.0.0.1:12400,10.0.0.2:12400")
+
+    def test_train_model_with_local_workers(self):
+        """測試 train_model 以 2 個本機工作者訓練並儲存相同格式的模型"""
+        from ai_utils import model_traning
+        model_traning.reset_stop_training_flag()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_path = os.path.join(tmp_dir, 'train.csv')
+            output_path = os.path.join(tmp_dir, 'model.bin')
+            data = make_sample_data(600, noise=0.1)
+            data.to_csv(data_path, index=False)
+
+            results = model_traning.train_model(
+                data_path=data_path, output_path=output_path,
+                show_plots=False, target_column='is_recommended',
+                n_estimators=20, n_repeats=1, distributed_workers=2)
+            self.assertIsNotNone(results)
+            self.assertGreater(results['valid_metrics']['roc_auc'], 0.8)
+
+            with open(output_path, 'rb') as f:
+                model_info = pickle.load(f)
+            self.assertEqual(set(model_info),
+                             {'pipeline', 'feature_columns', 'target_column'})
+            model = model_info['pipeline'].named_steps['model']
+            self.assertEqual(model.booster_.num_trees(), 20)
+            self.assertNotIn('machines', model.get_params())
+            proba = model_info['pipeline'].predict_proba(data[model_info['feature_columns']])
+            self.assertEqual(proba.shape, (len(data), 2))
+
+
+def run_distributed_training_tests():
+    """執行資料平行訓練測試"""
+    return run_test_cases("資料平行分散式訓練單元測試", TestDistributedTraining)
+
+
+if __name__ == "__main__":
+    success = run_distributed_training_tests()
+    if success:
+        print("\n✅ 所有資料平行訓練測試通過！")
+    else:
+        print("\n❌ 有資料平行訓練測試失敗！")
+        sys.exit(1)
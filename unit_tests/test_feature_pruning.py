@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+特徵修剪單元測試
+"""
+
+import unittest
+import sys
+import os
+import pickle
+import tempfile
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+
+# 確保能夠匯入專案模組
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from ai_utils import model_traning  # noqa: E402
+from ai_utils.model_traning import DataPreprocess  # noqa: E402
+from shared_fixtures import run_test_cases  # noqa: E402
+
+
+def make_sample_data(n_rows=2000, random_state=0):
+    """建立只有 price_usd 與 'Lip' 分類有訊號、其餘欄位為雜訊的模擬訓練資料"""
+    rng = np.random.RandomState(random_state)
+    data = pd.DataFrame({
+        'price_usd': rng.uniform(5, 100, n_rows),
+        'child_count': rng.randint(0, 5, n_rows),
+        'noise': rng.rand(n_rows),
+        'secondary_category': rng.choice(['Foundation', 'Lip', 'Eye', 'Mask'], n_rows),
+        'skin_type': rng.choice(['dry', 'oily', 'normal'], n_rows),
+    })
+    data['is_recommended'] = (((data['price_usd'] < 50) ^ (data['secondary_category'] == 'Lip')) ^
+                              (rng.rand(n_rows) < 0.05)).astype(int)
+    return data
+
+
+class TestDropFeatures(unittest.TestCase):
+    """測試 DataPreprocess 的 drop_features"""
+
+    def setUp(self):
+        self.X = make_sample_data().drop(columns='is_recommended')
+        self.dropped = ('secondary_category_Eye', 'skin_type_dry')
+
+    def test_dropped_outputs(self):
+        """測試被修剪的獨熱欄位不輸出，pandas 與 array 輸出相同"""
+        pre = DataPreprocess(drop_features=self.dropped).fit(self.X)
+        self.assertFalse(set(self.dropped) & set(pre.final_field_names))
+        result = pre.transform(self.X)
+        self.assertEqual(list(result.columns), pre.final_field_names)
+        array = DataPreprocess(output='array', drop_features=self.dropped).fit(self.X).transform(self.X)
+        np.testing.assert_allclose(array, result.to_numpy(dtype=np.float32))
+
+        # 被修剪的值與沒看過的值相同，所有獨熱欄位為 0
+        eye = (self.X['secondary_category'] == 'Eye').to_numpy()
+        category_cols = [fn for fn in pre.final_field_names if fn.startswith('secondary_category_')]
+        self.assertTrue((result.loc[eye, category_cols].to_numpy() == 0).all())
+
+        outputs = pre.output_fields()
+        self.assertEqual(outputs['price_usd'], ['price_usd'])
+        self.assertNotIn('secondary_category_Eye', outputs['secondary_category'])
+        self.assertEqual(sum(len(names) for names in outputs.values()), len(pre.final_field_names))
+
+    def test_old_model_without_drop_features(self):
+        """測試舊版本儲存的前處理（沒有 drop_features）仍可轉換"""
+        pre = DataPreprocess().fit(self.X)
+        expected = pre.transform(self.X)
+        del pre.__dict__['drop_features']
+        restored = pickle.loads(pickle.dumps(pre))
+        self.assertIsNone(restored.drop_features)
+        pd.testing.assert_frame_equal(restored.transform(self.X), expected)
+
+
+class TestPlanFeaturePruning(unittest.TestCase):
+    """測試依重要性選擇要移除的欄位"""
+
+    def setUp(self):
+        self.pre = DataPreprocess().fit(make_sample_data().drop(columns='is_recommended'))
+        ranked = ['price_usd', 'secondary_category_Lip', 'skin_type_dry', 'child_count']
+        rest = [fn for fn in self.pre.final_field_names if fn not in ranked]
+        self.importance = [(name, 0.1 - 0.01 * i) for i, name in enumerate(ranked + rest)]
+
+    def test_top_n(self):
+        """測試只保留前 n 個輸出欄位：全部輸出被移除的原始欄位整欄移除，其餘移除獨熱欄位"""
+        plan = model_traning._plan_feature_pruning(self.importance, self.pre, top_n=3)
+        self.assertEqual(sorted(plan['drop_columns']), ['child_count', 'noise'])
+        self.assertIn('secondary_category_Eye', plan['drop_features'])
+        self.assertIn('skin_type_oily', plan['drop_features'])
+        self.assertNotIn('skin_type_dry', plan['drop_features'])
+
+    def test_threshold(self):
+        """測試移除重要性低於門檻的欄位，至少保留最重要的欄位，沒有可移除時回傳 None"""
+        plan = model_traning._plan_feature_pruning(self.importance, self.pre, threshold=0.085)
+        self.assertEqual(sorted(plan['drop_columns']), ['child_count', 'noise', 'skin_type'])
+        plan = model_traning._plan_feature_pruning(self.importance, self.pre, threshold=1.0)
+        self.assertNotIn('price_usd', plan['drop_columns'])
+        self.assertIsNone(model_traning._plan_feature_pruning(self.importance, self.pre, threshold=-1.0))
+
+
+class TestTrainingFeaturePruning(unittest.TestCase):
+    """測試 train_model 的特徵修剪"""
+
+    def setUp(self):
+        model_traning.reset_stop_training_flag()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_path = os.path.join(self.tmp_dir.name, 'train.csv')
+        self.output_path = os.path.join(self.tmp_dir.name, 'model.bin')
+        make_sample_data().to_csv(self.data_path, index=False)
+
+    def tearDown(self):
+        model_traning.reset_stop_training_flag()
+        self.tmp_dir.cleanup()
+
+    def _train(self, **options):
+        return model_traning.train_model(
+            data_path=self.data_path, output_path=self.output_path,
+            show_plots=False, target_column='is_recommended',
+            n_estimators=30, learning_rate=0.1, n_repeats=2, **options)
+
+    def test_importance_labels_match_outputs(self):
+        """測試特徵重要性與前處理的輸出欄位一一對應"""
+        results = self._train()
+        preprocessor = results['model'].named_steps['DataPreprocess']
+        self.assertEqual(sorted(name for name, _ in results['feature_importance']),
+                         sorted(preprocessor.final_field_names))
+        self.assertIsNone(results['feature_pruning'])
+
+    def test_accepted_pruning(self):
+        """測試指標在容許範圍內時儲存較窄的模型，並記錄指標與速度"""
+        results = self._train(prune_top_n=3, prune_tolerance=1.0)
+        pruning = results['feature_pruning']
+        self.assertTrue(pruning['accepted'])
+        self.assertEqual(results['feature_columns'], pruning['kept_columns'])
+        self.assertNotIn('noise', results['feature_columns'])
+        self.assertEqual(pruning['n_features']['pruned'], 3)
+        self.assertGreater(pruning['speedup']['transform'], 0)
+        self.assertGreater(pruning['speedup']['predict'], 0)
+
+        model_info = model_traning.load_model_with_info(self.output_path)
+        self.assertEqual(model_info['feature_columns'], pruning['kept_columns'])
+        self.assertEqual(model_info['feature_pruning']['valid_metrics'], pruning['valid_metrics'])
+        preprocessor = model_info['pipeline'].named_steps['DataPreprocess']
+        self.assertEqual(len(preprocessor.final_field_names), 3)
+        X = make_sample_data()[model_info['feature_columns']]
+        predictions, _ = model_traning.predict_with_info(model_info, X)
+        self.assertEqual(len(predictions), len(X))
+
+    def test_importance_excludes_validation_rows(self):
+        """測試修剪的重要性在訓練組保留列上計算，驗證組只用於採用判斷"""
+        data = make_sample_data()
+        _, X_valid = train_test_split(
+            data, test_size=model_traning.TEST_SIZE, random_state=model_traning.RANDOM_STATE,
+            stratify=data['is_recommended'])
+        importance_rows = []
+        original = model_traning._compute_feature_importance
+
+        def recording(pipe, X, *args, **kwargs):
+            importance_rows.append(set(X.index))
+            return original(pipe, X, *args, **kwargs)
+
+        with mock.patch.object(model_traning, '_compute_feature_importance', recording):
+            results = self._train(prune_top_n=3, prune_tolerance=1.0)
+        pruning_rows = importance_rows[0]
+        self.assertEqual(len(pruning_rows), results['feature_pruning']['importance_rows'])
+        self.assertFalse(pruning_rows & set(X_valid.index))
+
+    def test_rejected_pruning(self):
+        """測試指標下降超過容許範圍時維持完整特徵"""
+        results = self._train(prune_top_n=1, prune_tolerance=0.0)
+        pruning = results['feature_pruning']
+        self.assertFalse(pruning['accepted'])
+        self.assertEqual(pruning['kept_columns'], ['price_usd'])
+        self.assertLess(pruning['valid_metrics']['f1_macro'], pruning['valid_metrics_full']['f1_macro'])
+        model_info = model_traning.load_model_with_info(self.output_path)
+        self.assertEqual(len(model_info['feature_columns']), 5)
+
+    def test_invalid_options(self):
+        """測試不合法的修剪參數與分段模型被拒絕"""
+        self.assertIsNone(self._train(prune_top_n=0))
+        self.assertIsNone(self._train(prune_top_n=3, prune_tolerance=-0.1))
+        self.assertIsNone(self._train(prune_top_n=3, segment_column='secondary_category'))
+
+
+def run_feature_pruning_tests():
+    """執行特徵修剪測試"""
+    return run_test_cases("特徵修剪單元測試", TestDropFeatures, TestPlanFeaturePruning, TestTrainingFeaturePruning)
+
+
+if __name__ == "__main__":
+    success = run_feature_pruning_tests()
+    if success:
+        print("\n✅ 所有特徵修剪測試通過！")
+    else:
+        print("\n❌ 有特徵修剪測試失敗！")
+        sys.exit(1)
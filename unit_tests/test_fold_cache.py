@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+超參數搜尋 fold 前處理與分箱快取單元測試
+"""
+
+import unittest
+import sys
+import os
+from unittest import mock
+
+import numpy as np
+
+# 確保能夠匯入專案模組
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from shared_fixtures import (  # noqa: E402
+    make_pipeline, make_sample_data, make_search, run_test_cases
+)
+
+
+class TestFoldCache(unittest.TestCase):
+    """測試 fold 快取的結果與呼叫次數"""
+
+    def setUp(self):
+        from ai_utils import model_traning
+        self.model_traning = model_traning
+        self.model_traning.reset_stop_training_flag()
+
+        data = make_sample_data(400)
+        self.X = data.drop(columns=['is_recommended'])
+        self.y = data['is_recommended']
+        self.param_grid = {
+            'model__n_estimators': [5, 15],
+            'model__num_leaves': [4, 16],
+            'model__min_child_samples': [5, 20],
+        }
+
+    def tearDown(self):
+        self.model_traning.reset_stop_training_flag()
+
+    def make_pipe(self, output='array'):
+        return make_pipeline(DataPreprocess__output=output)
+
+    def make_search(self, cache_folds, param_grid=None, scoring='f1_macro', metrics=None,
+                    output='array', n_jobs=1):
+        return make_search(param_grid or self.param_grid, n_jobs=n_jobs, scoring=scoring,
+                           estimator=self.make_pipe(output), metrics=metrics,
+                           cache_folds=cache_folds)
+
+    def count_preprocess_fits(self, search):
+        """執行搜尋並計算 DataPreprocess.fit 的呼叫次數"""
+        original = self.model_traning.DataPreprocess.fit
+        with mock.patch.object(self.model_traning.DataPreprocess, 'fit', autospec=True,
+                               side_effect=original) as fit:
+            search.fit(self.X, self.y)
+        return fit.call_count
+
+    def assert_same_results(self, cached, uncached):
+        self.assertEqual(cached.best_params_, uncached.best_params_)
+        for ours, theirs in zip(cached.cv_results_, uncached.cv_results_):
+            self.assertEqual(ours['params'], theirs['params'])
+            np.testing.assert_allclose(ours['cv_scores'], theirs['cv_scores'])
+
+    def test_supports(self):
+        """測試只有 Booster 參數的組合使用快取"""
+        supports = self.model_traning._FoldCache.supports
+        pipe = self.make_pipe()
+        self.assertTrue(supports(pipe, {'model__num_leaves': 8, 'model__reg_alpha': 1.0}))
+        self.assertFalse(supports(pipe, {'DataPreprocess__output': 'pandas'}))
+        self.assertTrue(supports(pipe, {'DataPreprocess__categorical_threshold': 3,
+                                        'DataPreprocess__encoding': 'ordinal',
+                                        'model__num_leaves': 8}))
+        self.assertFalse(supports(pipe, {'model__max_bin': 63}))
+        self.assertFalse(supports(pipe.set_params(model__class_weight='balanced'), {}))
+        self.assertFalse(supports(pipe.named_steps['model'], {}))
+
+    def test_booster_classifier(self):
+        """測試 lgb.train 包裝與 LGBMClassifier 預測相同，且可 clone 後重新訓練（含多類別）"""
+        from sklearn.base import clone
+        X = self.make_pipe().named_steps['DataPreprocess'].fit_transform(self.X)
+        y_multi = np.asarray(self.y) + (self.X['child_count'].to_numpy() > 2)
+        template = self.make_pipe().named_steps['model']
+        for y in (np.asarray(self.y), y_multi):
+            expected = clone(template).fit(X, y).predict_proba(X)
+            wrapper = self.model_traning._BoosterClassifier(clone(template))
+            np.testing.assert_allclose(clone(wrapper).fit(X, y).predict_proba(X), expected)
+            self.assertEqual(wrapper.fit(X, y).predict(X).shape, (len(X),))
+        refit = clone(wrapper).set_params(model__n_estimators=3).fit(X, self.y)
+        self.assertEqual(refit.booster_.current_iteration(), 3)
+
+    def test_preprocess_once_per_fold(self):
+        """測試每個 fold 只擬合一次前處理，結果與不使用快取相同"""
+        for output in ('array', 'pandas'):
+            cached = self.make_search(True, output=output)
+            uncached = self.make_search(False, output=output)
+            self.assertEqual(self.count_preprocess_fits(cached), 3)
+            # 未快取時每組（只差在樹數的組合共用一次訓練）每個 fold 各擬合一次
+            self.assertEqual(self.count_preprocess_fits(uncached), 4 * 3)
+            self.assert_same_results(cached, uncached)
+
+    def test_other_scorers_and_metrics(self):
+        """測試 sklearn 評分器與多指標模式的結果相同"""
+        cached = self.make_search(True, scoring='roc_auc').fit(self.X, self.y)
+        uncached = self.make_search(False, scoring='roc_auc').fit(self.X, self.y)
+        self.assert_same_results(cached, uncached)
+
+        metrics = ('balanced_accuracy', 'neg_log_loss')
+        cached = self.make_search(True, metrics=metrics).fit(self.X, self.y)
+        uncached = self.make_search(False, metrics=metrics).fit(self.X, self.y)
+        for ours, theirs in zip(cached.cv_results_, uncached.cv_results_):
+            for name in metrics:
+                np.testing.assert_allclose(ours['cv_metrics'][name], theirs['cv_metrics'][name])
+
+    def test_preprocess_params_once_per_setting(self):
+        """測試網格包含前處理參數時每個 fold 的每種前處理設定只擬合一次，結果與不使用快取相同"""
+        param_grid = {'DataPreprocess__categorical_threshold': [3, 10],
+                      'DataPreprocess__encoding': ['onehot', 'ordinal'],
+                      'model__n_estimators': [5, 15], 'model__num_leaves': [4, 16]}
+        cached = self.make_search(True, param_grid=param_grid)
+        self.assertEqual(self.count_preprocess_fits(cached), 4 * 3)
+        uncached = self.make_search(False, param_grid=param_grid)
+        self.assertEqual(self.count_preprocess_fits(uncached), 8 * 3)
+        self.assert_same_results(cached, uncached)
+
+        # 集成模型中的 fold 前處理使用最佳組合的設定
+        best = cached.best_params_
+        for fold_model in cached.best_estimator_.estimators:
+            # 只差在樹數的組合共用訓練，較少樹數的成員以 _StagedPredictor 包裝管線
+            preprocess = getattr(fold_model, 'pipeline', fold_model).named_steps['DataPreprocess']
+            self.assertEqual(preprocess.encoding, best['DataPreprocess__encoding'])
+            self.assertEqual(preprocess.categorical_threshold,
+                             best['DataPreprocess__categorical_threshold'])
+
+    def test_preprocess_params_parallel(self):
+        """測試平行工作者快取多種前處理設定的結果與循序搜尋相同"""
+        param_grid = {'DataPreprocess__encoding': ['onehot', 'ordinal'],
+                      'model__num_leaves': [4, 16]}
+        parallel = self.make_search(True, param_grid=param_grid, n_jobs=2).fit(self.X, self.y)
+        serial = self.make_search(False, param_grid=param_grid).fit(self.X, self.y)
+        self.assert_same_results(parallel, serial)
+
+    def test_binning_params_fall_back(self):
+        """測試網格包含分箱參數時每個組合各自處理"""
+        param_grid = {'model__max_bin': [15, 255], 'model__num_leaves': [4, 8]}
+        cached = self.make_search(True, param_grid=param_grid)
+        self.assertEqual(self.count_preprocess_fits(cached), 4 * 3)
+        uncached = self.make_search(False, param_grid=param_grid).fit(self.X, self.y)
+        self.assert_same_results(cached, uncached)
+
+    def test_parallel_matches_serial(self):
+        """測試平行工作者各自快取的結果與循序搜尋相同"""
+        parallel = self.make_search(True, n_jobs=2).fit(self.X, self.y)
+        serial = self.make_search(False).fit(self.X, self.y)
+        self.assert_same_results(parallel, serial)
+
+    def test_cached_training_can_stop(self):
+        """測試使用快取的訓練仍可中途停止"""
+        train_index, test_index = np.arange(300), np.arange(300, 400)
+        with self.assertRaises(self.model_traning.TrainingStoppedError):
+            self.model_traning._fit_and_score(
+                self.make_pipe(), {'model__n_estimators': 50}, self.X, self.y,
+                train_index, test_index, 'f1_macro', should_stop=lambda: True,
+                fold_cache=self.model_traning._FoldCache())
+
+
+def run_fold_cache_tests():
+    """執行 fold 快取測試"""
+    return run_test_cases("超參數搜尋 fold 快取單元測試", TestFoldCache)
+
+
+if __name__ == "__main__":
+    success = run_fold_cache_tests()
+    if success:
+        print("\n✅ 所有 fold 快取測試通過！")
+    else:
+        print("\n❌ 有 fold 快取測試失敗！")
+        sys.exit(1)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+超參數搜尋保留 fold 模型（軟投票集成最佳模型）單元測試
+"""
+
+import unittest
+import sys
+import os
+import pickle
+import tempfile
+
+import numpy as np
+from sklearn.metrics import f1_score
+from sklearn.model_selection import StratifiedKFold
+
+# 確保能夠匯入專案模組
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from shared_fixtures import make_sample_data, make_search, run_test_cases  # noqa: E402
+
+
+class TestFoldEnsemble(unittest.TestCase):
+    """測試 StoppableGridSearchCV 以最佳組合的 fold 模型組成 best_estimator_"""
+
+    def setUp(self):
+        from ai_utils import model_traning
+        self.model_traning = model_traning
+        self.model_traning.reset_stop_training_flag()
+
+        data = make_sample_data(400)
+        self.X = data.drop(columns=['is_recommended'])
+        self.y = data['is_recommended']
+        self.param_grid = {
+            'model__n_estimators': [5, 20],
+            'model__num_leaves': [4, 16],
+        }
+        self.cv = StratifiedKFold(n_splits=3, shuffle=True, random_state=0)
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.model_traning.reset_stop_training_flag()
+        self.tmp_dir.cleanup()
+
+    def make_search(self, n_jobs=1, cache_folds=True, keep_fold_models=True, trial_store=None):
+        return make_search(self.param_grid, n_jobs=n_jobs, cache_folds=cache_folds,
+                           keep_fold_models=keep_fold_models, trial_store=trial_store)
+
+    def assert_fold_models_scored(self, search):
+        """測試集成中的每個 fold 模型就是評分時的模型"""
+        ensemble = search.best_estimator_
+        self.assertIsInstance(ensemble, self.model_traning.CVEnsembleClassifier)
+        self.assertEqual(ensemble.params, search.best_params_)
+        best = next(r for r in search.cv_results_ if r['params'] == search.best_params_)
+        splits = list(self.cv.split(self.X, self.y))
+        for model, (_, test_index), score in zip(ensemble.estimators, splits, best['cv_scores']):
+            y_pred = model.predict(self.X.iloc[test_index])
+            self.assertAlmostEqual(f1_score(self.y.iloc[test_index], y_pred, average='macro'),
+                                   score)
+
+    def test_ensemble_of_fold_models(self):
+        """測試集成以平均機率預測，fold 模型與評分時相同（含共用訓練與快取路徑）"""
+        for cache_folds in (True, False):
+            search = self.make_search(cache_folds=cache_folds).fit(self.X, self.y)
+            self.assert_fold_models_scored(search)
+            ensemble = search.best_estimator_
+            expected = np.mean([m.predict_proba(self.X) for m in ensemble.estimators], axis=0)
+            np.testing.assert_allclose(ensemble.predict_proba(self.X), expected)
+            np.testing.assert_array_equal(ensemble.predict(self.X), np.argmax(expected, axis=1))
+
+    def test_parallel_matches_serial(self):
+        """測試平行工作者傳回的 fold 模型與循序搜尋相同"""
+        serial = self.make_search().fit(self.X, self.y)
+        parallel = self.make_search(n_jobs=2).fit(self.X, self.y)
+        self.assert_fold_models_scored(parallel)
+        np.testing.assert_allclose(parallel.best_estimator_.predict_proba(self.X),
+                                   serial.best_estimator_.predict_proba(self.X))
+
+    def test_stored_folds_are_refit(self):
+        """測試從試驗記錄載入的 fold 在本機補訓練，結果與原本相同"""
+        store_path = os.path.join(self.tmp_dir.name, 'trials.db')
+        first = self.make_search(trial_store=store_path).fit(self.X, self.y)
+        again = self.make_search(trial_store=store_path).fit(self.X, self.y)
+        self.assert_fold_models_scored(again)
+        np.testing.assert_allclose(again.best_estimator_.predict_proba(self.X),
+                                   first.best_estimator_.predict_proba(self.X))
+
+    def test_keep_fold_models_disabled(self):
+        """測試停用時 best_estimator_ 為設定最佳參數、尚未訓練的估計器"""
+        search = self.make_search(keep_fold_models=False).fit(self.X, self.y)
+        self.assertNotIsInstance(search.best_estimator_, self.model_traning.CVEnsembleClassifier)
+        params = search.best_estimator_.get_params()
+        for key, value in search.best_params_.items():
+            self.assertEqual(params[key], value)
+
+    def test_pickle_round_trip(self):
+        """測試集成模型可存檔並載入後預測"""
+        search = self.make_search().fit(self.X, self.y)
+        loaded = pickle.loads(pickle.dumps(search.best_estimator_))
+        np.testing.assert_allclose(loaded.predict_proba(self.X),
+                                   search.best_estimator_.predict_proba(self.X))
+
+    def test_hyperparameter_tuning_saves_final_model(self):
+        """測試 hyperparameter_tuning 直接儲存集成模型，不需重新訓練"""
+        data_path = os.path.join(self.tmp_dir.name, 'train.csv')
+        make_sample_data(400).to_csv(data_path, index=False)
+        output_path = os.path.join(self.tmp_dir.name, 'model.bin')
+        results = self.model_traning.hyperparameter_tuning(
+            data_path=data_path, cv_folds=3, param_grid=self.param_grid, search_mode='grid',
+            trial_store_path='', output_path=output_path)
+        self.assertIsNotNone(results)
+        self.assertEqual(results['model_path'], output_path)
+
+        model_info = self.model_traning.load_model_with_info(output_path)
+        self.assertEqual(model_info['best_params'], results['best_params'])
+        X = make_sample_data(400)[model_info['feature_columns']]
+        np.testing.assert_allclose(model_info['pipeline'].predict_proba(X),
+                                   results['best_model'].predict_proba(X))
+        self.assertIsNone(self.model_traning.update_model(output_path, data_path))
+
+
+def run_fold_ensemble_tests():
+    """執行 fold 模型集成測試"""
+    return run_test_cases("超參數搜尋 fold 模型集成單元測試", TestFoldEnsemble)
+
+
+if __name__ == "__main__":
+    success = run_fold_ensemble_tests()
+    if success:
+        print("\n✅ 所有 fold 模型集成測試通過！")
+    else:
+        print("\n❌ 有 fold 模型集成測試失敗！")
+        sys.exit(1)
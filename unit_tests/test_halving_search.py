@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+逐次減半超參數搜尋單元測試
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+
+# 確保能夠匯入專案模組
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from shared_fixtures import make_sample_data, make_search, run_test_cases  # noqa: E402
+
+
+class TestHalvingSearch(unittest.TestCase):
+    """測試 StoppableGridSearchCV 的逐次減半模式"""
+
+    def setUp(self):
+        """建立搜尋所需的資料與網格"""
+        from ai_utils import model_traning
+        self.model_traning = model_traning
+        self.model_traning.reset_stop_training_flag()
+
+        data = make_sample_data(600)
+        self.X = data.drop(columns=['is_recommended'])
+        self.y = data['is_recommended']
+        self.param_grid = {
+            'model__num_leaves': [4, 8, 16],
+            'model__learning_rate': [0.05, 0.1, 0.2],
+        }
+
+    def tearDown(self):
+        """測試後清理"""
+        self.model_traning.reset_stop_training_flag()
+
+    def make_search(self, n_jobs=1, resource='n_samples'):
+        """建立逐次減半搜尋物件"""
+        return make_search(self.param_grid, n_jobs=n_jobs, n_estimators=30, search_mode='halving',
+                           factor=3, resource=resource, min_resources=10)
+
+    def test_schedule(self):
+        """測試每輪的組合數與預算比例"""
+        search = self.make_search()
+        schedule = search._halving_schedule(27)
+        self.assertEqual([n for n, _ in schedule], [27, 9, 3, 1])
+        self.assertEqual([fraction for _, fraction in schedule],
+                         [1 / 27, 1 / 9, 1 / 3, 1.0])
+        self.assertEqual([n for n, _ in search._halving_schedule(9)], [9, 3, 1])
+        self.assertEqual(search._halving_schedule(1), [(1, 1.0)])
+
+    def test_halving_by_samples(self):
+        """測試以資料列數為預算的逐次減半搜尋"""
+        search = self.make_search().fit(self.X, self.y)
+
+        self.assertIsNotNone(search)
+        self.assertEqual(search.total_combinations_, 9 + 3 + 1)
+        self.assertEqual(search.completed_combinations_, 13)
+        rounds = [result['iter'] for result in search.cv_results_]
+        self.assertEqual(rounds, [0] * 9 + [1] * 3 + [2])
+
+        # 最後一輪使用完整的訓練 fold，並決定最佳參數
+        final = search.cv_results_[-1]
+        self.assertEqual(final['n_resources'], 400)
+        self.assertEqual(final['params'], search.best_params_)
+        self.assertLess(search.cv_results_[0]['n_resources'], 400)
+
+        # 晉級的組合是上一輪分數最高的組合
+        first_round = sorted(search.cv_results_[:9],
+                             key=lambda r: (-r['mean_test_score'], r['candidate_index']))
+        survivors = {r['candidate_index'] for r in search.cv_results_[9:12]}
+        self.assertEqual(survivors, {r['candidate_index'] for r in first_round[:3]})
+
+    def test_halving_by_trees(self):
+        """測試以樹的數量為預算的逐次減半搜尋"""
+        search = self.make_search(resource='n_estimators').fit(self.X, self.y)
+        self.assertIsNotNone(search)
+        budgets = [result['n_resources'] for result in search.cv_results_]
+        self.assertEqual(budgets, [10] * 9 + [10] * 3 + [30])
+        self.assertNotIn('model__n_estimators', search.best_params_)
+
+    def test_parallel_matches_serial(self):
+        """測試平行逐次減半與循序結果一致"""
+        serial = self.make_search().fit(self.X, self.y)
+        parallel = self.make_search(n_jobs=2).fit(self.X, self.y)
+        self.assertEqual(parallel.best_params_, serial.best_params_)
+        self.assertEqual([(r['iter'], r['params']) for r in parallel.cv_results_],
+                         [(r['iter'], r['params']) for r in serial.cv_results_])
+
+    def test_stopped_before_start(self):
+        """測試停止標誌會中止逐次減半搜尋"""
+        self.model_traning.set_stop_training_flag(True)
+        self.assertIsNone(self.make_search().fit(self.X, self.y))
+
+    def test_hyperparameter_tuning_invalid_mode(self):
+        """測試 hyperparameter_tuning 拒絕未知的搜尋模式"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_path = os.path.join(tmp_dir, 'train.csv')
+            make_sample_data(600).to_csv(data_path, index=False)
+
+            results = self.model_traning.hyperparameter_tuning(
+                data_path=data_path, target_column='is_recommended',
+                search_mode='random')
+            self.assertIsNone(results)
+
+
+def run_halving_search_tests():
+    """執行逐次減半搜尋測試"""
+    return run_test_cases("逐次減半超參數搜尋單元測試", TestHalvingSearch)
+
+
+if __name__ == "__main__":
+    success = run_halving_search_tests()
+    if success:
+        print("\n✅ 所有逐次減半搜尋測試通過！")
+    else:
+        print("\n❌ 有逐次減半搜尋測試失敗！")
+        sys.exit(1)
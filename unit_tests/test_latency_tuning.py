@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+超參數搜尋預測延遲與模型大小單元測試
+"""
+
+import unittest
+import sys
+import os
+import sqlite3
+import tempfile
+
+import numpy as np
+
+# 確保能夠匯入專案模組
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from shared_fixtures import make_sample_data, make_search, run_test_cases  # noqa: E402
+
+
+PARAM_GRID = {'model__n_estimators': [5, 50], 'model__num_leaves': [2, 16]}
+
+
+def make_record(candidate_index, score, latency, rung=1, pruned=False):
+    """建立固定分數與每列預測秒數的搜尋記錄"""
+    return {'candidate_index': candidate_index, 'iter': rung, 'pruned': pruned,
+            'params': {'model__n_estimators': 10 * (candidate_index + 1), 'model__num_leaves': 4},
+            'mean_test_score': score, 'mean_latency': latency, 'mean_model_bytes': 1000}
+
+
+class TestLatencySelection(unittest.TestCase):
+    """以固定延遲的搜尋記錄測試 Pareto 前緣與延遲容忍選擇"""
+
+    def setUp(self):
+        self.records = [
+            make_record(0, 0.80, 1e-6),
+            make_record(1, 0.78, 2e-6),              # 被組合 0 支配
+            make_record(2, 0.85, 5e-6),
+            make_record(3, 0.90, 2e-5),
+            make_record(4, 0.70, 1e-6),              # 延遲相同但分數較低
+            make_record(5, 0.95, np.nan),            # 沒有延遲量測
+            make_record(6, 0.99, 1e-7, pruned=True),
+            make_record(7, 0.99, 1e-7, rung=0),      # 不是最高輪次
+        ]
+
+    def make_search(self, latency_tolerance, best_index=3, near_best_models=None):
+        """建立已有搜尋記錄、最佳組合為 best_index 的搜尋物件"""
+        search = make_search(PARAM_GRID, latency_tolerance=latency_tolerance)
+        search.cv_results_ = self.records
+        search.pareto_front_ = search._pareto_front()
+        best = self.records[best_index]
+        search.best_score_ = best['mean_test_score']
+        search.best_params_ = best['params'].copy()
+        search._best_key = (best['iter'], best['mean_test_score'], -best_index)
+        search._best_fold_models = {0: 'best-model'}
+        search._near_best_models = near_best_models or {}
+        return search
+
+    def test_pareto_front(self):
+        """測試前緣只包含最高輪次、未被剪枝且未被支配的組合，依延遲排列"""
+        search = self.make_search(None)
+        self.assertEqual([r['candidate_index'] for r in search.pareto_front_], [0, 2, 3])
+        search.cv_results_ = [make_record(0, 0.80, np.nan)]
+        self.assertEqual(search._pareto_front(), [])
+
+    def test_select_fastest_within_tolerance(self):
+        """測試在容忍範圍內改選最快的組合，並沿用其 fold 模型"""
+        search = self.make_search(0.06, near_best_models={2: ((1, 0.85, -2), {0: 'fast-model'})})
+        search._select_fastest_within_tolerance()
+        self.assertEqual(search.best_params_, self.records[2]['params'])
+        self.assertEqual(search.best_score_, 0.85)
+        self.assertEqual(search._best_key, (1, 0.85, -2))
+        self.assertEqual(search._best_fold_models, {0: 'fast-model'})
+        self.assertEqual(search.best_estimator_.get_params()['model__n_estimators'], 30)
+
+        # 較寬的容忍選到更快的組合；沒有保留 fold 模型時留待之後補訓練
+        search = self.make_search(0.2)
+        search._select_fastest_within_tolerance()
+        self.assertEqual(search.best_params_, self.records[0]['params'])
+        self.assertEqual(search._best_fold_models, {})
+
+    def test_keeps_best_when_nothing_faster(self):
+        """測試容忍為 0 或最佳組合已是最快時維持原本的選擇"""
+        for tolerance, best_index in ((0.0, 3), (0.5, 0)):
+            search = self.make_search(tolerance, best_index=best_index)
+            search._select_fastest_within_tolerance()
+            self.assertEqual(search.best_params_, self.records[best_index]['params'])
+            self.assertEqual(search._best_fold_models, {0: 'best-model'})
+
+    def test_best_not_on_front(self):
+        """測試最高分組合不在前緣上（同分但有更快的組合、沒有延遲量測）時仍能改選"""
+        self.records = [make_record(0, 0.80, 2e-6), make_record(1, 0.80, 1e-6)]
+        search = self.make_search(0.0, best_index=0)
+        self.assertEqual([r['candidate_index'] for r in search.pareto_front_], [1])
+        search._select_fastest_within_tolerance()
+        self.assertEqual(search.best_params_, self.records[1]['params'])
+
+        self.records = [make_record(0, 0.80, 1e-6), make_record(1, 0.90, np.nan)]
+        search = self.make_search(0.2, best_index=1)
+        search._select_fastest_within_tolerance()
+        self.assertEqual(search.best_params_, self.records[0]['params'])
+        self.assertEqual(search.best_score_, 0.80)
+
+
+class TestLatencyTuning(unittest.TestCase):
+    """測試搜尋記錄的延遲、Pareto 前緣與延遲容忍選擇的結構"""
+
+    def setUp(self):
+        from ai_utils import model_traning
+        self.model_traning = model_traning
+        self.model_traning.reset_stop_training_flag()
+        data = make_sample_data(600)
+        self.X = data.drop(columns=['is_recommended'])
+        self.y = data['is_recommended']
+
+    def make_search(self, **options):
+        return make_search(PARAM_GRID, **options)
+
+    def test_records_latency_and_size(self):
+        """測試每個組合都有每列預測秒數與模型大小，快取與否皆同"""
+        for cache_folds in (True, False):
+            search = self.make_search(cache_folds=cache_folds).fit(self.X, self.y)
+            results = {(r['params']['model__n_estimators'], r['params']['model__num_leaves']): r
+                       for r in search.cv_results_}
+            for record in results.values():
+                self.assertGreater(record['mean_latency'], 0)
+                self.assertGreater(record['mean_model_bytes'], 0)
+            # 同組的組合共用一次訓練，各自以自己的樹數計算模型大小
+            self.assertGreater(results[(50, 2)]['mean_model_bytes'],
+                               results[(5, 2)]['mean_model_bytes'])
+
+    def test_pareto_front(self):
+        """測試 Pareto 前緣沒有被支配的組合，依延遲排列"""
+        search = self.make_search().fit(self.X, self.y)
+        front = search.pareto_front_
+        self.assertTrue(front)
+        latencies = [r['mean_latency'] for r in front]
+        scores = [r['mean_test_score'] for r in front]
+        self.assertEqual(latencies, sorted(latencies))
+        self.assertEqual(scores, sorted(scores))
+        self.assertEqual(scores[-1], search.best_score_)
+        for record in search.cv_results_:
+            self.assertTrue(any(r['mean_test_score'] >= record['mean_test_score'] and
+                                r['mean_latency'] <= record['mean_latency'] for r in front))
+
+    def test_latency_tolerance_ensemble(self):
+        """測試延遲容忍選到前緣上的組合，並以其 fold 模型組成集成"""
+        best = self.make_search().fit(self.X, self.y)
+        fast = self.make_search(latency_tolerance=0.05).fit(self.X, self.y)
+        self.assertIn(fast.best_params_, [r['params'] for r in fast.pareto_front_])
+        self.assertGreaterEqual(fast.best_score_, best.best_score_ - 0.05)
+        self.assertEqual(fast.best_estimator_.params, fast.best_params_)
+        self.assertEqual(len(fast.best_estimator_.estimators), 3)
+        self.assertEqual(fast.best_metrics_, None)
+        self.assertEqual(fast.best_estimator_.predict(self.X.head(20)).shape, (20,))
+
+    def test_invalid_tolerance(self):
+        """測試負的延遲容忍拋出錯誤"""
+        with self.assertRaises(ValueError):
+            self.make_search(latency_tolerance=-0.1).fit(self.X, self.y)
+
+
+class TestTrialStoreLatency(unittest.TestCase):
+    """測試試驗記錄保存延遲與模型大小"""
+
+    def test_round_trip_and_migration(self):
+        """測試寫入讀回，並為舊版資料庫加入欄位"""
+        from ai_utils.trial_store import TrialStore
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'trials.db')
+            connection = sqlite3.connect(path)
+            connection.execute(
+                "CREATE TABLE trials (dataset TEXT NOT NULL, split TEXT NOT NULL, "
+                "scoring TEXT NOT NULL, params TEXT NOT NULL, fold INTEGER NOT NULL, "
+                "score REAL NOT NULL, fit_seconds REAL NOT NULL, "
+                "created_at TEXT DEFAULT CURRENT_TIMESTAMP, "
+                "PRIMARY KEY (dataset, split, scoring, params, fold))")
+            connection.commit()
+            connection.close()
+
+            store = TrialStore(path)
+            params = {'model__num_leaves': 8}
+            store.save('d', 's', 'f1_macro', params, 0, {'score': 0.5, 'fit_seconds': 1.0})
+            store.save('d', 's', 'f1_macro', params, 1,
+                       {'score': 0.6, 'fit_seconds': 1.0, 'latency': 2e-6, 'model_bytes': 1234})
+            results = store.load('d', 's', 'f1_macro', params)
+            store.close()
+        self.assertEqual(results[0], {'score': 0.5, 'fit_seconds': 1.0})
+        self.assertEqual(results[1], {'score': 0.6, 'fit_seconds': 1.0, 'latency': 2e-6,
+                                      'model_bytes': 1234})
+
+
+def run_latency_tuning_tests():
+    """執行預測延遲與模型大小測試"""
+    return run_test_cases("超參數搜尋預測延遲與模型大小單元測試", TestLatencySelection,
+                          TestLatencyTuning, TestTrialStoreLatency)
+
+
+if __name__ == "__main__":
+    success = run_latency_tuning_tests()
+    if success:
+        print("\n✅ 所有預測延遲測試通過！")
+    else:
+        print("\n❌ 有預測延遲測試失敗！")
+        sys.exit(1)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多精度（抽樣搜尋、完整資料確認）超參數搜尋單元測試
+"""
+
+import unittest
+import sys
+import os
+
+import numpy as np
+
+# 確保能夠匯入專案模組
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from shared_fixtures import make_sample_data, make_search, run_test_cases  # noqa: E402
+
+
+class TestMultiFidelitySearch(unittest.TestCase):
+    """測試 StoppableGridSearchCV 的 'multi_fidelity' 模式"""
+
+    def setUp(self):
+        from ai_utils import model_traning
+        self.model_traning = model_traning
+        self.model_traning.reset_stop_training_flag()
+
+        data = make_sample_data(1200)
+        self.X = data.drop(columns=['is_recommended'])
+        self.y = data['is_recommended']
+        self.param_grid = {
+            'model__n_estimators': [10, 30],
+            'model__num_leaves': [4, 16],
+            'model__learning_rate': [0.05, 0.2],
+        }
+
+    def tearDown(self):
+        self.model_traning.reset_stop_training_flag()
+
+    def make_search(self, search_mode='multi_fidelity', subsample=0.25, top_k=3, n_jobs=1):
+        return make_search(self.param_grid, n_jobs=n_jobs, verbose=1, search_mode=search_mode,
+                           min_resources=50, subsample=subsample, top_k=top_k)
+
+    def test_two_stages_in_cv_results(self):
+        """測試第一階段評估所有組合，第二階段只以完整資料評估前 top_k 個"""
+        search = self.make_search().fit(self.X, self.y)
+        stage_one = [r for r in search.cv_results_ if r['iter'] == 0]
+        stage_two = [r for r in search.cv_results_ if r['iter'] == 1]
+        self.assertEqual(len(stage_one), 8)
+        self.assertEqual(len(stage_two), 3)
+        self.assertEqual(search.total_combinations_, 11)
+
+        # 訓練 fold 約 800 列，第一階段抽樣 25%
+        self.assertEqual(stage_one[0]['n_resources'], 200)
+        self.assertEqual(stage_two[0]['n_resources'], 800)
+
+        # 第二階段的組合為第一階段分數最高的前三名
+        ranked = sorted(stage_one, key=lambda r: (-r['mean_test_score'], r['candidate_index']))
+        self.assertEqual({r['candidate_index'] for r in stage_two},
+                         {r['candidate_index'] for r in ranked[:3]})
+
+    def test_best_comes_from_full_data(self):
+        """測試最佳結果取自完整資料的第二階段，且與完整網格的分數相同"""
+        search = self.make_search().fit(self.X, self.y)
+        grid = self.make_search(search_mode='grid').fit(self.X, self.y)
+        best = max((r for r in search.cv_results_ if r['iter'] == 1),
+                   key=lambda r: r['mean_test_score'])
+        self.assertEqual(search.best_params_, best['params'])
+        self.assertAlmostEqual(search.best_score_, best['mean_test_score'])
+        full = next(r for r in grid.cv_results_ if r['params'] == search.best_params_)
+        self.assertAlmostEqual(search.best_score_, full['mean_test_score'])
+
+    def test_speedup_is_reported(self):
+        """測試記錄兩階段時間與估計的加速倍數"""
+        search = self.make_search().fit(self.X, self.y)
+        speedup = search.speedup_
+        self.assertEqual(set(speedup), {'subsample_seconds', 'confirm_seconds',
+                                        'estimated_full_grid_seconds', 'speedup'})
+        total = speedup['subsample_seconds'] + speedup['confirm_seconds']
+        self.assertAlmostEqual(speedup['speedup'],
+                               speedup['estimated_full_grid_seconds'] / total)
+        self.assertIsNone(self.make_search(search_mode='grid').fit(self.X, self.y).speedup_)
+
+    def test_parallel_matches_serial(self):
+        """測試平行搜尋兩階段的結果與循序搜尋一致"""
+        serial = self.make_search().fit(self.X, self.y)
+        parallel = self.make_search(n_jobs=2).fit(self.X, self.y)
+        self.assertEqual(parallel.best_params_, serial.best_params_)
+        for ours, theirs in zip(parallel.cv_results_, serial.cv_results_):
+            self.assertEqual((ours['iter'], ours['params']), (theirs['iter'], theirs['params']))
+            np.testing.assert_allclose(ours['cv_scores'], theirs['cv_scores'])
+
+    def test_invalid_settings(self):
+        """測試不合法的抽樣比例或 top_k 拋出錯誤"""
+        for subsample, top_k in ((0, 3), (1.5, 3), (0.5, 0)):
+            with self.assertRaises(ValueError):
+                self.make_search(subsample=subsample, top_k=top_k).fit(self.X, self.y)
+
+
+def run_multi_fidelity_tests():
+    """執行多精度搜尋測試"""
+    return run_test_cases("多精度超參數搜尋單元測試", TestMultiFidelitySearch)
+
+
+if __name__ == "__main__":
+    success = run_multi_fidelity_tests()
+    if success:
+        print("\n✅ 所有多精度搜尋測試通過！")
+    else:
+        print("\n❌ 有多精度搜尋測試失敗！")
+        sys.exit(1)
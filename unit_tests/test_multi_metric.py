@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多指標評分（每個 fold 一次 predict_proba）單元測試
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+
+import numpy as np
+from sklearn.metrics import get_scorer
+
+# 確保能夠匯入專案模組
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from ai_utils.proba_metrics import PROBA_METRICS, score_from_proba, validate_metrics  # noqa: E402
+from shared_fixtures import make_sample_data, make_search, run_test_cases  # noqa: E402
+
+
+class TestProbaMetrics(unittest.TestCase):
+    """測試由機率計算的指標與 sklearn 評分器一致"""
+
+    def setUp(self):
+        from ai_utils import model_traning
+        data = make_sample_data(400)
+        X, y = data.drop(columns=['is_recommended']), data['is_recommended']
+        self.X_test, self.y_test = X.iloc[300:], y.iloc[300:]
+        self.models = [
+            model_traning.create_model_pipeline(
+                n_estimators=n, learning_rate=0.1, num_leaves=4, scale_pos_weight=1.0
+            ).fit(X.iloc[:300], y.iloc[:300])
+            for n in (1, 30)  # 只有一棵樹時機率大量同分
+        ]
+
+    def test_matches_sklearn_scorers(self):
+        """測試每個指標與同名 sklearn 評分器的結果相同"""
+        for model in self.models:
+            ours = score_from_proba(self.y_test, model.predict_proba(self.X_test),
+                                    model.classes_, PROBA_METRICS)
+            for name in PROBA_METRICS:
+                expected = get_scorer(name)(model, self.X_test, self.y_test)
+                self.assertAlmostEqual(ours[name], expected, places=10, msg=name)
+
+    def test_validate_metrics(self):
+        """測試指標名稱檢查與去除重複"""
+        self.assertEqual(validate_metrics(['roc_auc', 'f1_macro', 'roc_auc']),
+                         ('roc_auc', 'f1_macro'))
+        with self.assertRaises(ValueError):
+            validate_metrics(['f1_macro', 'jaccard'])
+        with self.assertRaises(ValueError):
+            validate_metrics([])
+
+
+class TestMultiMetricSearch(unittest.TestCase):
+    """測試 StoppableGridSearchCV 的多指標記錄與排序"""
+
+    METRICS = ('f1_macro', 'roc_auc', 'balanced_accuracy')
+
+    def setUp(self):
+        from ai_utils import model_traning
+        self.model_traning = model_traning
+        self.model_traning.reset_stop_training_flag()
+
+        data = make_sample_data(400)
+        self.X = data.drop(columns=['is_recommended'])
+        self.y = data['is_recommended']
+        self.param_grid = {
+            'model__n_estimators': [5, 20],
+            'model__num_leaves': [4, 16],
+            'model__learning_rate': [0.05, 0.2],
+        }
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.model_traning.reset_stop_training_flag()
+        self.tmp_dir.cleanup()
+
+    def make_search(self, scoring, metrics=None, n_jobs=1, trial_store=None):
+        return make_search(self.param_grid, n_jobs=n_jobs, scoring=scoring,
+                           trial_store=trial_store, metrics=metrics)
+
+    def test_metrics_match_single_metric_searches(self):
+        """測試每個指標的記錄與只用該指標搜尋的結果相同"""
+        search = self.make_search('f1_macro', self.METRICS).fit(self.X, self.y)
+        for name in self.METRICS:
+            single = self.make_search(name).fit(self.X, self.y)
+            for ours, theirs in zip(search.cv_results_, single.cv_results_):
+                self.assertEqual(ours['params'], theirs['params'])
+                np.testing.assert_allclose(ours['cv_metrics'][name], theirs['cv_scores'])
+                self.assertAlmostEqual(ours[f'mean_test_{name}'], theirs['mean_test_score'])
+        for result in search.cv_results_:
+            self.assertEqual(result['mean_test_score'], result['mean_test_f1_macro'])
+        self.assertEqual(set(search.best_metrics_), set(self.METRICS))
+
+    def test_ranking_metric_is_selectable(self):
+        """測試以不同指標排序時最佳參數與單一指標搜尋相同"""
+        for name in ('roc_auc', 'balanced_accuracy'):
+            search = self.make_search(name, self.METRICS).fit(self.X, self.y)
+            single = self.make_search(name).fit(self.X, self.y)
+            self.assertEqual(search.best_params_, single.best_params_)
+            self.assertAlmostEqual(search.best_score_, single.best_score_)
+            self.assertAlmostEqual(search.best_metrics_[name], search.best_score_)
+
+    def test_unsupported_ranking_metric(self):
+        """測試排序指標不支援由機率計算時拋出錯誤"""
+        with self.assertRaises(ValueError):
+            self.make_search('jaccard', self.METRICS).fit(self.X, self.y)
+
+    def test_store_reused_across_ranking_metrics(self):
+        """測試切換排序指標時直接重用試驗記錄"""
+        store_path = os.path.join(self.tmp_dir.name, 'trials.db')
+        first = self.make_search('f1_macro', self.METRICS, trial_store=store_path).fit(
+            self.X, self.y)
+        from ai_utils.trial_store import TrialStore
+        store = TrialStore(store_path)
+        n_rows = store.count()
+        store.close()
+
+        again = self.make_search('roc_auc', self.METRICS, trial_store=store_path).fit(
+            self.X, self.y)
+        store = TrialStore(store_path)
+        self.assertEqual(store.count(), n_rows, "不應重新訓練")
+        store.close()
+        for ours, theirs in zip(again.cv_results_, first.cv_results_):
+            self.assertAlmostEqual(ours['mean_test_score'], theirs['mean_test_roc_auc'])
+            self.assertEqual(ours['mean_fit_time'], theirs['mean_fit_time'])
+
+    def test_parallel_matches_serial(self):
+        """測試平行搜尋的多指標結果與循序搜尋一致"""
+        serial = self.make_search('roc_auc', self.METRICS).fit(self.X, self.y)
+        parallel = self.make_search('roc_auc', self.METRICS, n_jobs=2).fit(self.X, self.y)
+        for ours, theirs in zip(parallel.cv_results_, serial.cv_results_):
+            for name in self.METRICS:
+                np.testing.assert_allclose(ours['cv_metrics'][name], theirs['cv_metrics'][name])
+
+
+def run_multi_metric_tests():
+    """執行多指標評分測試"""
+    return run_test_cases("多指標評分單元測試", TestProbaMetrics, TestMultiMetricSearch)
+
+
+if __name__ == "__main__":
+    success = run_multi_metric_tests()
+    if success:
+        print("\n✅ 所有多指標評分測試通過！")
+    else:
+        print("\n❌ 有多指標評分測試失敗！")
+        sys.exit(1)
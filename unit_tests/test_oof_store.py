@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+超參數搜尋 out-of-fold 預測儲存單元測試
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import f1_score
+from sklearn.model_selection import StratifiedKFold
+
+# 確保能夠匯入專案模組
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from ai_utils.oof_store import load_oof, read_manifest  # noqa: E402
+from shared_fixtures import make_sample_data, make_search, run_test_cases  # noqa: E402
+
+
+PARAM_GRID = {'model__n_estimators': [10, 30], 'model__num_leaves': [4, 8]}
+
+
+class TestOOFStore(unittest.TestCase):
+    """測試搜尋寫入的 out-of-fold 預測"""
+
+    def setUp(self):
+        from ai_utils import model_traning
+        self.model_traning = model_traning
+        self.model_traning.reset_stop_training_flag()
+        data = make_sample_data(600)
+        self.X = data.drop(columns=['is_recommended'])
+        self.y = data['is_recommended']
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.oof_dir = os.path.join(self.tmp_dir.name, 'oof')
+
+    def tearDown(self):
+        self.model_traning.reset_stop_training_flag()
+        self.tmp_dir.cleanup()
+
+    def make_search(self, oof_dir=None, **options):
+        return make_search(options.pop('param_grid', PARAM_GRID), keep_fold_models=False,
+                           oof_dir=oof_dir or self.oof_dir, **options)
+
+    def splits(self):
+        return list(StratifiedKFold(n_splits=3, shuffle=True, random_state=0).split(self.X, self.y))
+
+    def test_oof_reproduces_fold_scores(self):
+        """測試每個試驗的陣列涵蓋所有資料列，且可重現各 fold 的分數"""
+        search = self.make_search().fit(self.X, self.y)
+        manifest = read_manifest(self.oof_dir)
+        self.assertEqual(manifest['n_rows'], len(self.X))
+        self.assertEqual(manifest['classes'], [0, 1])
+        self.assertEqual(len(manifest['trials']), 4)
+
+        arrays = []
+        for record in search.cv_results_:
+            oof = load_oof(self.oof_dir, record['params'])
+            self.assertIsInstance(oof, np.memmap)
+            self.assertEqual(oof.shape, (len(self.X), 2))
+            self.assertFalse(np.isnan(oof).any())
+            scores = [f1_score(self.y.values[test_index], np.argmax(oof[test_index], axis=1),
+                               average='macro') for _, test_index in self.splits()]
+            np.testing.assert_allclose(scores, record['cv_scores'])
+            arrays.append(np.array(oof))
+        # 共用一次訓練的組合以各自的樹數預測
+        self.assertFalse(np.allclose(arrays[0], arrays[1]))
+
+    def test_parallel_matches_serial(self):
+        """測試平行工作者傳回的預測與循序搜尋相同"""
+        serial_dir = os.path.join(self.tmp_dir.name, 'serial')
+        self.make_search(serial_dir).fit(self.X, self.y)
+        search = self.make_search(n_jobs=2).fit(self.X, self.y)
+        self.assertEqual(len(search.cv_results_), 4)
+        for record in search.cv_results_:
+            np.testing.assert_allclose(load_oof(self.oof_dir, record['params']),
+                                       load_oof(serial_dir, record['params']), rtol=1e-6)
+
+    def test_distributed_workers(self):
+        """測試遠端工作者以 JSON 回報的預測與循序搜尋相同"""
+        from ai_utils.tuning_cluster import TuningCoordinator, start_local_workers
+        data_path = os.path.join(self.tmp_dir.name, 'train.csv')
+        make_sample_data(600).to_csv(data_path, index=False)
+        data = pd.read_csv(data_path)
+        self.X = data.drop(columns=['is_recommended'])
+        self.y = data['is_recommended']
+        serial_dir = os.path.join(self.tmp_dir.name, 'serial')
+        self.make_search(serial_dir).fit(self.X, self.y)
+        with TuningCoordinator(data_path, heartbeat_timeout=10) as coordinator:
+            workers = start_local_workers(coordinator.address, 2, n_jobs=2,
+                                          heartbeat_interval=0.5, idle_timeout=2)
+            search = self.make_search(coordinator=coordinator).fit(self.X, self.y)
+        for worker in workers:
+            worker.join(timeout=30)
+        self.assertEqual(len(search.cv_results_), 4)
+        for record in search.cv_results_:
+            np.testing.assert_allclose(load_oof(self.oof_dir, record['params']),
+                                       load_oof(serial_dir, record['params']), rtol=1e-6)
+
+    def test_resume_keeps_arrays(self):
+        """測試從試驗記錄重新執行時保留既有陣列，資料不同時清除"""
+        store_path = os.path.join(self.tmp_dir.name, 'trials.db')
+        first = self.make_search(trial_store=store_path).fit(self.X, self.y)
+        expected = np.array(load_oof(self.oof_dir, first.cv_results_[0]['params']))
+
+        second = self.make_search(trial_store=store_path).fit(self.X, self.y)
+        np.testing.assert_array_equal(load_oof(self.oof_dir, second.cv_results_[0]['params']),
+                                      expected)
+        for entry in read_manifest(self.oof_dir)['trials'].values():
+            self.assertEqual(entry['filled_rows'], len(self.X))
+
+        other = make_sample_data(600, random_state=1)
+        self.make_search(param_grid={'model__num_leaves': [4]}).fit(
+            other.drop(columns=['is_recommended']), other['is_recommended'])
+        self.assertEqual(len(read_manifest(self.oof_dir)['trials']), 1)
+        self.assertEqual(len([f for f in os.listdir(self.oof_dir) if f.endswith('.npy')]), 1)
+
+    def test_halving_rungs(self):
+        """測試逐次減半的每一輪各自保存"""
+        search = self.make_search(search_mode='halving', resource='n_samples',
+                                  min_resources=50).fit(self.X, self.y)
+        self.assertEqual(len(read_manifest(self.oof_dir)['trials']), len(search.cv_results_))
+        final = [r for r in search.cv_results_ if r['iter'] == 1][0]
+        oof = load_oof(self.oof_dir, final['params'], rung=1, n_resources=final['n_resources'])
+        self.assertFalse(np.isnan(oof).any())
+        self.assertIsNone(load_oof(self.oof_dir, final['params'], rung=5))
+
+    def test_disabled_by_default(self):
+        """測試預設不保存"""
+        search = self.make_search()
+        search.oof_dir = None
+        search.fit(self.X, self.y)
+        self.assertFalse(os.path.exists(self.oof_dir))
+        self.assertNotIn('oof_file', search.cv_results_[0])
+
+
+def run_oof_store_tests():
+    """執行 out-of-fold 預測儲存測試"""
+    return run_test_cases("超參數搜尋 out-of-fold 預測儲存單元測試", TestOOFStore)
+
+
+if __name__ == "__main__":
+    success = run_oof_store_tests()
+    if success:
+        print("\n✅ 所有 out-of-fold 預測儲存測試通過！")
+    else:
+        print("\n❌ 有 out-of-fold 預測儲存測試失敗！")
+        sys.exit(1)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+平行可停止超參數搜尋單元測試
+"""
+
+import unittest
+import sys
+import os
+
+import numpy as np
+
+# 確保能夠匯入專案模組
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from shared_fixtures import make_sample_data, make_search, run_test_cases  # noqa: E402
+
+
+class TestParallelGridSearch(unittest.TestCase):
+    """測試 StoppableGridSearchCV 的平行執行"""
+
+    def setUp(self):
+        """建立搜尋所需的資料與管線"""
+        from ai_utils import model_traning
+        self.model_traning = model_traning
+        self.model_traning.reset_stop_training_flag()
+
+        data = make_sample_data(200)
+        self.X = data.drop(columns=['is_recommended'])
+        self.y = data['is_recommended']
+        self.param_grid = {
+            'model__n_estimators': [10, 20],
+            'model__num_leaves': [4, 8],
+        }
+
+    def tearDown(self):
+        """測試後清理"""
+        self.model_traning.reset_stop_training_flag()
+
+    def make_search(self, n_jobs):
+        """建立指定工作者數量的搜尋物件"""
+        return make_search(self.param_grid, n_jobs=n_jobs)
+
+    def test_parallel_matches_serial(self):
+        """測試平行搜尋的最佳參數與結果和循序搜尋一致"""
+        serial = self.make_search(1).fit(self.X, self.y)
+        parallel = self.make_search(2).fit(self.X, self.y)
+
+        self.assertIsNotNone(serial)
+        self.assertIsNotNone(parallel)
+        self.assertEqual(parallel.best_params_, serial.best_params_)
+        self.assertAlmostEqual(parallel.best_score_, serial.best_score_)
+        self.assertEqual(parallel.completed_combinations_, 4)
+        self.assertEqual([r['params'] for r in parallel.cv_results_],
+                         [r['params'] for r in serial.cv_results_])
+        for parallel_result, serial_result in zip(parallel.cv_results_, serial.cv_results_):
+            np.testing.assert_allclose(parallel_result['cv_scores'],
+                                       serial_result['cv_scores'])
+
+    def test_best_estimator_has_best_params(self):
+        """測試最佳估計器為最佳參數各 fold 模型的集成，可直接預測"""
+        search = self.make_search(2).fit(self.X, self.y)
+        self.assertEqual(search.best_estimator_.params, search.best_params_)
+        self.assertEqual(len(search.best_estimator_.estimators), 3)
+        self.assertEqual(len(search.best_estimator_.predict(self.X)), len(self.X))
+
+    def test_stopped_before_start(self):
+        """測試搜尋前已設定停止標誌時回傳 None"""
+        self.model_traning.set_stop_training_flag(True)
+        self.assertIsNone(self.make_search(1).fit(self.X, self.y))
+        self.assertIsNone(self.make_search(2).fit(self.X, self.y))
+
+
+def run_parallel_grid_search_tests():
+    """執行平行超參數搜尋測試"""
+    return run_test_cases("平行超參數搜尋單元測試", TestParallelGridSearch)
+
+
+if __name__ == "__main__":
+    success = run_parallel_grid_search_tests()
+    if success:
+        print("\n✅ 所有平行超參數搜尋測試通過！")
+    else:
+        print("\n❌ 有平行超參數搜尋測試失敗！")
+        sys.exit(1)
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DataPreprocess 連續矩陣輸出模式單元測試
+"""
+
+import unittest
+import sys
+import os
+import pickle
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# 確保能夠匯入專案模組
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from shared_fixtures import run_test_cases  # noqa: E402
+
+
+def make_sample_data(n_rows=300, random_state=0):
+    """建立包含數值、類別、布林與空值的模擬資料"""
+    rng = np.random.RandomState(random_state)
+    data = pd.DataFrame({
+        'price_usd': rng.uniform(5, 100, n_rows),
+        'child_count': rng.randint(0, 5, n_rows),
+        'online_only': rng.randint(0, 2, n_rows),
+        'limited_edition': rng.rand(n_rows) < 0.3,
+        'skin_type': rng.choice(['dry', 'oily', 'normal'], n_rows).astype(object),
+    })
+    data.loc[::17, 'price_usd'] = np.nan
+    data.loc[::13, 'skin_type'] = np.nan
+    y = ((data['price_usd'].fillna(50) < 50) ^ (rng.rand(n_rows) < 0.2)).astype(int)
+    return data, y
+
+
+class TestPreprocessArrayOutput(unittest.TestCase):
+    """測試 DataPreprocess 的 array 輸出模式"""
+
+    def setUp(self):
+        from ai_utils import model_traning
+        self.model_traning = model_traning
+        self.X, self.y = make_sample_data()
+
+    def test_array_matches_pandas(self):
+        """測試兩種輸出模式的數值一致"""
+        pandas_pre = self.model_traning.DataPreprocess(output='pandas').fit(self.X)
+        array_pre = self.model_traning.DataPreprocess(output='array').fit(self.X)
+
+        expected = pandas_pre.transform(self.X)
+        result = array_pre.transform(self.X)
+
+        self.assertIsInstance(result, np.ndarray)
+        self.assertEqual(result.dtype, np.float32)
+        self.assertTrue(result.flags['C_CONTIGUOUS'])
+        self.assertEqual(list(array_pre.get_feature_names_out()), list(expected.columns))
+        np.testing.assert_allclose(result, expected.to_numpy(dtype=np.float64), rtol=1e-6)
+
+    def test_fit_keeps_output_param(self):
+        """測試重新 fit 與 clone 後仍保留輸出模式"""
+        from sklearn.base import clone
+        pre = self.model_traning.DataPreprocess(output='array')
+        pre.fit(self.X).fit(self.X)
+        self.assertEqual(pre.output, 'array')
+        self.assertEqual(clone(pre).output, 'array')
+
+    def test_transform_does_not_modify_input(self):
+        """測試 array 模式不修改原本的資料"""
+        before = self.X.copy()
+        self.model_traning.DataPreprocess(output='array').fit_transform(self.X)
+        pd.testing.assert_frame_equal(self.X, before)
+
+    def test_single_record_dict(self):
+        """測試單筆 dict 輸入"""
+        pre = self.model_traning.DataPreprocess(output='array').fit(self.X)
+        record = {'price_usd': 20.0, 'skin_type': 'oily'}
+        result = pre.transform(record)
+        self.assertEqual(result.shape, (1, len(pre.final_field_names)))
+
+    def test_old_model_without_output_attribute(self):
+        """測試舊版本（沒有 output 屬性）的預處理器仍以 DataFrame 輸出"""
+        pre = self.model_traning.DataPreprocess().fit(self.X)
+        del pre.__dict__['output']
+        restored = pickle.loads(pickle.dumps(pre))
+        self.assertIsInstance(restored.transform(self.X), pd.DataFrame)
+
+    def test_categorical_threshold_param(self):
+        """測試 categorical_threshold 參數取代全域閾值，決定整數欄位的尺度轉換"""
+        from sklearn.preprocessing import MinMaxScaler, RobustScaler
+        default = self.model_traning.DataPreprocess().fit(self.X)
+        self.assertIsInstance(default.scaler['child_count'], MinMaxScaler)
+        low = self.model_traning.DataPreprocess(categorical_threshold=3).fit(self.X)
+        self.assertIsInstance(low.scaler['child_count'], RobustScaler)
+        self.assertEqual(low.fit(self.X).categorical_threshold, 3)
+
+    def test_ordinal_encoding(self):
+        """測試排名編碼：兩種輸出模式一致、每個字串欄位一欄、未見過的值為 NaN"""
+        pandas_pre = self.model_traning.DataPreprocess(output='pandas', encoding='ordinal')
+        array_pre = self.model_traning.DataPreprocess(output='array', encoding='ordinal')
+        expected = pandas_pre.fit(self.X).transform(self.X)
+        result = array_pre.fit(self.X).transform(self.X)
+        self.assertEqual(list(array_pre.get_feature_names_out()), list(self.X.columns))
+        np.testing.assert_allclose(result, expected.to_numpy(dtype=np.float64), rtol=1e-6)
+        self.assertEqual(set(result[:, list(self.X.columns).index('skin_type')]), {0, 1, 2})
+
+        new = self.X.head(2).copy()
+        new['skin_type'] = ['combination', 'oily']
+        codes = array_pre.transform(new)[:, list(self.X.columns).index('skin_type')]
+        self.assertTrue(np.isnan(codes[0]))
+        self.assertEqual(array_pre.extend_vocabulary(new), [])
+        self.assertEqual(array_pre.transform(new)[0, list(self.X.columns).index('skin_type')], 3)
+
+        with self.assertRaises(ValueError):
+            self.model_traning.DataPreprocess(encoding='hashing').fit(self.X)
+
+    def test_old_model_without_encoding_params(self):
+        """測試舊版本（沒有 categorical_threshold / encoding）的預處理器載入後維持獨熱編碼"""
+        pre = self.model_traning.DataPreprocess(output='array').fit(self.X)
+        expected = pre.transform(self.X)
+        del pre.__dict__['categorical_threshold'], pre.__dict__['encoding']
+        restored = pickle.loads(pickle.dumps(pre))
+        self.assertEqual(restored.get_params()['encoding'], 'onehot')
+        np.testing.assert_array_equal(restored.transform(self.X), expected)
+
+    def test_pipeline_array_handoff_opt_in(self):
+        """測試預設管線以 DataFrame 交給 LightGBM，矩陣輸出需自行選用，並可量測兩種模式耗時"""
+        self.assertEqual(self.model_traning.PREPROCESS_OUTPUT, 'pandas')
+        default = self.model_traning.create_model_pipeline(n_estimators=5)
+        self.assertEqual(default.named_steps['DataPreprocess'].output, 'pandas')
+
+        pipe = self.model_traning.create_model_pipeline(n_estimators=20, output='array')
+        self.assertEqual(pipe.named_steps['DataPreprocess'].output, 'array')
+        pipe.fit(self.X, self.y)
+        proba = pipe.predict_proba(self.X)
+        self.assertEqual(proba.shape, (len(self.X), 2))
+
+        timings = self.model_traning.measure_preprocess_handoff(pipe, self.X, repeats=1)
+        self.assertEqual(set(timings), {'pandas', 'array'})
+
+    def test_default_pipeline_has_no_feature_name_warning(self):
+        """測試預設管線直接預測時不會發出欄位名稱警告"""
+        pipe = self.model_traning.create_model_pipeline(n_estimators=5).fit(self.X, self.y)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            pipe.predict_proba(self.X)
+        self.assertFalse([w for w in caught if 'valid feature names' in str(w.message)])
+
+
+def run_preprocess_array_output_tests():
+    """執行 DataPreprocess 矩陣輸出測試"""
+    return run_test_cases("DataPreprocess 矩陣輸出單元測試", TestPreprocessArrayOutput)
+
+
+if __name__ == "__main__":
+    success = run_preprocess_array_output_tests()
+    if success:
+        print("\n✅ 所有 DataPreprocess 矩陣輸出測試通過！")
+    else:
+        print("\n❌ 有 DataPreprocess 矩陣輸出測試失敗！")
+        sys.exit(1)
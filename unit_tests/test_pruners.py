@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+超參數搜尋剪枝器單元測試
+"""
+
+import unittest
+import sys
+import os
+
+# 確保能夠匯入專案模組
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from ai_utils.pruners import BoundPruner, MedianPruner, get_pruner  # noqa: E402
+from shared_fixtures import make_sample_data, make_search, run_test_cases  # noqa: E402
+
+
+class TestPrunerRules(unittest.TestCase):
+    """測試剪枝規則"""
+
+    COMPLETED = [[0.80, 0.82, 0.81], [0.70, 0.72, 0.71], [0.60, 0.62, 0.61]]
+
+    def test_median_pruner(self):
+        """測試低於中位數時剪枝"""
+        pruner = MedianPruner(n_warmup_folds=1, n_startup_candidates=3)
+        self.assertTrue(pruner.should_prune([0.65], 3, self.COMPLETED))
+        self.assertFalse(pruner.should_prune([0.75], 3, self.COMPLETED))
+        self.assertFalse(pruner.should_prune([0.65], 3, self.COMPLETED[:2]),
+                         "已完成組合不足時不剪枝")
+        self.assertFalse(pruner.should_prune([], 3, self.COMPLETED), "暖身 fold 前不剪枝")
+        self.assertFalse(pruner.should_prune([0.1, 0.1, 0.1], 3, self.COMPLETED),
+                         "已完成所有 fold 時不剪枝")
+
+    def test_bound_pruner(self):
+        """測試樂觀上界低於最佳平均時才剪枝"""
+        pruner = BoundPruner()
+        # 最佳平均 0.81，最高 fold 分數 0.82：(0.70 + 2*0.82)/3 = 0.78 < 0.81
+        self.assertTrue(pruner.should_prune([0.70], 3, self.COMPLETED))
+        # (0.80 + 2*0.82)/3 = 0.813 不低於最佳平均
+        self.assertFalse(pruner.should_prune([0.80], 3, self.COMPLETED))
+        # 指定分數上限 1.0 時更保守
+        self.assertFalse(BoundPruner(max_fold_score=1.0).should_prune(
+            [0.70], 3, self.COMPLETED))
+
+    def test_get_pruner(self):
+        """測試依名稱建立剪枝器"""
+        self.assertIsNone(get_pruner(None))
+        self.assertIsInstance(get_pruner('median'), MedianPruner)
+        self.assertIsInstance(get_pruner('bound'), BoundPruner)
+        pruner = BoundPruner(n_warmup_folds=2)
+        self.assertIs(get_pruner(pruner), pruner)
+        with self.assertRaises(ValueError):
+            get_pruner('random')
+
+
+class TestSearchPruning(unittest.TestCase):
+    """測試 StoppableGridSearchCV 的剪枝"""
+
+    def setUp(self):
+        """建立搜尋所需的資料與網格"""
+        from ai_utils import model_traning
+        self.model_traning = model_traning
+        self.model_traning.reset_stop_training_flag()
+
+        data = make_sample_data(400)
+        self.X = data.drop(columns=['is_recommended'])
+        self.y = data['is_recommended']
+        # 第一個組合表現最好，之後學習率極低的組合明顯較差
+        self.param_grid = {
+            'model__learning_rate': [0.1, 0.0001, 0.0002, 0.0003],
+            'model__num_leaves': [4, 8],
+        }
+
+    def tearDown(self):
+        """測試後清理"""
+        self.model_traning.reset_stop_training_flag()
+
+    def make_search(self, pruner, n_jobs=1):
+        """建立使用剪枝器的搜尋物件"""
+        return make_search(self.param_grid, n_jobs=n_jobs, n_estimators=20, n_splits=5,
+                           pruner=pruner)
+
+    def check_pruned_results(self, search):
+        """檢查被剪枝組合的記錄"""
+        pruned = [r for r in search.cv_results_ if r['pruned']]
+        self.assertGreater(len(pruned), 0)
+        self.assertEqual(search.pruned_combinations_, len(pruned))
+        self.assertEqual(len(search.cv_results_), 8, "被剪枝的組合仍會記錄")
+        for result in pruned:
+            self.assertLess(len(result['cv_scores']), 5)
+        for result in search.cv_results_:
+            if not result['pruned']:
+                self.assertEqual(len(result['cv_scores']), 5)
+
+    def test_pruning_keeps_winner(self):
+        """測試剪枝後最佳參數與完整搜尋相同"""
+        full = self.make_search(None).fit(self.X, self.y)
+        self.assertEqual(full.pruned_combinations_, 0)
+        self.assertFalse(any(r['pruned'] for r in full.cv_results_))
+
+        for pruner in ('median', 'bound'):
+            search = self.make_search(pruner).fit(self.X, self.y)
+            self.assertEqual(search.best_params_, full.best_params_)
+            self.assertAlmostEqual(search.best_score_, full.best_score_)
+            self.check_pruned_results(search)
+
+    def test_parallel_pruning(self):
+        """測試平行搜尋的剪枝"""
+        full = self.make_search(None).fit(self.X, self.y)
+        search = self.make_search('bound', n_jobs=2).fit(self.X, self.y)
+        self.assertEqual(search.best_params_, full.best_params_)
+        self.assertEqual(len(search.cv_results_), 8)
+        for result in search.cv_results_:
+            if not result['pruned']:
+                self.assertEqual(len(result['cv_scores']), 5)
+
+
+def run_pruners_tests():
+    """執行剪枝器測試"""
+    return run_test_cases("超參數搜尋剪枝器單元測試", TestPrunerRules, TestSearchPruning)
+
+
+if __name__ == "__main__":
+    success = run_pruners_tests()
+    if success:
+        print("\n✅ 所有剪枝器測試通過！")
+    else:
+        print("\n❌ 有剪枝器測試失敗！")
+        sys.exit(1)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+最終模型重新訓練策略 (refit_policy) 單元測試
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+import threading
+from unittest import mock
+
+import numpy as np
+from threadpoolctl import threadpool_info
+
+# 確保能夠匯入專案模組
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from shared_fixtures import make_sample_data, run_test_cases  # noqa: E402
+
+
+class TestRefitPolicy(unittest.TestCase):
+    """測試 train_model 的重新訓練策略"""
+
+    def setUp(self):
+        """建立測試資料"""
+        from ai_utils import model_traning
+        self.model_traning = model_traning
+        self.model_traning.reset_stop_training_flag()
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_path = os.path.join(self.tmp_dir.name, 'train.csv')
+        self.output_path = os.path.join(self.tmp_dir.name, 'model.bin')
+        make_sample_data().to_csv(self.data_path, index=False)
+
+    def tearDown(self):
+        """測試後清理"""
+        self.model_traning.reset_stop_training_flag()
+        self.tmp_dir.cleanup()
+
+    def _train(self, refit_policy, n_estimators=30):
+        return self.model_traning.train_model(
+            data_path=self.data_path, output_path=self.output_path,
+            show_plots=False, target_column='is_recommended',
+            n_estimators=n_estimators, n_repeats=1, refit_policy=refit_policy)
+
+    def _saved_pipeline(self):
+        return self.model_traning.load_model_with_info(self.output_path)['pipeline']
+
+    def test_default_policy_is_full(self):
+        """測試預設策略維持用全部資料重新訓練"""
+        self.assertEqual(self.model_traning.REFIT_POLICY, 'full')
+        results = self._train(None)
+        self.assertEqual(results['refit_policy'], 'full')
+        self.assertEqual(self._saved_pipeline().named_steps['model'].booster_.num_trees(), 30)
+
+    def test_none_policy_saves_split_model(self):
+        """測試 'none' 直接儲存訓練組模型"""
+        results = self._train('none')
+        self.assertIsNotNone(results)
+        saved = self._saved_pipeline()
+        data = make_sample_data()
+        X = data.drop(columns=['is_recommended'])
+        np.testing.assert_allclose(saved.predict_proba(X), results['model'].predict_proba(X))
+
+    def test_background_policy_matches_full_refit(self):
+        """測試背景重新訓練的最終模型與一般全部資料重新訓練一致"""
+        full_results = self._train('full')
+        background_results = self._train('background')
+        self.assertIsNotNone(background_results)
+        self.assertEqual(len(background_results['feature_importance']),
+                         len(full_results['feature_importance']))
+
+        data = make_sample_data()
+        X = data.drop(columns=['is_recommended'])
+        np.testing.assert_allclose(background_results['model'].predict_proba(X),
+                                   full_results['model'].predict_proba(X))
+
+    def test_background_policy_thread_limits(self):
+        """測試背景重新訓練只由主執行緒設定原生執行緒上限，結束後還原原本的設定"""
+        from ai_utils.thread_budget import ThreadBudget
+        original_limit = ThreadBudget.limit
+        limit_threads = []
+
+        def recording_limit(budget, n_threads=None):
+            limit_threads.append(threading.current_thread() is threading.main_thread())
+            return original_limit(budget, n_threads)
+
+        before = [(info['internal_api'], info['num_threads']) for info in threadpool_info()]
+        with mock.patch.object(ThreadBudget, 'limit', recording_limit):
+            results = self.model_traning.train_model(
+                data_path=self.data_path, output_path=self.output_path,
+                show_plots=False, target_column='is_recommended', n_estimators=30,
+                n_repeats=1, refit_policy='background')
+        self.assertIsNotNone(results)
+        self.assertTrue(limit_threads)
+        self.assertTrue(all(limit_threads), "背景工作者不應自行設定原生執行緒上限")
+        after = [(info['internal_api'], info['num_threads']) for info in threadpool_info()]
+        self.assertEqual(after, before)
+
+    def test_iterations_from_split_policy(self):
+        """測試以早停樹數量重新訓練"""
+        self.model_traning.EARLY_STOPPING_ROUNDS = 5
+        try:
+            results = self._train('iterations_from_split', n_estimators=300)
+        finally:
+            self.model_traning.EARLY_STOPPING_ROUNDS = 50
+        self.assertIsNotNone(results)
+        n_trees = results['model'].named_steps['model'].booster_.num_trees()
+        self.assertLess(n_trees, 300)
+        self.assertEqual(results['model'].named_steps['model'].n_estimators, n_trees)
+
+    def test_invalid_policy(self):
+        """測試無效的策略名稱"""
+        self.assertIsNone(self._train('sometimes'))
+
+
+def run_refit_policy_tests():
+    """執行重新訓練策略測試"""
+    return run_test_cases("重新訓練策略單元測試", TestRefitPolicy)
+
+
+if __name__ == "__main__":
+    success = run_refit_policy_tests()
+    if success:
+        print("\n✅ 所有重新訓練策略測試通過！")
+    else:
+        print("\n❌ 有重新訓練策略測試失敗！")
+        sys.exit(1)
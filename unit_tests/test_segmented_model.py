@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分段模型單元測試
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+from lightgbm import LGBMClassifier
+
+# 確保能夠匯入專案模組
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from ai_utils.model_traning import DataPreprocess  # noqa: E402
+from ai_utils.segmented_model import SegmentedClassifier  # noqa: E402
+from shared_fixtures import run_test_cases  # noqa: E402
+
+
+def make_sample_data(n_rows=2000, random_state=0):
+    """建立各分類規則不同的模擬訓練資料，'Rare' 分類的資料量不足以單獨訓練"""
+    rng = np.random.RandomState(random_state)
+    data = pd.DataFrame({
+        'price_usd': rng.uniform(5, 100, n_rows),
+        'child_count': rng.randint(0, 5, n_rows),
+        'secondary_category': rng.choice(['Foundation', 'Lip', 'Eye', 'Rare'], n_rows,
+                                         p=[0.45, 0.3, 0.2, 0.05]),
+        'skin_type': rng.choice(['dry', 'oily', 'normal'], n_rows),
+    })
+    lip = data['secondary_category'] == 'Lip'
+    data['is_recommended'] = (np.where(lip, data['price_usd'] > 60, data['price_usd'] < 40) ^
+                              (rng.rand(n_rows) < 0.1)).astype(int)
+    return data
+
+
+def make_classifier(n_workers=1, min_segment_rows=200):
+    return SegmentedClassifier(
+        DataPreprocess(), LGBMClassifier(n_estimators=30, verbose=-1, random_state=0, n_jobs=2),
+        'secondary_category', min_segment_rows=min_segment_rows, n_workers=n_workers)
+
+
+class TestSegmentedClassifier(unittest.TestCase):
+    """測試分段訓練與路由"""
+
+    def setUp(self):
+        data = make_sample_data()
+        self.X = data.drop(columns='is_recommended')
+        self.y = data['is_recommended']
+
+    def test_routing_and_fallback(self):
+        """測試資料量不足、訓練時沒看過的分段與缺值都由全域模型預測"""
+        clf = make_classifier().fit(self.X, self.y)
+        self.assertEqual(list(clf.segment_models_), ['Foundation', 'Lip', 'Eye'])
+        self.assertEqual(clf.segment_rows_['Lip'], int((self.X['secondary_category'] == 'Lip').sum()))
+
+        X_new = self.X.head(4).copy()
+        X_new['secondary_category'] = ['Lip', 'Rare', 'Unknown', np.nan]
+        np.testing.assert_array_equal(clf.route(X_new), [1, -1, -1, -1])
+
+        with self.assertRaises(ValueError):
+            clf.predict(self.X.drop(columns='secondary_category'))
+
+    def test_predict_proba_matches_segment_models(self):
+        """測試預測機率等於共用前處理輸出交給各分段模型的結果"""
+        clf = make_classifier().fit(self.X, self.y)
+        proba = clf.predict_proba(self.X)
+        X_transformed = clf.preprocess_.transform(self.X).to_numpy(dtype=np.float32)
+        for segment, model in clf.segment_models_.items():
+            rows = (self.X['secondary_category'] == segment).to_numpy()
+            np.testing.assert_allclose(proba[rows], model.predict_proba(X_transformed[rows]))
+        rows = (self.X['secondary_category'] == 'Rare').to_numpy()
+        np.testing.assert_allclose(proba[rows], clf.fallback_model_.predict_proba(X_transformed[rows]))
+        np.testing.assert_array_equal(clf.predict(self.X), clf.classes_[proba.argmax(axis=1)])
+
+    def test_parallel_matches_serial(self):
+        """測試平行訓練與逐一訓練的結果相同"""
+        serial = make_classifier(n_workers=1).fit(self.X, self.y)
+        parallel = make_classifier(n_workers=4).fit(self.X, self.y)
+        np.testing.assert_allclose(serial.predict_proba(self.X), parallel.predict_proba(self.X))
+
+    def test_single_class_segment_uses_fallback(self):
+        """測試只有一個類別的分段不單獨訓練"""
+        y = self.y.copy()
+        y[self.X['secondary_category'] == 'Eye'] = 1
+        clf = make_classifier().fit(self.X, y)
+        self.assertNotIn('Eye', clf.segment_models_)
+        self.assertEqual(clf.predict_proba(self.X).shape, (len(self.X), 2))
+
+
+class TestTrainingSegments(unittest.TestCase):
+    """測試 train_model 的分段選項"""
+
+    def setUp(self):
+        from ai_utils import model_traning
+        self.model_traning = model_traning
+        self.model_traning.reset_stop_training_flag()
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_path = os.path.join(self.tmp_dir.name, 'train.csv')
+        self.output_path = os.path.join(self.tmp_dir.name, 'model.bin')
+        make_sample_data().to_csv(self.data_path, index=False)
+
+    def tearDown(self):
+        self.model_traning.reset_stop_training_flag()
+        self.tmp_dir.cleanup()
+
+    def _train(self, **options):
+        return self.model_traning.train_model(
+            data_path=self.data_path, output_path=self.output_path,
+            show_plots=False, target_column='is_recommended',
+            n_estimators=30, learning_rate=0.1, n_repeats=1, **options)
+
+    def test_train_model_saves_segments(self):
+        """測試 train_model 儲存分段模型與各分段的驗證指標，載入後可直接預測"""
+        results = self._train(segment_column='secondary_category')
+        segments = results['segments']
+        self.assertEqual(segments['column'], 'secondary_category')
+        self.assertEqual(set(segments['segment_rows']), {'Foundation', 'Lip', 'Eye'})
+        self.assertIn(None, segments['valid_metrics'])
+        self.assertEqual(sum(m['rows'] for m in segments['valid_metrics'].values()), 400)
+
+        model_info = self.model_traning.load_model_with_info(self.output_path)
+        self.assertIsInstance(model_info['pipeline'], SegmentedClassifier)
+        self.assertEqual(model_info['segments'], segments)
+        X = make_sample_data()[model_info['feature_columns']]
+        predictions, _ = self.model_traning.predict_with_info(model_info, X)
+        self.assertEqual(len(predictions), len(X))
+
+        # 分段模型無法繼續提升
+        self.assertIsNone(self.model_traning.update_model(
+            self.output_path, self.data_path, extra_trees=10))
+
+    def test_invalid_options(self):
+        """測試不存在的分段欄位與不相容的選項被拒絕"""
+        self.assertIsNone(self._train(segment_column='not_a_column'))
+        self.assertIsNone(self._train(segment_column='secondary_category', compaction_epsilon=0.01))
+
+
+def run_segmented_model_tests():
+    """執行分段模型測試"""
+    return run_test_cases("分段模型單元測試", TestSegmentedClassifier, TestTrainingSegments)
+
+
+if __name__ == "__main__":
+    success = run_segmented_model_tests()
+    if success:
+        print("\n✅ 所有分段模型測試通過！")
+    else:
+        print("\n❌ 有分段模型測試失敗！")
+        sys.exit(1)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+樹數量軸分段預測評分單元測試
+"""
+
+import unittest
+import sys
+import os
+
+import numpy as np
+
+# 確保能夠匯入專案模組
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from shared_fixtures import make_sample_data, make_search, run_test_cases  # noqa: E402
+
+
+class TestStagedNEstimators(unittest.TestCase):
+    """測試只差在樹數量的組合共用一次訓練"""
+
+    def setUp(self):
+        """建立搜尋所需的資料與網格"""
+        from ai_utils import model_traning
+        self.model_traning = model_traning
+        self.model_traning.reset_stop_training_flag()
+
+        data = make_sample_data()
+        self.X = data.drop(columns=['is_recommended'])
+        self.y = data['is_recommended']
+        self.param_grid = {
+            'model__n_estimators': [10, 20, 30],
+            'model__num_leaves': [4, 8],
+        }
+
+    def tearDown(self):
+        """測試後清理"""
+        self.model_traning.reset_stop_training_flag()
+
+    def make_search(self, staged, scoring='f1_macro', n_jobs=1):
+        """建立網格搜尋物件"""
+        return make_search(self.param_grid, n_jobs=n_jobs, scoring=scoring,
+                           staged_n_estimators=staged)
+
+    def test_group_candidates(self):
+        """測試依樹數量以外的參數分組"""
+        from sklearn.model_selection import ParameterGrid
+        search = self.make_search(staged=True)
+        candidates = [(i, p, p) for i, p in enumerate(ParameterGrid(self.param_grid))]
+        groups = search._group_candidates(candidates)
+
+        self.assertEqual(len(groups), 2)
+        for members, fit_params, n_iterations in groups:
+            self.assertEqual(len(members), 3)
+            self.assertEqual(fit_params['model__n_estimators'], 30)
+            self.assertEqual(n_iterations, [10, 20, 30])
+
+        unstaged = self.make_search(staged=False)._group_candidates(candidates)
+        self.assertEqual(len(unstaged), 6)
+        self.assertTrue(all(n is None for _, _, n in unstaged))
+
+    def test_scores_match_separate_fits(self):
+        """測試分段預測的分數與分別訓練完全相同"""
+        for scoring in ('f1_macro', 'roc_auc'):
+            staged = self.make_search(True, scoring).fit(self.X, self.y)
+            separate = self.make_search(False, scoring).fit(self.X, self.y)
+
+            self.assertEqual(staged.best_params_, separate.best_params_)
+            self.assertEqual([r['params'] for r in staged.cv_results_],
+                             [r['params'] for r in separate.cv_results_])
+            for staged_result, separate_result in zip(staged.cv_results_,
+                                                      separate.cv_results_):
+                np.testing.assert_allclose(staged_result['cv_scores'],
+                                           separate_result['cv_scores'])
+
+    def test_parallel_staged(self):
+        """測試平行搜尋也使用分段預測且結果一致"""
+        serial = self.make_search(True).fit(self.X, self.y)
+        parallel = self.make_search(True, n_jobs=2).fit(self.X, self.y)
+        self.assertEqual(parallel.best_params_, serial.best_params_)
+        for parallel_result, serial_result in zip(parallel.cv_results_, serial.cv_results_):
+            np.testing.assert_allclose(parallel_result['cv_scores'],
+                                       serial_result['cv_scores'])
+
+
+def run_staged_n_estimators_tests():
+    """執行樹數量分段預測測試"""
+    return run_test_cases("樹數量分段預測評分單元測試", TestStagedNEstimators)
+
+
+if __name__ == "__main__":
+    success = run_staged_n_estimators_tests()
+    if success:
+        print("\n✅ 所有樹數量分段預測測試通過！")
+    else:
+        print("\n❌ 有樹數量分段預測測試失敗！")
+        sys.exit(1)
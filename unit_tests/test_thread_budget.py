@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CPU 執行緒預算管理器單元測試
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+from unittest.mock import patch
+
+# 確保能夠匯入專案模組
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from ai_utils.thread_budget import ThreadBudget, resolve_n_jobs  # noqa: E402
+from shared_fixtures import make_sample_data, run_test_cases  # noqa: E402
+
+
+class TestThreadBudget(unittest.TestCase):
+    """測試執行緒預算分配"""
+
+    def test_resolve_n_jobs(self):
+        """測試 n_jobs 轉換為實際核心數"""
+        with patch('ai_utils.thread_budget.os.cpu_count', return_value=8):
+            self.assertEqual(resolve_n_jobs(-1), 8)
+            self.assertEqual(resolve_n_jobs(-2), 7)
+            self.assertEqual(resolve_n_jobs(4), 4)
+            self.assertEqual(resolve_n_jobs(32), 8, "不應超過實際核心數")
+            self.assertEqual(resolve_n_jobs(-20), 1, "至少保留一個核心")
+            self.assertEqual(resolve_n_jobs(None), 8)
+
+    def test_split_budget(self):
+        """測試外層與內層執行緒的分配不超過預算"""
+        with patch('ai_utils.thread_budget.os.cpu_count', return_value=8):
+            budget = ThreadBudget(-1)
+            self.assertEqual(budget.split(1), (1, 8))
+            self.assertEqual(budget.split(4), (4, 2))
+            self.assertEqual(budget.split(3), (3, 2))
+            self.assertEqual(budget.split(16), (8, 1))
+            for n_outer in range(1, 20):
+                outer, inner = budget.split(n_outer)
+                self.assertLessEqual(outer * inner, budget.total_threads)
+
+    def test_apply_to_pipeline(self):
+        """測試設定管線中模型的執行緒數"""
+        from ai_utils import model_traning
+        pipe = model_traning.create_model_pipeline()
+        ThreadBudget.apply_to_estimator(pipe, 3)
+        self.assertEqual(pipe.named_steps['model'].n_jobs, 3)
+
+    def test_limit_context(self):
+        """測試原生執行緒池限制可以正常進入與離開"""
+        budget = ThreadBudget(1)
+        with budget.limit() as n_threads:
+            self.assertEqual(n_threads, 1)
+
+    def test_train_model_uses_budget(self):
+        """測試 train_model 依預算設定模型執行緒並正常完成"""
+        from ai_utils import model_traning
+        model_traning.reset_stop_training_flag()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_path = os.path.join(tmp_dir, 'train.csv')
+            output_path = os.path.join(tmp_dir, 'model.bin')
+            make_sample_data(200).to_csv(data_path, index=False)
+
+            results = model_traning.train_model(
+                data_path=data_path, output_path=output_path,
+                show_plots=False, target_column='is_recommended',
+                n_estimators=20, n_repeats=1)
+
+            self.assertIsNotNone(results)
+            expected = model_traning.get_thread_budget().total_threads
+            self.assertEqual(results['model'].named_steps['model'].n_jobs, expected)
+
+            model_info = model_traning.load_model_with_info(output_path)
+            self.assertEqual(
+                model_info['pipeline'].named_steps['model'].n_jobs, expected)
+
+
+def run_thread_budget_tests():
+    """執行執行緒預算測試"""
+    return run_test_cases("CPU 執行緒預算單元測試", TestThreadBudget)
+
+
+if __name__ == "__main__":
+    success = run_thread_budget_tests()
+    if success:
+        print("\n✅ 所有執行緒預算測試通過！")
+    else:
+        print("\n❌ 有執行緒預算測試失敗！")
+        sys.exit(1)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+決策門檻最佳化單元測試
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+
+import numpy as np
+from sklearn.metrics import balanced_accuracy_score, f1_score
+
+# 確保能夠匯入專案模組
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from ai_utils.threshold_optimizer import (  # noqa: E402
+    apply_threshold, optimize_threshold, threshold_curve
+)
+from shared_fixtures import make_sample_data, run_test_cases  # noqa: E402
+
+
+def make_imbalanced_data():
+    """建立類別不平衡的模擬訓練資料"""
+    return make_sample_data(1200, noise=0.15, price_cutoff=25)
+
+
+class TestThresholdOptimizer(unittest.TestCase):
+    """測試門檻掃描與最佳化"""
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.y = (rng.rand(500) < 0.3).astype(int)
+        # 分數有重複值，檢查同分的列一起切換
+        self.scores = np.round(np.clip(self.y * 0.25 + rng.rand(500) * 0.7, 0, 1), 2)
+        self.proba = np.column_stack((1 - self.scores, self.scores))
+
+    def test_curve_matches_sklearn(self):
+        """測試每個門檻的分數與 sklearn 以同一門檻預測的結果相同"""
+        for metric, scorer in (('f1_macro', lambda y, p: f1_score(y, p, average='macro')),
+                               ('balanced_accuracy', balanced_accuracy_score)):
+            thresholds, values = threshold_curve(self.y == 1, self.scores, metric)
+            self.assertEqual(len(thresholds), len(np.unique(self.scores)))
+            self.assertTrue(np.all(np.diff(thresholds) < 0))
+            for threshold, value in zip(thresholds, values):
+                y_pred = (self.scores >= threshold).astype(int)
+                self.assertAlmostEqual(value, scorer(self.y, y_pred), places=10)
+
+    def test_optimize_threshold(self):
+        """測試最佳門檻不低於預設門檻，且套用門檻可重現分數"""
+        classes = np.array([0, 1])
+        for metric in ('f1_macro', 'balanced_accuracy'):
+            result = optimize_threshold(self.y, self.proba, classes, metric)
+            thresholds, values = threshold_curve(self.y == 1, self.scores, metric)
+            self.assertAlmostEqual(result['score'], values.max())
+            self.assertGreaterEqual(result['score'], result['default_score'])
+            y_pred = apply_threshold(self.proba, classes, result['threshold'])
+            score = (f1_score(self.y, y_pred, average='macro') if metric == 'f1_macro'
+                     else balanced_accuracy_score(self.y, y_pred))
+            self.assertAlmostEqual(score, result['score'])
+            self.assertEqual(result['n_rows'], len(self.y))
+
+    def test_skips_missing_rows_and_string_labels(self):
+        """測試略過 NaN 列（out-of-fold 陣列中沒有預測的列），並支援非 0/1 的類別"""
+        classes = np.array(['no', 'yes'])
+        y = classes[self.y]
+        proba = self.proba.copy()
+        proba[:100] = np.nan
+        result = optimize_threshold(y, proba, classes)
+        expected = optimize_threshold(self.y[100:], self.proba[100:], [0, 1])
+        self.assertEqual(result['threshold'], expected['threshold'])
+        self.assertEqual(result['n_rows'], 400)
+        self.assertEqual(set(apply_threshold(self.proba, classes, 0.5)), {'no', 'yes'})
+
+    def test_invalid_inputs(self):
+        """測試不支援的指標與多類別"""
+        with self.assertRaises(ValueError):
+            optimize_threshold(self.y, self.proba, [0, 1], 'roc_auc')
+        with self.assertRaises(ValueError):
+            optimize_threshold(self.y, np.full((500, 3), 1 / 3), [0, 1, 2])
+
+
+class TestTrainingThreshold(unittest.TestCase):
+    """測試訓練與超參數搜尋儲存決策門檻"""
+
+    def setUp(self):
+        from ai_utils import model_traning
+        self.model_traning = model_traning
+        self.model_traning.reset_stop_training_flag()
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_path = os.path.join(self.tmp_dir.name, 'train.csv')
+        self.output_path = os.path.join(self.tmp_dir.name, 'model.bin')
+        make_imbalanced_data().to_csv(self.data_path, index=False)
+
+    def tearDown(self):
+        self.model_traning.reset_stop_training_flag()
+        self.tmp_dir.cleanup()
+
+    def _train(self, **options):
+        return self.model_traning.train_model(
+            data_path=self.data_path, output_path=self.output_path,
+            show_plots=False, target_column='is_recommended',
+            n_estimators=50, learning_rate=0.1, n_repeats=1, **options)
+
+    def test_train_model_saves_threshold(self):
+        """測試 train_model 儲存門檻，預測函式套用門檻"""
+        results = self._train(threshold_metric='balanced_accuracy')
+        threshold = results['decision_threshold']
+        self.assertEqual(threshold['metric'], 'balanced_accuracy')
+        self.assertEqual(threshold['source'], '驗證組')
+        self.assertGreaterEqual(threshold['score'], threshold['default_score'])
+
+        model_info = self.model_traning.load_model_with_info(self.output_path)
+        self.assertEqual(model_info['decision_threshold'], threshold)
+        X = make_imbalanced_data()[model_info['feature_columns']]
+        predictions, probabilities = self.model_traning.predict_with_info(model_info, X)
+        np.testing.assert_array_equal(
+            predictions, (probabilities[:, 1] >= threshold['threshold']).astype(int))
+
+    def test_disabled_by_default(self):
+        """測試預設不最佳化門檻，預測與模型 predict 相同；不支援的指標被拒絕"""
+        self.assertIsNone(self.model_traning.DECISION_THRESHOLD_METRIC)
+        results = self._train()
+        self.assertIsNone(results['decision_threshold'])
+        model_info = self.model_traning.load_model_with_info(self.output_path)
+        self.assertNotIn('decision_threshold', model_info)
+        X = make_imbalanced_data()[model_info['feature_columns']]
+        predictions, _ = self.model_traning.predict_with_info(model_info, X)
+        np.testing.assert_array_equal(predictions, model_info['pipeline'].predict(X))
+        self.assertIsNone(self._train(threshold_metric='roc_auc'))
+
+    def test_tuning_uses_out_of_fold(self):
+        """測試超參數搜尋以最佳組合的 out-of-fold 機率最佳化門檻並存入集成模型檔"""
+        oof_dir = os.path.join(self.tmp_dir.name, 'oof')
+        results = self.model_traning.hyperparameter_tuning(
+            data_path=self.data_path, target_column='is_recommended', cv_folds=3,
+            param_grid={'model__n_estimators': [20, 40], 'model__num_leaves': [4]},
+            search_mode='grid', trial_store_path='', output_path=self.output_path,
+            oof_dir=oof_dir, threshold_metric='f1_macro')
+        threshold = results['decision_threshold']
+        self.assertEqual(threshold['source'], 'out-of-fold')
+        self.assertEqual(threshold['n_rows'], int(len(make_imbalanced_data()) * 0.8))
+        model_info = self.model_traning.load_model_with_info(self.output_path)
+        self.assertEqual(model_info['decision_threshold'], threshold)
+
+
+def run_threshold_optimizer_tests():
+    """執行決策門檻最佳化測試"""
+    return run_test_cases("決策門檻最佳化單元測試", TestThresholdOptimizer, TestTrainingThreshold)
+
+
+if __name__ == "__main__":
+    success = run_threshold_optimizer_tests()
+    if success:
+        print("\n✅ 所有決策門檻最佳化測試通過！")
+    else:
+        print("\n❌ 有決策門檻最佳化測試失敗！")
+        sys.exit(1)
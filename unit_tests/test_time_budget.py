@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+超參數搜尋時間預算單元測試
+"""
+
+import unittest
+import sys
+import os
+import time
+
+# 確保能夠匯入專案模組
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from shared_fixtures import make_sample_data, make_search, run_test_cases  # noqa: E402
+
+
+# 便宜的組合與極昂貴的組合（學習率不同，不會與便宜組合共用訓練）
+CHEAP = {'model__n_estimators': [10], 'model__num_leaves': [4, 8]}
+EXPENSIVE = {'model__n_estimators': [200000], 'model__num_leaves': [16],
+             'model__learning_rate': [0.001], 'model__min_child_samples': [2]}
+
+
+class TestTimeBudget(unittest.TestCase):
+    """測試 StoppableGridSearchCV 的時間預算"""
+
+    def setUp(self):
+        from ai_utils import model_traning
+        self.model_traning = model_traning
+        self.model_traning.reset_stop_training_flag()
+
+        data = make_sample_data(600)
+        self.X = data.drop(columns=['is_recommended'])
+        self.y = data['is_recommended']
+
+    def tearDown(self):
+        self.model_traning.reset_stop_training_flag()
+
+    def make_search(self, param_grid, time_budget_seconds, n_jobs=1):
+        return make_search(param_grid, n_jobs=n_jobs, verbose=1,
+                           time_budget_seconds=time_budget_seconds)
+
+    def test_skips_combinations_that_do_not_fit(self):
+        """測試預估超過剩餘時間的組合被略過，其餘組合照常完成"""
+        search = self.make_search([CHEAP, EXPENSIVE, CHEAP], time_budget_seconds=20)
+        start = time.perf_counter()
+        result = search.fit(self.X, self.y)
+        self.assertLess(time.perf_counter() - start, 20)
+
+        self.assertIs(result, search)
+        self.assertEqual(search.skipped_combinations_, 1)
+        self.assertEqual(search.completed_combinations_, 4)
+        self.assertNotIn(200000, [p.get('model__n_estimators') for p in
+                                  [r['params'] for r in search.cv_results_]])
+        coverage = search.coverage_
+        self.assertEqual(coverage['total_combinations'], 5)
+        self.assertEqual(coverage['evaluated_combinations'], 4)
+        self.assertAlmostEqual(coverage['coverage'], 0.8)
+        self.assertFalse(coverage['deadline_reached'])
+        self.assertFalse(self.model_traning.is_training_stopped(), "時間預算不應設定停止標誌")
+
+    def test_deadline_interrupts_and_returns_best(self):
+        """測試到期時中斷進行中的訓練並回傳目前最佳結果"""
+        search = self.make_search([{'model__n_estimators': [10], 'model__num_leaves': [4]},
+                                   EXPENSIVE], time_budget_seconds=1.5)
+        # 不依成本略過，讓昂貴組合開始訓練，再由到期中斷
+        search._estimate_seconds = lambda *args: 0.0
+        start = time.perf_counter()
+        result = search.fit(self.X, self.y)
+        self.assertLess(time.perf_counter() - start, 10)
+
+        self.assertIs(result, search)
+        self.assertEqual(search.best_params_, {'model__n_estimators': 10, 'model__num_leaves': 4})
+        self.assertTrue(search.coverage_['deadline_reached'])
+        self.assertEqual(search.coverage_['interrupted_combinations'], 1)
+        self.assertFalse(self.model_traning.is_training_stopped())
+
+    def test_deadline_without_result(self):
+        """測試到期前沒有完成任何組合時回傳 None"""
+        search = self.make_search(EXPENSIVE, time_budget_seconds=1)
+        self.assertIsNone(search.fit(self.X, self.y))
+        self.assertEqual(search.coverage_['evaluated_combinations'], 0)
+
+    def test_parallel_deadline(self):
+        """測試平行搜尋到期時通知工作者中斷"""
+        search = self.make_search([CHEAP, EXPENSIVE], time_budget_seconds=8, n_jobs=2)
+        start = time.perf_counter()
+        search.fit(self.X, self.y)
+        self.assertLess(time.perf_counter() - start, 30)
+        self.assertTrue(search.coverage_['deadline_reached'])
+        # 工作者行程啟動時間不固定，便宜組合不一定已完成，昂貴組合一定被中斷
+        self.assertGreaterEqual(search.coverage_['interrupted_combinations'], 1)
+        self.assertNotIn(200000, [r['params'].get('model__n_estimators')
+                                  for r in search.cv_results_])
+
+
+def run_time_budget_tests():
+    """執行時間預算測試"""
+    return run_test_cases("超參數搜尋時間預算單元測試", TestTimeBudget)
+
+
+if __name__ == "__main__":
+    success = run_time_budget_tests()
+    if success:
+        print("\n✅ 所有時間預算測試通過！")
+    else:
+        print("\n❌ 有時間預算測試失敗！")
+        sys.exit(1)
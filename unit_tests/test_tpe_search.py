@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TPE 序列模型式超參數搜尋單元測試
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+
+import numpy as np
+from sklearn.model_selection import StratifiedKFold
+
+# 確保能夠匯入專案模組
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from ai_utils.tpe_sampler import TPESampler, validate_param_space  # noqa: E402
+from shared_fixtures import make_pipeline, make_sample_data, run_test_cases  # noqa: E402
+
+
+class TestTPESampler(unittest.TestCase):
+    """測試 TPE 取樣器"""
+
+    SPACE = {
+        'lr': ('log_float', 0.001, 0.1),
+        'leaves': ('int', 4, 64),
+        'alpha': ('float', 0.0, 1.0),
+    }
+
+    def test_validate_param_space(self):
+        """測試參數範圍檢查"""
+        self.assertEqual(validate_param_space(self.SPACE), self.SPACE)
+        with self.assertRaises(ValueError):
+            validate_param_space({'lr': ('uniform', 0, 1)})
+        with self.assertRaises(ValueError):
+            validate_param_space({'lr': ('float', 1, 0)})
+        with self.assertRaises(ValueError):
+            validate_param_space({'lr': ('log_float', 0, 1)})
+        with self.assertRaises(ValueError):
+            validate_param_space({})
+
+    def test_suggestions_within_space(self):
+        """測試建議的參數在範圍內且型別正確"""
+        sampler = TPESampler(self.SPACE, n_startup_trials=5, random_state=0)
+        for i in range(20):
+            params = sampler.suggest()
+            self.assertTrue(0.001 <= params['lr'] <= 0.1)
+            self.assertIsInstance(params['leaves'], int)
+            self.assertTrue(4 <= params['leaves'] <= 64)
+            self.assertTrue(0.0 <= params['alpha'] <= 1.0)
+            sampler.observe(params, -abs(params['alpha'] - 0.5))
+
+    def test_converges_towards_optimum(self):
+        """測試建模後的建議集中在高分區域"""
+        sampler = TPESampler({'x': ('float', 0.0, 1.0)}, n_startup_trials=10,
+                             random_state=1)
+        suggestions = []
+        for _ in range(60):
+            params = sampler.suggest()
+            suggestions.append(params['x'])
+            sampler.observe(params, -(params['x'] - 0.3) ** 2)
+
+        best = max(sampler.history, key=lambda item: item[1])[0]['x']
+        self.assertAlmostEqual(best, 0.3, delta=0.03)
+        late_error = np.mean(np.abs(np.array(suggestions[-20:]) - 0.3))
+        self.assertLess(late_error, 0.15, "建議值應集中在最佳值附近（均勻抽樣約 0.29）")
+
+    def test_reproducible(self):
+        """測試相同隨機種子產生相同建議"""
+        first = [TPESampler(self.SPACE, random_state=3).suggest() for _ in range(2)]
+        self.assertEqual(first[0], first[1])
+
+
+class TestTPESearch(unittest.TestCase):
+    """測試 StoppableTPESearchCV"""
+
+    def setUp(self):
+        """建立搜尋所需的資料"""
+        from ai_utils import model_traning
+        self.model_traning = model_traning
+        self.model_traning.reset_stop_training_flag()
+
+        data = make_sample_data()
+        self.X = data.drop(columns=['is_recommended'])
+        self.y = data['is_recommended']
+
+    def tearDown(self):
+        """測試後清理"""
+        self.model_traning.reset_stop_training_flag()
+
+    def make_search(self, **kwargs):
+        """建立 TPE 搜尋物件"""
+        options = dict(n_trials=6, n_startup_trials=3)
+        options.update(kwargs)
+        return self.model_traning.StoppableTPESearchCV(
+            estimator=make_pipeline(n_estimators=20),
+            param_space={'model__learning_rate': ('log_float', 0.01, 0.3),
+                         'model__num_leaves': ('int', 4, 32)},
+            scoring='f1_macro',
+            cv=StratifiedKFold(n_splits=3, shuffle=True, random_state=0),
+            **options)
+
+    def test_search_trials(self):
+        """測試完成指定次數的試驗並記錄最佳結果"""
+        search = self.make_search().fit(self.X, self.y)
+        self.assertIsNotNone(search)
+        self.assertEqual(search.completed_combinations_, 6)
+        self.assertEqual(len(search.cv_results_), 6)
+        self.assertEqual(search.best_score_,
+                         max(r['mean_test_score'] for r in search.cv_results_))
+        self.assertTrue(4 <= search.best_params_['model__num_leaves'] <= 32)
+        self.assertEqual(search.best_estimator_.params['model__num_leaves'],
+                         search.best_params_['model__num_leaves'])
+
+    def test_time_budget(self):
+        """測試時間上限用完時停止提出新試驗"""
+        search = self.make_search(time_budget_seconds=0).fit(self.X, self.y)
+        self.assertEqual(search.completed_combinations_, 0)
+        self.assertIsNone(search.best_params_)
+
+    def test_stop_flag(self):
+        """測試停止標誌會中止 TPE 搜尋"""
+        self.model_traning.set_stop_training_flag(True)
+        self.assertIsNone(self.make_search().fit(self.X, self.y))
+
+    def test_hyperparameter_tuning_tpe_mode(self):
+        """測試 hyperparameter_tuning 以 search_mode='tpe' 執行並儲存最佳模型"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_path = os.path.join(tmp_dir, 'train.csv')
+            output_path = os.path.join(tmp_dir, 'model.bin')
+            make_sample_data().to_csv(data_path, index=False)
+            results = self.model_traning.hyperparameter_tuning(
+                data_path=data_path, target_column='is_recommended', cv_folds=3,
+                search_mode='tpe', n_trials=4,
+                param_space={'model__learning_rate': ('log_float', 0.01, 0.3),
+                             'model__num_leaves': ('int', 4, 16)},
+                trial_store_path='', output_path=output_path)
+            self.assertIsNotNone(results)
+            self.assertTrue(4 <= results['best_params']['model__num_leaves'] <= 16)
+            model_info = self.model_traning.load_model_with_info(output_path)
+            self.assertEqual(model_info['best_params'], results['best_params'])
+
+    def test_invalid_space(self):
+        """測試錯誤的參數範圍"""
+        with self.assertRaises(ValueError):
+            self.model_traning.StoppableTPESearchCV(
+                estimator=None, param_space={'model__num_leaves': ('int', 10, 2)},
+                scoring='f1_macro', cv=3)
+
+
+def run_tpe_search_tests():
+    """執行 TPE 搜尋測試"""
+    return run_test_cases("TPE 超參數搜尋單元測試", TestTPESampler, TestTPESearch)
+
+
+if __name__ == "__main__":
+    success = run_tpe_search_tests()
+    if success:
+        print("\n✅ 所有 TPE 搜尋測試通過！")
+    else:
+        print("\n❌ 有 TPE 搜尋測試失敗！")
+        sys.exit(1)
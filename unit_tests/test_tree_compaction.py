@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+訓練後樹數壓縮單元測試
+"""
+
+import unittest
+import sys
+import os
+import pickle
+import tempfile
+
+import numpy as np
+import pandas as pd
+from lightgbm import LGBMClassifier
+from sklearn.metrics import f1_score
+from sklearn.model_selection import train_test_split
+
+# 確保能夠匯入專案模組
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from ai_utils.proba_metrics import score_from_proba  # noqa: E402
+from ai_utils.tree_compaction import (  # noqa: E402
+    select_tree_count, staged_metrics, sweep_tree_counts, truncate_model
+)
+from shared_fixtures import make_sample_data, run_test_cases  # noqa: E402
+
+
+class TestTreeCompaction(unittest.TestCase):
+    """測試前綴掃描、樹數選擇與截斷"""
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.X = rng.rand(1000, 5)
+        self.y = (self.X[:, 0] + rng.rand(1000) * 0.5 > 0.7).astype(int)
+
+    def test_staged_metrics_match_prefix_predictions(self):
+        """測試累加原始分數的指標與以前 n 棵樹預測的結果相同"""
+        y_multi = np.digitize(self.X[:, 0] + self.X[:, 1], [0.7, 1.3])
+        for y, metrics in ((self.y, ('f1_macro', 'roc_auc', 'neg_log_loss')),
+                           (y_multi, ('f1_macro', 'neg_log_loss'))):
+            model = LGBMClassifier(n_estimators=40, verbose=-1).fit(self.X, y)
+            curve = staged_metrics(model, self.X, y, [1, 7, 25, 40], metrics)
+            self.assertEqual(sorted(curve), [1, 7, 25, 40])
+            for n, values in curve.items():
+                expected = score_from_proba(y, model.predict_proba(self.X, num_iteration=n),
+                                            model.classes_, metrics)
+                for name in metrics:
+                    self.assertAlmostEqual(values[name], expected[name], places=6)
+
+    def test_sweep_tree_counts(self):
+        """測試掃描的樹數遞增、包含完整樹數且有上限"""
+        self.assertEqual(list(sweep_tree_counts(5)), [1, 2, 3, 4, 5])
+        counts = sweep_tree_counts(1000, max_points=50)
+        self.assertLessEqual(len(counts), 50)
+        self.assertEqual((counts[0], counts[-1]), (1, 1000))
+
+    def test_select_tree_count(self):
+        """測試選擇所有指標都在容許範圍內的最少樹數"""
+        curve = {10: {'f1_macro': 0.70, 'roc_auc': 0.80},
+                 20: {'f1_macro': 0.79, 'roc_auc': 0.84},
+                 30: {'f1_macro': 0.80, 'roc_auc': 0.83},
+                 40: {'f1_macro': 0.80, 'roc_auc': 0.85}}
+        self.assertEqual(select_tree_count(curve, 0.02), 20)
+        self.assertEqual(select_tree_count(curve, 0.015), 20)
+        self.assertEqual(select_tree_count(curve, 0.005), 40)
+        self.assertEqual(select_tree_count(curve, 0.0), 40)
+
+    def test_truncate_model(self):
+        """測試截斷後的模型預測與前 n 棵樹相同，可存檔並繼續訓練"""
+        model = LGBMClassifier(n_estimators=50, verbose=-1).fit(self.X, self.y)
+        expected = model.predict_proba(self.X, num_iteration=20)
+        truncate_model(model, 20)
+        self.assertEqual(model.booster_.num_trees(), 20)
+        self.assertEqual(model.n_estimators, 20)
+        np.testing.assert_allclose(model.predict_proba(self.X), expected)
+
+        restored = pickle.loads(pickle.dumps(model))
+        np.testing.assert_allclose(restored.predict_proba(self.X), expected)
+        continued = LGBMClassifier(n_estimators=5, verbose=-1).fit(
+            self.X, self.y, init_model=restored.booster_)
+        self.assertEqual(continued.booster_.num_trees(), 25)
+
+        truncate_model(model, 30)  # 不超過現有樹數時不變
+        self.assertEqual(model.booster_.num_trees(), 20)
+
+
+class TestTrainModelCompaction(unittest.TestCase):
+    """測試 train_model 的壓縮步驟"""
+
+    def setUp(self):
+        from ai_utils import model_traning
+        self.model_traning = model_traning
+        self.model_traning.reset_stop_training_flag()
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_path = os.path.join(self.tmp_dir.name, 'train.csv')
+        self.output_path = os.path.join(self.tmp_dir.name, 'model.bin')
+        make_sample_data(1500).to_csv(self.data_path, index=False)
+
+    def tearDown(self):
+        self.model_traning.reset_stop_training_flag()
+        self.tmp_dir.cleanup()
+
+    def _train(self, **options):
+        return self.model_traning.train_model(
+            data_path=self.data_path, output_path=self.output_path,
+            show_plots=False, target_column='is_recommended',
+            n_estimators=200, learning_rate=0.1, n_repeats=1, **options)
+
+    def test_saves_trimmed_model_with_metadata(self):
+        """測試儲存截斷的模型，並在模型資訊中記錄指標與預測時間"""
+        results = self._train(compaction_epsilon=0.01, refit_policy='none')
+        compaction = results['compaction']
+        self.assertEqual(compaction['measured_on'], 'final')
+        saved = self.model_traning.load_model_with_info(self.output_path)
+        self.assertEqual(saved['compaction'], compaction)
+
+        self.assertEqual(compaction['original_trees'], 200)
+        self.assertLess(compaction['trees'], 200)
+        self.assertEqual(saved['pipeline'].named_steps['model'].booster_.num_trees(),
+                         compaction['trees'])
+        for name in ('f1_macro', 'roc_auc'):
+            self.assertGreaterEqual(compaction['valid_metrics'][name],
+                                    compaction['valid_metrics_full'][name] - 0.01)
+        self.assertLess(compaction['model_bytes'], compaction['model_bytes_full'])
+        self.assertGreater(compaction['latency_full'], 0)
+        self.assertEqual(compaction['curve'][-1]['n_trees'], 200)
+
+        # 最終模型直接使用訓練組模型，儲存的指標就是截斷後模型在驗證組的表現
+        data = pd.read_csv(self.data_path)
+        _, X_valid, _, y_valid = train_test_split(
+            data.drop(columns=['is_recommended']), data['is_recommended'],
+            test_size=self.model_traning.TEST_SIZE, random_state=self.model_traning.RANDOM_STATE,
+            stratify=data['is_recommended'])
+        self.assertAlmostEqual(
+            f1_score(y_valid, saved['pipeline'].predict(X_valid), average='macro'),
+            compaction['valid_metrics']['f1_macro'])
+
+    def test_refit_policies(self):
+        """測試重新訓練會改變模型的策略拒絕壓縮，沿用樹數的策略標記指標來自訓練組模型"""
+        for refit_policy in ('full', 'background'):
+            self.assertIsNone(self._train(compaction_epsilon=0.01, refit_policy=refit_policy))
+        results = self._train(compaction_epsilon=0.01, refit_policy='iterations_from_split')
+        compaction = results['compaction']
+        self.assertEqual(compaction['measured_on'], 'split')
+        self.assertEqual(results['model'].named_steps['model'].booster_.num_trees(),
+                         compaction['trees'])
+
+    def test_disabled_by_default(self):
+        """測試預設不壓縮，負的容許值被拒絕"""
+        self.assertIsNone(self.model_traning.TREE_COMPACTION_EPSILON)
+        results = self._train()
+        self.assertIsNone(results['compaction'])
+        self.assertNotIn('compaction', self.model_traning.load_model_with_info(self.output_path))
+        self.assertIsNone(self._train(compaction_epsilon=-0.1))
+
+
+def run_tree_compaction_tests():
+    """執行樹數壓縮測試"""
+    return run_test_cases("訓練後樹數壓縮單元測試", TestTreeCompaction, TestTrainModelCompaction)
+
+
+if __name__ == "__main__":
+    success = run_tree_compaction_tests()
+    if success:
+        print("\n✅ 所有樹數壓縮測試通過！")
+    else:
+        print("\n❌ 有樹數壓縮測試失敗！")
+        sys.exit(1)
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+超參數搜尋試驗記錄（SQLite）單元測試
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+
+import numpy as np
+from sklearn.model_selection import StratifiedKFold
+
+# 確保能夠匯入專案模組
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from ai_utils.trial_store import (  # noqa: E402
+    TrialStore, dataset_fingerprint, split_fingerprint, params_key
+)
+from shared_fixtures import make_sample_data, make_search, run_test_cases  # noqa: E402
+
+
+class TestTrialStore(unittest.TestCase):
+    """測試試驗記錄與指紋"""
+
+    def test_dataset_fingerprint(self):
+        """測試資料集指紋只隨資料內容改變"""
+        data = make_sample_data()
+        X, y = data.drop(columns=['is_recommended']), data['is_recommended']
+        self.assertEqual(dataset_fingerprint(X, y), dataset_fingerprint(X.copy(), y.copy()))
+
+        changed = X.copy()
+        changed.loc[0, 'price_usd'] += 1
+        self.assertNotEqual(dataset_fingerprint(X, y), dataset_fingerprint(changed, y))
+        self.assertNotEqual(dataset_fingerprint(X, y), dataset_fingerprint(X, 1 - y))
+        self.assertEqual(dataset_fingerprint(X.values, y.values),
+                         dataset_fingerprint(X.values.copy(), y.values.copy()))
+
+    def test_split_fingerprint(self):
+        """測試不同的交叉驗證切分有不同的指紋"""
+        y = make_sample_data()['is_recommended']
+        splits = lambda seed: list(StratifiedKFold(3, shuffle=True, random_state=seed)
+                                   .split(np.zeros(len(y)), y))
+        self.assertEqual(split_fingerprint(splits(0)), split_fingerprint(splits(0)))
+        self.assertNotEqual(split_fingerprint(splits(0)), split_fingerprint(splits(1)))
+
+    def test_save_and_load(self):
+        """測試寫入後重新開啟資料庫仍可讀取"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'sub', 'trials.db')
+            store = TrialStore(path)
+            params = {'model__num_leaves': 8, 'model__learning_rate': 0.1}
+            store.save('data', 'split', 'f1_macro', params, 0,
+                       {'score': 0.8, 'fit_seconds': 1.5})
+            store.close()
+
+            store = TrialStore(path)
+            reordered = {'model__learning_rate': 0.1, 'model__num_leaves': 8}
+            self.assertEqual(params_key(params), params_key(reordered))
+            self.assertEqual(store.load('data', 'split', 'f1_macro', reordered),
+                             {0: {'score': 0.8, 'fit_seconds': 1.5}})
+            self.assertEqual(store.load('data', 'split', 'roc_auc', params), {})
+            self.assertEqual(store.count(), 1)
+            store.close()
+
+
+class TestSearchResume(unittest.TestCase):
+    """測試 StoppableGridSearchCV 從試驗記錄續跑"""
+
+    def setUp(self):
+        """建立搜尋所需的資料"""
+        from ai_utils import model_traning
+        self.model_traning = model_traning
+        self.model_traning.reset_stop_training_flag()
+
+        data = make_sample_data()
+        self.X = data.drop(columns=['is_recommended'])
+        self.y = data['is_recommended']
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store_path = os.path.join(self.tmp_dir.name, 'trials.db')
+
+    def tearDown(self):
+        """測試後清理"""
+        self.model_traning.reset_stop_training_flag()
+        self.tmp_dir.cleanup()
+
+    def make_search(self, param_grid, scoring='f1_macro', n_jobs=1):
+        """建立使用試驗記錄的搜尋物件"""
+        return make_search(param_grid, n_jobs=n_jobs, scoring=scoring,
+                           trial_store=self.store_path)
+
+    def stored_rows(self):
+        """目前試驗記錄中的 fold 結果數"""
+        store = TrialStore(self.store_path)
+        try:
+            return store.count()
+        finally:
+            store.close()
+
+    def test_rerun_skips_evaluated(self):
+        """測試重新執行與擴充網格時只評估新的組合"""
+        first = self.make_search({'model__num_leaves': [4, 8]}).fit(self.X, self.y)
+        self.assertEqual(self.stored_rows(), 6)
+
+        # 完全相同的搜尋：結果（含訓練時間）直接來自記錄
+        again = self.make_search({'model__num_leaves': [4, 8]}).fit(self.X, self.y)
+        self.assertEqual(self.stored_rows(), 6)
+        self.assertEqual([r['mean_fit_time'] for r in again.cv_results_],
+                         [r['mean_fit_time'] for r in first.cv_results_])
+        self.assertEqual(again.best_params_, first.best_params_)
+
+        # 擴充網格：只有新值需要訓練
+        extended = self.make_search({'model__num_leaves': [4, 8, 16]}).fit(self.X, self.y)
+        self.assertEqual(self.stored_rows(), 9)
+        self.assertEqual(extended.completed_combinations_, 3)
+        self.assertEqual(extended.cv_results_[0]['mean_fit_time'],
+                         first.cv_results_[0]['mean_fit_time'])
+
+        # 不同評分指標不共用結果
+        self.make_search({'model__num_leaves': [4]}, scoring='roc_auc').fit(self.X, self.y)
+        self.assertEqual(self.stored_rows(), 12)
+
+    def test_resume_partial_folds(self):
+        """測試中斷後只補訓練缺少的 fold"""
+        search = self.make_search({'model__num_leaves': [4]})
+        full = search.fit(self.X, self.y)
+        full_scores = full.cv_results_[0]['cv_scores']
+
+        store = TrialStore(self.store_path)
+        store.connection.execute("DELETE FROM trials WHERE fold > 0")
+        store.connection.commit()
+        store.close()
+
+        resumed = self.make_search({'model__num_leaves': [4]}).fit(self.X, self.y)
+        self.assertEqual(self.stored_rows(), 3)
+        np.testing.assert_allclose(resumed.cv_results_[0]['cv_scores'], full_scores)
+
+    def test_parallel_uses_store(self):
+        """測試平行搜尋同樣讀寫試驗記錄"""
+        serial = self.make_search({'model__num_leaves': [4, 8]}).fit(self.X, self.y)
+        parallel = self.make_search({'model__num_leaves': [4, 8, 16]}, n_jobs=2).fit(
+            self.X, self.y)
+        self.assertEqual(self.stored_rows(), 9)
+        self.assertEqual([r['mean_fit_time'] for r in parallel.cv_results_[:2]],
+                         [r['mean_fit_time'] for r in serial.cv_results_])
+
+    def test_hyperparameter_tuning_store_opt_in(self):
+        """測試 hyperparameter_tuning 預設不記錄試驗，指定路徑時才寫入"""
+        data_path = os.path.join(self.tmp_dir.name, 'train.csv')
+        output_path = os.path.join(self.tmp_dir.name, 'model.bin')
+        make_sample_data().to_csv(data_path, index=False)
+        options = dict(data_path=data_path, target_column='is_recommended', cv_folds=3,
+                       param_grid={'model__num_leaves': [4]}, search_mode='grid',
+                       output_path=output_path)
+
+        cwd = os.getcwd()
+        os.chdir(self.tmp_dir.name)
+        try:
+            self.assertIsNotNone(self.model_traning.hyperparameter_tuning(**options))
+        finally:
+            os.chdir(cwd)
+        self.assertIsNone(self.model_traning.TRIAL_STORE_PATH)
+        self.assertEqual(sorted(os.listdir(self.tmp_dir.name)), ['model.bin', 'train.csv'])
+
+        self.model_traning.hyperparameter_tuning(trial_store_path=self.store_path, **options)
+        self.assertEqual(self.stored_rows(), 3)
+
+
+def run_trial_store_tests():
+    """執行試驗記錄測試"""
+    return run_test_cases("超參數搜尋試驗記錄單元測試", TestTrialStore, TestSearchResume)
+
+
+if __name__ == "__main__":
+    success = run_trial_store_tests()
+    if success:
+        print("\n✅ 所有試驗記錄測試通過！")
+    else:
+        print("\n❌ 有試驗記錄測試失敗！")
+        sys.exit(1)
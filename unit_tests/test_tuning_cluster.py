@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分散式超參數搜尋（協調者 / 工作者）單元測試
+所有測試都在本機執行：協調者監聽 127.0.0.1，工作者為本機行程或執行緒
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# 確保能夠匯入專案模組
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from ai_utils.tuning_cluster import (  # noqa: E402
+    TuningCoordinator, run_worker, start_local_workers, _request
+)
+from shared_fixtures import (  # noqa: E402
+    make_pipeline, make_sample_data, make_search, run_test_cases
+)
+
+
+def _run_search_task(params, train_index, test_index, scoring, n_iterations=None):
+    """與 model_traning._run_search_task 同名的替身，協定測試只需要名稱"""
+
+
+class SearchClusterTestCase(unittest.TestCase):
+    """建立共享資料檔與搜尋資料"""
+
+    def setUp(self):
+        from ai_utils import model_traning
+        self.model_traning = model_traning
+        self.model_traning.reset_stop_training_flag()
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_path = os.path.join(self.tmp_dir.name, 'train.csv')
+        make_sample_data().to_csv(self.data_path, index=False)
+        data = pd.read_csv(self.data_path)
+        # 搜尋資料為資料檔的部分列，工作者依列標籤重建
+        data = data.sample(frac=0.8, random_state=0)
+        self.X = data.drop(columns=['is_recommended'])
+        self.y = data['is_recommended'].astype(int)
+
+    def tearDown(self):
+        self.model_traning.reset_stop_training_flag()
+        self.tmp_dir.cleanup()
+
+    def make_pipe(self):
+        return make_pipeline()
+
+
+class TestCoordinatorProtocol(SearchClusterTestCase):
+    """測試協調者的任務分派、心跳與停止廣播"""
+
+    def make_coordinator(self, heartbeat_timeout=30.0):
+        coordinator = TuningCoordinator(self.data_path, heartbeat_timeout=heartbeat_timeout)
+        coordinator.start_job(self.X, self.y, self.make_pipe(), 'f1_macro')
+        self.addCleanup(coordinator.close)
+        return coordinator
+
+    def test_task_and_result(self):
+        """測試任務經由 HTTP 分派並以結果完成 Future"""
+        coordinator = self.make_coordinator()
+        future = coordinator.submit(_run_search_task, {'model__num_leaves': np.int64(8)},
+                                    np.arange(5), np.arange(5, 8), 'f1_macro', [5, 10])
+        url = coordinator.address
+
+        job = _request(f"{url}/job")['job']
+        self.assertEqual(job['row_labels'], list(self.X.index))
+        self.assertEqual(job['target_column'], 'is_recommended')
+
+        reply = _request(f"{url}/task", {'worker': 'a'})
+        self.assertEqual(reply['status'], 'task')
+        task = reply['task']
+        self.assertEqual(task['params'], {'model__num_leaves': 8})
+        self.assertTrue(future.running())
+        self.assertEqual(_request(f"{url}/task", {'worker': 'b'})['status'], 'wait')
+
+        self.assertFalse(_request(f"{url}/heartbeat",
+                                  {'worker': 'a', 'task_id': task['task_id']})['stop'])
+        _request(f"{url}/result", {'worker': 'a', 'task_id': task['task_id'],
+                                   'result': {'score': 0.5, 'fit_seconds': 0.1,
+                                              'scores': {'5': 0.4, '10': 0.5}}})
+        self.assertEqual(future.result(timeout=1)['scores'], {5: 0.4, 10: 0.5})
+
+    def test_stale_task_is_reassigned(self):
+        """測試心跳逾時的任務重新分派，且先回報的結果為準"""
+        coordinator = self.make_coordinator(heartbeat_timeout=0.2)
+        future = coordinator.submit(_run_search_task, {}, [0, 1], [2], 'f1_macro')
+
+        first = coordinator._handle_task_request('dead')['task']
+        self.assertEqual(coordinator._handle_task_request('alive')['status'], 'wait')
+        time.sleep(0.3)
+        second = coordinator._handle_task_request('alive')['task']
+        self.assertEqual(first['task_id'], second['task_id'])
+        self.assertEqual(coordinator.reassigned_tasks, 1)
+        self.assertTrue(coordinator._handle_heartbeat('dead', first['task_id'])['stop'],
+                        "原工作者應收到停止訊號")
+
+        coordinator._handle_result('alive', second['task_id'],
+                                   {'score': 0.7, 'fit_seconds': 0.1})
+        self.assertFalse(coordinator._handle_result('dead', first['task_id'],
+                                                    {'score': 0.1, 'fit_seconds': 0.1})['ok'])
+        self.assertEqual(future.result(timeout=1)['score'], 0.7)
+
+    def test_stop_broadcast(self):
+        """測試停止事件經由心跳與任務回應廣播"""
+        coordinator = self.make_coordinator()
+        coordinator.submit(_run_search_task, {}, [0, 1], [2], 'f1_macro')
+        queued = coordinator.submit(_run_search_task, {}, [0, 1], [2], 'f1_macro')
+        task = coordinator._handle_task_request('a')['task']
+
+        coordinator.stop_event.set()
+        self.assertTrue(coordinator._handle_heartbeat('a', task['task_id'])['stop'])
+        self.assertEqual(coordinator._handle_task_request('b')['status'], 'stop')
+        coordinator.shutdown(cancel_futures=True)
+        self.assertTrue(queued.cancelled())
+        self.assertEqual(coordinator._handle_task_request('b')['status'], 'wait')
+
+    def test_rejects_other_functions(self):
+        """測試只接受搜尋任務"""
+        coordinator = self.make_coordinator()
+        with self.assertRaises(ValueError):
+            coordinator.submit(print, 'hello')
+
+
+class TestDistributedSearch(SearchClusterTestCase):
+    """測試 StoppableGridSearchCV 透過本機工作者執行"""
+
+    def make_search(self, coordinator=None, param_grid=None, metrics=None):
+        return make_search(param_grid or {'model__n_estimators': [5, 10], 'model__num_leaves': [4, 8]},
+                           coordinator=coordinator, metrics=metrics)
+
+    def test_matches_serial(self):
+        """測試兩個本機工作者行程的結果與循序搜尋一致"""
+        metrics = ('f1_macro', 'roc_auc')
+        serial = self.make_search(metrics=metrics).fit(self.X, self.y)
+        with TuningCoordinator(self.data_path, heartbeat_timeout=10) as coordinator:
+            workers = start_local_workers(coordinator.address, 2, n_jobs=2,
+                                          heartbeat_interval=0.5, idle_timeout=2)
+            distributed = self.make_search(coordinator, metrics=metrics).fit(self.X, self.y)
+            self.assertGreater(len(coordinator.workers), 0)
+        for worker in workers:
+            worker.join(timeout=30)
+            self.assertFalse(worker.is_alive(), "協調者關閉後工作者應自行結束")
+
+        self.assertEqual(distributed.best_params_, serial.best_params_)
+        self.assertEqual(distributed.completed_combinations_, 4)
+        for ours, theirs in zip(distributed.cv_results_, serial.cv_results_):
+            self.assertEqual(ours['params'], theirs['params'])
+            np.testing.assert_allclose(ours['cv_scores'], theirs['cv_scores'])
+            np.testing.assert_allclose(ours['cv_metrics']['roc_auc'],
+                                       theirs['cv_metrics']['roc_auc'])
+
+    def test_stop_reaches_workers(self):
+        """測試停止搜尋時工作者中斷訓練"""
+        param_grid = {'model__n_estimators': [5000], 'model__learning_rate': [0.01, 0.02],
+                      'model__num_leaves': [4, 8]}
+        with TuningCoordinator(self.data_path, heartbeat_timeout=10) as coordinator:
+            completed = []
+            worker = threading.Thread(
+                target=lambda: completed.append(run_worker(
+                    coordinator.address, worker_id='thread', n_jobs=1,
+                    heartbeat_interval=0.1, poll_interval=0.1, idle_timeout=1)))
+            worker.start()
+            timer = threading.Timer(2.0, self.model_traning.set_stop_training_flag)
+            timer.start()
+            start = time.perf_counter()
+            result = self.make_search(coordinator, param_grid).fit(self.X, self.y)
+            timer.join()
+        worker.join(timeout=30)
+        self.assertFalse(worker.is_alive())
+        self.assertLess(time.perf_counter() - start, 20)
+        if result is not None:
+            self.assertLess(result.completed_combinations_, 4)
+
+
+def run_tuning_cluster_tests():
+    """執行分散式搜尋測試"""
+    return run_test_cases("分散式超參數搜尋單元測試", TestCoordinatorProtocol, TestDistributedSearch)
+
+
+if __name__ == "__main__":
+    success = run_tuning_cluster_tests()
+    if success:
+        print("\n✅ 所有分散式搜尋測試通過！")
+    else:
+        print("\n❌ 有分散式搜尋測試失敗！")
+        sys.exit(1)
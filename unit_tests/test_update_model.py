@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量更新模型（繼續提升）單元測試
+"""
+
+import unittest
+import sys
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# 確保能夠匯入專案模組
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from shared_fixtures import make_sample_data, run_test_cases  # noqa: E402
+
+
+class TestUpdateModel(unittest.TestCase):
+    """測試 update_model 繼續提升既有模型"""
+
+    def setUp(self):
+        """建立初始模型"""
+        from ai_utils import model_traning
+        self.model_traning = model_traning
+        self.model_traning.reset_stop_training_flag()
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.base_path = os.path.join(self.tmp_dir.name, 'base.csv')
+        self.new_path = os.path.join(self.tmp_dir.name, 'new.csv')
+        self.model_path = os.path.join(self.tmp_dir.name, 'model.bin')
+        make_sample_data(200, random_state=0).to_csv(self.base_path, index=False)
+        make_sample_data(200, random_state=1, skin_types=('dry', 'oily', 'combination')).to_csv(
+            self.new_path, index=False)
+
+        results = self.model_traning.train_model(
+            data_path=self.base_path, output_path=self.model_path,
+            show_plots=False, target_column='is_recommended',
+            n_estimators=20, n_repeats=1)
+        self.assertIsNotNone(results)
+
+    def tearDown(self):
+        """測試後清理"""
+        self.model_traning.reset_stop_training_flag()
+        self.tmp_dir.cleanup()
+
+    def test_continue_boosting(self):
+        """測試在新資料上繼續增加樹"""
+        output_path = os.path.join(self.tmp_dir.name, 'updated.bin')
+        results = self.model_traning.update_model(
+            self.model_path, self.new_path, extra_trees=10, output_path=output_path)
+
+        self.assertIsNotNone(results)
+        self.assertEqual(results['total_trees'], 30)
+        self.assertEqual(results['new_columns'], [])
+
+        model_info = self.model_traning.load_model_with_info(output_path)
+        self.assertEqual(len(model_info['update_history']), 1)
+        proba = model_info['pipeline'].predict_proba(
+            pd.read_csv(self.new_path)[model_info['feature_columns']])
+        self.assertEqual(proba.shape, (200, 2))
+
+        # 原模型檔案不應被修改
+        original = self.model_traning.load_model_with_info(self.model_path)
+        self.assertEqual(original['pipeline'].named_steps['model'].booster_.num_trees(), 20)
+
+    def test_drops_stale_threshold(self):
+        """測試更新後的模型不沿用舊模型的決策門檻與樹數壓縮資訊"""
+        results = self.model_traning.train_model(
+            data_path=self.base_path, output_path=self.model_path,
+            show_plots=False, target_column='is_recommended', n_estimators=20, n_repeats=1,
+            threshold_metric='balanced_accuracy', compaction_epsilon=0.05,
+            refit_policy='none')
+        self.assertIsNotNone(results['decision_threshold'])
+
+        output_path = os.path.join(self.tmp_dir.name, 'updated.bin')
+        self.assertIsNotNone(self.model_traning.update_model(
+            self.model_path, self.new_path, extra_trees=10, output_path=output_path))
+        model_info = self.model_traning.load_model_with_info(output_path)
+        self.assertNotIn('decision_threshold', model_info)
+        self.assertNotIn('compaction', model_info)
+        self.assertEqual(model_info['update_history'][-1]['dropped_info'],
+                         ['decision_threshold', 'compaction'])
+
+        X = pd.read_csv(self.new_path)[model_info['feature_columns']]
+        predictions, _ = self.model_traning.predict_with_info(model_info, X)
+        np.testing.assert_array_equal(predictions, model_info['pipeline'].predict(X))
+
+    def test_extend_vocabulary(self):
+        """測試擴充獨熱編碼詞彙後仍可繼續提升"""
+        results = self.model_traning.update_model(
+            self.model_path, self.new_path, extra_trees=5,
+            base_data_path=self.base_path, extend_vocabulary=True)
+
+        self.assertIsNotNone(results)
+        self.assertEqual(results['new_columns'], ['skin_type_combination'])
+        self.assertEqual(results['total_trees'], 25)
+
+        preprocessor = results['model'].named_steps['DataPreprocess']
+        self.assertEqual(preprocessor.final_field_names[-1], 'skin_type_combination')
+
+        model_info = self.model_traning.load_model_with_info(self.model_path)
+        data = pd.read_csv(self.new_path)[model_info['feature_columns']]
+        prediction = model_info['pipeline'].predict(data)
+        self.assertEqual(len(prediction), len(data))
+
+    def test_update_stop_early(self):
+        """測試停止標誌會中止模型更新"""
+        self.model_traning.set_stop_training_flag(True)
+        result = self.model_traning.update_model(self.model_path, self.new_path)
+        self.assertIsNone(result)
+
+
+def run_update_model_tests():
+    """執行增量更新模型測試"""
+    return run_test_cases("增量更新模型單元測試", TestUpdateModel)
+
+
+if __name__ == "__main__":
+    success = run_update_model_tests()
+    if success:
+        print("\n✅ 所有增量更新模型測試通過！")
+    else:
+        print("\n❌ 有增量更新模型測試失敗！")
+        sys.exit(1)